@@ -2,15 +2,53 @@
 
 from fastapi import FastAPI, Request
 from pydantic import BaseModel
-from typing import List
+from typing import List, TYPE_CHECKING
 import asyncio
-from llm.mi_agent import MIDetectionAgent
-from models.model import Incident
+import time
+import json
+from contextlib import asynccontextmanager
+from models.model import Incident, HistoricalIncident, ServiceCI
 from datetime import datetime
-from fastapi.responses import HTMLResponse, JSONResponse
+from fastapi.responses import HTMLResponse, JSONResponse, StreamingResponse
 from fastapi.middleware.cors import CORSMiddleware
 
-app = FastAPI()
+if TYPE_CHECKING:
+    from llm.mi_agent import MIDetectionAgent
+
+
+def build_agent() -> "MIDetectionAgent":
+    """Build the shared agent and warm up its model, repository and LLM client"""
+    # Imported here so importing app (e.g. in each uvicorn worker) doesn't load the ML and LLM stacks
+    from llm.mi_agent import MIDetectionAgent
+    started = time.perf_counter()
+    agent = MIDetectionAgent()
+    agent.warm_up()
+    print(f"MIDetectionAgent warmed up in {time.perf_counter() - started:.2f}s")
+    return agent
+
+
+async def _warm_up_agent(app: FastAPI):
+    # Model loading is blocking, so keep it off the event loop while the server starts accepting requests
+    loop = asyncio.get_running_loop()
+    try:
+        app.state.agent = await loop.run_in_executor(None, build_agent)
+        app.state.ready = True
+    except Exception as e:
+        app.state.startup_error = str(e)
+        print(f"Exception during agent warm-up: {e}")
+
+
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    app.state.agent = None
+    app.state.ready = False
+    app.state.startup_error = None
+    warm_up_task = asyncio.create_task(_warm_up_agent(app))
+    yield
+    warm_up_task.cancel()
+
+
+app = FastAPI(lifespan=lifespan)
 
 # Allow frontend to talk to backend
 app.add_middleware(
@@ -31,11 +69,34 @@ class IncidentInput(BaseModel):
     assigned_to: str
     affected_users: List[str]
 
+
+def _read_only_response(error: PermissionError) -> JSONResponse:
+    # Raised as ReadOnlyRepositoryError (a PermissionError) by backends that do not accept writes
+    return JSONResponse(status_code=405, content={"error": str(error)})
+
+
+def _not_ready_response() -> JSONResponse:
+    return JSONResponse(
+        status_code=503,
+        content={"error": app.state.startup_error or "MI detection agent is still warming up"}
+    )
+
+
+@app.get("/ready")
+async def readiness():
+    """Report whether the shared agent has finished warming up"""
+    if not app.state.ready:
+        return _not_ready_response()
+    return {"ready": True}
+
+
 @app.post("/analyze")
 async def analyze_incident(incident_data: IncidentInput):
+    if not app.state.ready:
+        return _not_ready_response()
     print("Received incident:", incident_data.dict())
     incident = Incident(**incident_data.dict())
-    agent = MIDetectionAgent()
+    agent = app.state.agent
     
     try:
         result = await agent.detect_major_incident(incident)
@@ -46,6 +107,126 @@ async def analyze_incident(incident_data: IncidentInput):
     except Exception as e:
         return {"error": str(e)}
 
+def _sse_event(event: str, data: dict) -> str:
+    return f"event: {event}\ndata: {json.dumps(data, default=str)}\n\n"
+
+
+@app.post("/analyze/stream")
+async def analyze_incident_stream(incident_data: IncidentInput):
+    """
+    Server-sent events: 'features' once the predictor scores are ready, 'token' for each
+    chunk of LLM reasoning, then 'result' with the final decision (or 'error').
+    """
+    if not app.state.ready:
+        return _not_ready_response()
+    print("Received incident for streaming:", incident_data.dict())
+    incident = Incident(**incident_data.dict())
+    agent = app.state.agent
+    
+    async def events():
+        try:
+            async for event, data in agent.stream_major_incident(incident):
+                yield _sse_event(event, data)
+        except Exception as e:
+            yield _sse_event("error", {"incident_id": incident.incident_id, "error": str(e)})
+    
+    return StreamingResponse(
+        events(),
+        media_type="text/event-stream",
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"}
+    )
+
+
+@app.post("/analyze/batch")
+async def analyze_incidents(incidents_data: List[IncidentInput]):
+    """Analyze many incidents at once; failures are reported per item, in input order"""
+    if not app.state.ready:
+        return _not_ready_response()
+    print(f"Received batch of {len(incidents_data)} incidents")
+    agent = app.state.agent
+    
+    incidents = [Incident(**incident_data.dict()) for incident_data in incidents_data]
+    try:
+        detections = await agent.detect_major_incidents(incidents)
+    except Exception as e:
+        return {"error": str(e)}
+    
+    results = []
+    for incident, result in zip(incidents, detections):
+        if isinstance(result, Exception):
+            results.append({"incident_id": incident.incident_id, "error": str(result)})
+        else:
+            results.append({
+                "incident_id": incident.incident_id,
+                "is_major_incident": result.is_major_incident
+            })
+    return {"results": results}
+
+
+@app.post("/historical-incidents")
+async def add_historical_incidents(incidents: List[HistoricalIncident]):
+    """Make newly resolved incidents (or edited ones, by id) searchable without a reindex"""
+    if not app.state.ready:
+        return _not_ready_response()
+    # Encoding the new incidents is blocking work
+    loop = asyncio.get_running_loop()
+    try:
+        added = await loop.run_in_executor(None, app.state.agent.data_repo.add_historical_incidents, incidents)
+    except PermissionError as e:
+        return _read_only_response(e)
+    except Exception as e:
+        return {"error": str(e)}
+    return {"added": added}
+
+
+@app.delete("/historical-incidents/{incident_id}")
+async def remove_historical_incident(incident_id: str):
+    if not app.state.ready:
+        return _not_ready_response()
+    try:
+        removed = app.state.agent.data_repo.remove_historical_incidents([incident_id])
+    except PermissionError as e:
+        return _read_only_response(e)
+    if not removed:
+        return JSONResponse(status_code=404, content={"error": f"Historical incident not found: {incident_id}"})
+    return {"removed": removed}
+
+
+@app.post("/service-cis")
+async def upsert_service_cis(service_cis: List[ServiceCI]):
+    """Add CIs or replace them by ci_id; the blast radius of the CIs they depend on is updated incrementally"""
+    if not app.state.ready:
+        return _not_ready_response()
+    try:
+        updated = app.state.agent.data_repo.upsert_service_cis(service_cis)
+    except PermissionError as e:
+        return _read_only_response(e)
+    except Exception as e:
+        return {"error": str(e)}
+    return {"updated": updated}
+
+
+@app.delete("/service-cis/{ci_id}")
+async def remove_service_ci(ci_id: str):
+    if not app.state.ready:
+        return _not_ready_response()
+    try:
+        removed = app.state.agent.data_repo.remove_service_cis([ci_id])
+    except PermissionError as e:
+        return _read_only_response(e)
+    except Exception as e:
+        return {"error": str(e)}
+    if not removed:
+        return JSONResponse(status_code=404, content={"error": f"Service CI not found: {ci_id}"})
+    return {"removed": removed}
+
+@app.get("/metrics")
+async def metrics():
+    """Counters from the shared agent, e.g. how many LLM calls were skipped"""
+    if not app.state.ready:
+        return _not_ready_response()
+    return app.state.agent.get_metrics()
+
 #@app.get("/", response_class=HTMLResponse)
 #async def root():
 #    return "<h2>MI Detection API is running.</h2><p>Use POST /analyze to detect incidents.</p>"
@@ -53,4 +234,4 @@ async def analyze_incident(incident_data: IncidentInput):
 
 @app.get("/")
 def read_root():
-    return {"message": "It works!"}
\ No newline at end of file
+    return {"message": "It works!"}
@@ -0,0 +1,116 @@
+# bench_columnar_memory.py
+"""
+Retained memory of the reference datasets held as lists of pydantic models (the previous
+layout) against the columnar store, for synthetic users, change records, health samples and
+reassignments. Also times a health window lookup for every CI in both layouts.
+
+Usage: python -m benchmarks.bench_columnar_memory --records 200000
+"""
+import argparse
+import datetime
+import gc
+import time
+import tracemalloc
+from data.columnar import ColumnarTable, group_rows, row_lookup
+from data.timeseries import build_series_index
+from models.model import User, ChangeRecord, ServiceHealth, ReassignmentRecord
+
+START = datetime.datetime(2024, 1, 1)
+
+
+def synthetic(count: int):
+    """Raw records for each dataset, count records each (a tenth as many users)"""
+    def at(i):
+        return (START + datetime.timedelta(minutes=i)).isoformat()
+    return {
+        "users": (User, [
+            dict(user_id=f"U{i:07d}", name=f"User {i}", department=f"Dept {i % 40}", is_vip=i % 50 == 0)
+            for i in range(count // 10)
+        ]),
+        "change_records": (ChangeRecord, [
+            dict(change_id=f"CHG{i:08d}", summary=f"Patch rollout {i % 300}", ci_id=f"CI{i % 500:04d}",
+                 implemented_at=at(i), risk_score=(i % 10) / 10)
+            for i in range(count)
+        ]),
+        "service_health": (ServiceHealth, [
+            dict(ci_id=f"CI{i % 500:04d}", timestamp=at(i), health_score=float(i % 100))
+            for i in range(count)
+        ]),
+        "reassignments": (ReassignmentRecord, [
+            dict(incident_id=f"INC{i // 3:08d}", timestamp=at(i),
+                 from_group=f"Group {i % 25}", to_group=f"Group {(i + 1) % 25}")
+            for i in range(count)
+        ]),
+    }
+
+
+def build_lists(name, model, records):
+    """The previous layout: one model per record, grouped into per-key lists"""
+    key = {"users": "user_id", "reassignments": "incident_id"}.get(name, "ci_id")
+    index = {}
+    for record in records:
+        index.setdefault(record[key], []).append(model(**record))
+    return index
+
+
+def build_columns(name, model, records):
+    records = (model(**record) for record in records)
+    if name == "users":
+        table = ColumnarTable.from_models(model, records)
+        return table, row_lookup(table, "user_id")
+    if name == "reassignments":
+        return group_rows(ColumnarTable.from_models(model, records, ("timestamp",)), "incident_id")
+    time_column, value_column = ("implemented_at", "risk_score") if name == "change_records" else ("timestamp", "health_score")
+    table = ColumnarTable.from_models(model, records, (time_column,))
+    return build_series_index(table, "ci_id", time_column, value_column)
+
+
+def retained(build, name, model, records) -> int:
+    """Bytes still allocated once the structure is built from the raw records"""
+    # Fresh copies, so neither layout can share string objects with the input
+    copies = [{k: (v + " ")[:-1] if isinstance(v, str) else v for k, v in record.items()} for record in records]
+    gc.collect()
+    tracemalloc.start()
+    structure = build(name, model, copies)
+    gc.collect()
+    current, _ = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    del structure, copies
+    return current
+
+
+def time_window_lookup(count: int, datasets):
+    _, health = datasets["service_health"]
+    lists = build_lists("service_health", ServiceHealth, health)
+    series = build_columns("service_health", ServiceHealth, health)
+    cutoff = START + datetime.timedelta(minutes=count // 2)
+    keys = list(series)
+
+    started = time.perf_counter()
+    for key in keys:
+        [r.health_score for r in lists[key] if datetime.datetime.fromisoformat(r.timestamp) > cutoff]
+    list_ms = (time.perf_counter() - started) * 1000
+
+    started = time.perf_counter()
+    for key in keys:
+        series[key].since(cutoff).values
+    columnar_ms = (time.perf_counter() - started) * 1000
+    print(f"\nwindow query over {len(keys)} CIs: model lists {list_ms:.1f} ms, columnar {columnar_ms:.1f} ms")
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--records", type=int, default=200000)
+    args = parser.parse_args()
+    datasets = synthetic(args.records)
+    print(f"{'dataset':<16} {'records':>9} {'model lists':>12} {'columnar':>10} {'ratio':>7}")
+    for name, (model, records) in datasets.items():
+        as_lists = retained(build_lists, name, model, records)
+        as_columns = retained(build_columns, name, model, records)
+        print(f"{name:<16} {len(records):>9} {as_lists / 2**20:>8.1f} MiB {as_columns / 2**20:>6.1f} MiB "
+              f"{as_lists / max(as_columns, 1):>6.1f}x")
+    time_window_lookup(args.records, datasets)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,71 @@
+# bench_import_time.py
+"""
+Cold-start import time of the API modules, measured in fresh interpreters.
+
+Exits non-zero when a module takes longer than its budget to import, or when importing it
+loads one of the heavy backends that must stay lazy (torch, sentence_transformers, sklearn,
+the LangChain provider clients).
+
+Usage: python -m benchmarks.bench_import_time --runs 5 --budget-ms 800
+"""
+import argparse
+import json
+import statistics
+import subprocess
+import sys
+
+HEAVY_MODULES = [
+    "torch",
+    "sentence_transformers",
+    "sklearn",
+    "langchain_openai",
+    "langchain_google_genai",
+    "tiktoken",
+]
+
+PROBE = """
+import json, sys, time
+started = time.perf_counter()
+import {module}
+elapsed_ms = (time.perf_counter() - started) * 1000
+print(json.dumps({{"elapsed_ms": elapsed_ms, "loaded": [m for m in {heavy!r} if m in sys.modules]}}))
+"""
+
+
+def measure(module: str, runs: int):
+    timings = []
+    loaded = set()
+    for _ in range(runs):
+        output = subprocess.run(
+            [sys.executable, "-c", PROBE.format(module=module, heavy=HEAVY_MODULES)],
+            capture_output=True, text=True, check=True
+        ).stdout
+        result = json.loads(output.strip().splitlines()[-1])
+        timings.append(result["elapsed_ms"])
+        loaded.update(result["loaded"])
+    return statistics.median(timings), sorted(loaded)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--modules", nargs="+", default=["app", "llm.mi_agent"])
+    parser.add_argument("--runs", type=int, default=5)
+    parser.add_argument("--budget-ms", type=float, default=1000.0, help="median import time allowed per module")
+    args = parser.parse_args()
+
+    failed = False
+    for module in args.modules:
+        median_ms, loaded = measure(module, args.runs)
+        status = "ok"
+        if median_ms > args.budget_ms:
+            status = f"REGRESSION: over the {args.budget_ms:.0f} ms budget"
+            failed = True
+        if loaded:
+            status = f"REGRESSION: eagerly imports {', '.join(loaded)}"
+            failed = True
+        print(f"{module:<16} median {median_ms:8.1f} ms over {args.runs} runs  {status}")
+    sys.exit(1 if failed else 0)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,84 @@
+# bench_loaders.py
+"""
+Load time and peak Python memory for a large synthetic service_health export: the old
+json.load + list of models against the streaming loader feeding the per-CI series index,
+for both a JSON array and NDJSON.
+
+Usage: python -m benchmarks.bench_loaders --records 500000
+"""
+import argparse
+import datetime
+import json
+import os
+import tempfile
+import time
+import tracemalloc
+from pathlib import Path
+from data.loaders import iter_models
+from data.columnar import ColumnarTable
+from data.timeseries import build_series_index
+from models.model import ServiceHealth
+
+
+def write_dataset(directory: str, count: int):
+    start = datetime.datetime(2024, 1, 1)
+    records = (
+        {
+            "ci_id": f"CI{i % 500:04d}",
+            "timestamp": (start + datetime.timedelta(minutes=i)).isoformat(),
+            "health_score": (i % 100) / 100,
+            "status": "Operational",
+        }
+        for i in range(count)
+    )
+    array_path = Path(directory, "service_health.json")
+    ndjson_path = Path(directory, "service_health.ndjson")
+    with open(array_path, 'w') as array_file, open(ndjson_path, 'w') as ndjson_file:
+        array_file.write("[\n")
+        for i, record in enumerate(records):
+            line = json.dumps(record)
+            array_file.write((",\n" if i else "") + line)
+            ndjson_file.write(line + "\n")
+        array_file.write("\n]\n")
+    return array_path, ndjson_path
+
+
+def load_eagerly(path: Path):
+    with open(path, 'r') as f:
+        data = json.load(f)
+    records = [ServiceHealth(**item) for item in data]
+    return build_series_index(ColumnarTable.from_models(ServiceHealth, records, ("timestamp",)), "ci_id", "timestamp", "health_score")
+
+
+def load_streaming(path: Path):
+    table = ColumnarTable.from_models(ServiceHealth, iter_models(path, ServiceHealth), ("timestamp",))
+    return build_series_index(table, "ci_id", "timestamp", "health_score")
+
+
+def measure(label: str, load, path: Path):
+    # Timed and traced in separate runs, since tracemalloc slows allocation-heavy code down a lot
+    started = time.perf_counter()
+    index = load(path)
+    elapsed = time.perf_counter() - started
+    del index
+    tracemalloc.start()
+    index = load(path)
+    _, peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    print(f"{label:<28} {elapsed:7.2f} s   peak {peak / 2**20:8.1f} MiB   {sum(len(s) for s in index.values())} records")
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--records", type=int, default=200000)
+    args = parser.parse_args()
+    with tempfile.TemporaryDirectory() as directory:
+        array_path, ndjson_path = write_dataset(directory, args.records)
+        print(f"{args.records} records, {os.path.getsize(array_path) / 2**20:.1f} MiB as a JSON array")
+        measure("json.load + model list", load_eagerly, array_path)
+        measure("streamed JSON array", load_streaming, array_path)
+        measure("streamed NDJSON", load_streaming, ndjson_path)
+
+
+if __name__ == "__main__":
+    main()
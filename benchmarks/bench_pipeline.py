@@ -0,0 +1,88 @@
+# bench_pipeline.py
+"""
+End-to-end throughput and tail latency of MIDetectionAgent with the offline LLM stub,
+so our own overhead can be separated from provider latency.
+
+Usage: python -m benchmarks.bench_pipeline --requests 500 --concurrency 32 --latency-ms 800 --latency-sigma 0.5
+"""
+import argparse
+import asyncio
+import json
+import time
+import numpy as np
+from llm.backends import LocalStubBackend
+from llm.mi_agent import MIDetectionAgent
+from llm.mi_detection import MIDetectionLLM
+from models.model import Incident
+
+
+def load_incidents(path: str, count: int):
+    """Cycle through the sample incidents, giving each request a distinct id and text"""
+    with open(path, 'r') as f:
+        samples = json.load(f)
+    incidents = []
+    for i in range(count):
+        sample = dict(samples[i % len(samples)])
+        sample["incident_id"] = f"BENCH{i:06d}"
+        sample["description"] = f"{sample['description']} (replay {i})"
+        incidents.append(Incident(**sample))
+    return incidents
+
+
+async def run(agent: MIDetectionAgent, incidents, concurrency: int):
+    semaphore = asyncio.Semaphore(concurrency)
+    latencies = []
+    errors = 0
+
+    async def one(incident):
+        nonlocal errors
+        async with semaphore:
+            started = time.perf_counter()
+            try:
+                await agent.detect_major_incident(incident)
+            except Exception:
+                errors += 1
+            latencies.append((time.perf_counter() - started) * 1000)
+
+    started = time.perf_counter()
+    await asyncio.gather(*(one(incident) for incident in incidents))
+    return np.array(latencies), errors, time.perf_counter() - started
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--data-dir", default="data")
+    parser.add_argument("--incidents", default="data/sample.json")
+    parser.add_argument("--requests", type=int, default=200)
+    parser.add_argument("--concurrency", type=int, default=16)
+    parser.add_argument("--latency-ms", type=float, default=500.0)
+    parser.add_argument("--latency-sigma", type=float, default=0.5)
+    parser.add_argument("--failure-rate", type=float, default=0.0)
+    parser.add_argument("--malformed-rate", type=float, default=0.0)
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--all-llm", action="store_true", help="send every incident to the LLM, ignoring the confidence band")
+    args = parser.parse_args()
+
+    backend = LocalStubBackend(args.latency_ms, args.latency_sigma, args.failure_rate, args.malformed_rate, args.seed)
+    llm_engine = MIDetectionLLM(backend=backend)
+    llm_engine.cache = None  # every request should pay the (simulated) provider round-trip
+    agent = MIDetectionAgent(args.data_dir, llm_engine=llm_engine)
+    if args.all_llm:
+        agent.llm_confidence_band = float("inf")
+    agent.warm_up()
+
+    incidents = load_incidents(args.incidents, args.requests)
+    latencies, errors, wall = asyncio.run(run(agent, incidents, args.concurrency))
+
+    provider_ms = backend.total_latency_ms / backend.calls if backend.calls else 0.0
+    print(f"requests={args.requests} concurrency={args.concurrency} errors={errors} llm_calls={backend.calls}")
+    print(f"throughput: {args.requests / wall:.1f} req/s")
+    for p in (50, 90, 95, 99):
+        print(f"p{p}: {np.percentile(latencies, p):.1f} ms")
+    print(f"mean latency: {latencies.mean():.1f} ms, of which simulated provider: {provider_ms * backend.calls / args.requests:.1f} ms")
+    print(f"pipeline overhead: {latencies.mean() - provider_ms * backend.calls / args.requests:.1f} ms per request")
+    print(json.dumps(agent.get_metrics(), indent=2))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,63 @@
+# bench_user_impact.py
+"""
+User impact for a CI with many users: the old per-incident scan (list membership tests over
+User objects) against the bitsets, one incident at a time and as one vectorized batch.
+
+Usage: python -m benchmarks.bench_user_impact --users 100000 --affected 2000 --incidents 50
+"""
+import argparse
+import random
+import time
+import numpy as np
+from data.user_bitsets import UserBitsets
+from models.model import ServiceCI, User
+
+
+def scan(users_by_id, service_ci, affected_users):
+    """The previous get_user_impact_score: User objects filtered with list membership tests"""
+    service_users = [users_by_id[user_id] for user_id in dict.fromkeys(service_ci.users) if user_id in users_by_id]
+    affected = [u for u in service_users if u.user_id in affected_users]
+    return len(service_users), any(u.is_vip for u in affected), set(u.department for u in affected)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--users", type=int, default=100000)
+    parser.add_argument("--affected", type=int, default=2000)
+    parser.add_argument("--incidents", type=int, default=50)
+    args = parser.parse_args()
+    random.seed(0)
+
+    users = [User(user_id=f"U{i:07d}", name=f"User {i}", department=f"Dept {i % 40}", is_vip=i % 200 == 0)
+             for i in range(args.users)]
+    users_by_id = {user.user_id: user for user in users}
+    service_ci = ServiceCI(ci_id="CI0001", name="CRM Database", type="database", criticality=5,
+                           dependencies=[], users=[user.user_id for user in users])
+    affected = [random.sample(service_ci.users, args.affected) for _ in range(args.incidents)]
+
+    started = time.perf_counter()
+    bitsets = UserBitsets([u.user_id for u in users], np.array([u.is_vip for u in users]), [u.department for u in users])
+    bitsets.precompute([service_ci])
+    print(f"build bitsets: {(time.perf_counter() - started) * 1000:.1f} ms ({bitsets.stats()['bytes'] / 1024:.0f} KiB)")
+
+    # The scan is quadratic, so time it on a few incidents only
+    sample = affected[:3]
+    started = time.perf_counter()
+    for user_ids in sample:
+        scan(users_by_id, service_ci, user_ids)
+    scan_ms = (time.perf_counter() - started) * 1000 / len(sample)
+
+    started = time.perf_counter()
+    for user_ids in affected:
+        bitsets.impact(service_ci, user_ids)
+    single_ms = (time.perf_counter() - started) * 1000 / len(affected)
+
+    started = time.perf_counter()
+    bitsets.impact_batch([service_ci] * len(affected), affected)
+    batch_ms = (time.perf_counter() - started) * 1000 / len(affected)
+
+    print(f"per incident: list scan {scan_ms:.1f} ms, bitsets {single_ms:.2f} ms, batched bitsets {batch_ms:.2f} ms")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,65 @@
+# bench_vector_search.py
+"""
+Recall and latency of the approximate IVF backend against exact search.
+
+Usage: python -m benchmarks.bench_vector_search --size 200000 --dim 384 --queries 200
+"""
+import argparse
+import time
+import numpy as np
+from data.vector_search import ExactSearch, IVFSearch
+
+
+def topic_centers(n_topics: int, dim: int, rng: np.random.Generator) -> np.ndarray:
+    return rng.standard_normal((n_topics, dim)).astype(np.float32)
+
+
+def synthetic_embeddings(n: int, topics: np.ndarray, rng: np.random.Generator) -> np.ndarray:
+    """Clustered unit vectors around the topic centers, a rough stand-in for ticket embeddings that share topics"""
+    x = topics[rng.integers(0, len(topics), n)] + 0.6 * rng.standard_normal((n, topics.shape[1])).astype(np.float32)
+    return x / np.linalg.norm(x, axis=1, keepdims=True)
+
+
+def time_queries(index, queries: np.ndarray, top_n: int):
+    results = []
+    started = time.perf_counter()
+    for q in queries:
+        results.append(index.search(q, top_n)[0])
+    elapsed_ms = (time.perf_counter() - started) * 1000 / len(queries)
+    return results, elapsed_ms
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--size", type=int, default=100000)
+    parser.add_argument("--dim", type=int, default=384)
+    parser.add_argument("--queries", type=int, default=200)
+    parser.add_argument("--top-n", type=int, default=5)
+    parser.add_argument("--n-lists", type=int, default=0)
+    parser.add_argument("--probes", type=int, nargs="+", default=[1, 4, 8, 16, 32])
+    args = parser.parse_args()
+
+    rng = np.random.default_rng(42)
+    topics = topic_centers(max(16, args.size // 500), args.dim, rng)
+    corpus = synthetic_embeddings(args.size, topics, rng)
+    # Queries are new tickets on the same topics, so they land near corpus clusters as real ones do
+    queries = synthetic_embeddings(args.queries, topics, rng)
+
+    exact = ExactSearch().build(corpus)
+    truth, exact_ms = time_queries(exact, queries, args.top_n)
+    print(f"corpus={args.size} dim={args.dim} queries={args.queries} top_n={args.top_n}")
+    print(f"{'backend':<18}{'recall':>8}{'ms/query':>12}{'speedup':>10}")
+    print(f"{'exact':<18}{1.0:>8.3f}{exact_ms:>12.3f}{1.0:>10.1f}")
+
+    started = time.perf_counter()
+    ivf = IVFSearch(n_lists=args.n_lists).build(corpus)
+    print(f"(IVF build: {len(ivf.centroids)} lists in {time.perf_counter() - started:.2f}s)")
+    for n_probe in args.probes:
+        ivf.n_probe = n_probe
+        found, ivf_ms = time_queries(ivf, queries, args.top_n)
+        recall = np.mean([len(np.intersect1d(f, t)) / len(t) for f, t in zip(found, truth)])
+        print(f"{f'ivf n_probe={n_probe}':<18}{recall:>8.3f}{ivf_ms:>12.3f}{exact_ms / ivf_ms:>10.1f}")
+
+
+if __name__ == "__main__":
+    main()
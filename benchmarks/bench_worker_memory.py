@@ -0,0 +1,106 @@
+# bench_worker_memory.py
+"""
+Resident memory of N worker processes, each holding a warmed-up DataRepository, with the
+model loaded in every worker versus encoding through the shared embedding server.
+
+Private (anonymous) memory is what grows per worker; file-backed pages such as the
+memory-mapped embedding index are shared through the page cache.
+
+Usage: python -m benchmarks.bench_worker_memory --workers 4 --data-dir data
+"""
+import argparse
+import json
+import os
+import shutil
+import subprocess
+import sys
+import tempfile
+import time
+from data.embedding_server import EmbeddingClient
+
+WORKER = """
+import json
+from data.repo import DataRepository
+repo = DataRepository({data_dir!r})
+repo.warm_up()
+repo.get_similar_incidents_batch([repo.historical_incidents[0]] if repo.historical_incidents else [])
+status = {{}}
+with open("/proc/self/status") as f:
+    for line in f:
+        key, _, value = line.partition(":")
+        if key in ("VmRSS", "RssAnon", "RssFile"):
+            status[key] = int(value.split()[0]) / 1024
+print(json.dumps(status))
+"""
+
+
+def run_workers(workers: int, data_dir: str, env: dict):
+    procs = [
+        subprocess.Popen([sys.executable, "-c", WORKER.format(data_dir=data_dir)], stdout=subprocess.PIPE, text=True, env=env)
+        for _ in range(workers)
+    ]
+    results = []
+    for proc in procs:
+        output, _ = proc.communicate()
+        if proc.returncode != 0:
+            raise RuntimeError(f"Worker exited with status {proc.returncode}")
+        results.append(json.loads(output.strip().splitlines()[-1]))
+    return results
+
+
+def process_memory(pid: int):
+    status = {}
+    with open(f"/proc/{pid}/status") as f:
+        for line in f:
+            key, _, value = line.partition(":")
+            if key in ("VmRSS", "RssAnon", "RssFile"):
+                status[key] = int(value.split()[0]) / 1024
+    return status
+
+
+def report(label: str, results, server=None):
+    total_rss = sum(r["VmRSS"] for r in results)
+    total_anon = sum(r["RssAnon"] for r in results)
+    line = (f"{label:<24} workers RSS {total_rss:9.1f} MiB  private {total_anon:9.1f} MiB  "
+            f"per worker {total_anon / len(results):8.1f} MiB private")
+    if server:
+        line += f"  + server {server['VmRSS']:8.1f} MiB"
+    print(line)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--workers", type=int, default=4)
+    parser.add_argument("--data-dir", default="data")
+    args = parser.parse_args()
+
+    # Work on a copy so the benchmark never leaves an index file behind in the real data directory
+    scratch = tempfile.mkdtemp(prefix="mi-bench-")
+    data_dir = shutil.copytree(args.data_dir, os.path.join(scratch, "data"))
+    socket_path = os.path.join(scratch, "embedding.sock")
+    server = None
+    try:
+        env = dict(os.environ, MI_EMBEDDING_SERVER="")
+        # Build the index once so neither mode pays for it inside the measured workers
+        run_workers(1, data_dir, env)
+        report("model in every worker", run_workers(args.workers, data_dir, env))
+
+        server = subprocess.Popen(
+            [sys.executable, "-m", "data.embedding_server", "--address", socket_path], stdout=subprocess.DEVNULL
+        )
+        while not EmbeddingClient(socket_path, "")._server_listening():
+            if server.poll() is not None:
+                raise RuntimeError("Embedding server exited during startup")
+            time.sleep(0.2)
+        env = dict(os.environ, MI_EMBEDDING_SERVER=socket_path, MI_EMBEDDING_SERVER_AUTOSTART="0")
+        results = run_workers(args.workers, data_dir, env)
+        report("shared embedding server", results, process_memory(server.pid))
+    finally:
+        if server is not None:
+            server.terminate()
+            server.wait()
+        shutil.rmtree(scratch, ignore_errors=True)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,100 @@
+# config.py
+"""Runtime settings, read from environment variables with defaults for local runs"""
+import os
+
+# Embedding model used for similarity search
+EMBEDDING_MODEL_NAME = os.getenv("MI_EMBEDDING_MODEL", "all-MiniLM-L6-v2")
+
+# Threads available for embedding work, kept off the event loop
+EMBEDDING_WORKERS = int(os.getenv("MI_EMBEDDING_WORKERS", "2"))
+
+# Shared embedding server: a unix socket path makes workers encode through one server process
+# instead of each loading the model (empty keeps the model in-process). With autostart the
+# first worker to need it launches the server. The socket's directory must be private to the user;
+# without an explicit authkey a random one is generated into a 0600 file beside the socket.
+EMBEDDING_SERVER_ADDRESS = os.getenv("MI_EMBEDDING_SERVER", "")
+EMBEDDING_SERVER_AUTOSTART = os.getenv("MI_EMBEDDING_SERVER_AUTOSTART", "1") == "1"
+EMBEDDING_SERVER_AUTHKEY = os.getenv("MI_EMBEDDING_SERVER_AUTHKEY", "")
+
+# Micro-batching of query encodes: concurrent requests are gathered for up to ENCODE_BATCH_WAIT_MS
+# or ENCODE_BATCH_MAX_SIZE texts and encoded together (a max size of 1 disables batching)
+ENCODE_BATCH_MAX_SIZE = int(os.getenv("MI_ENCODE_BATCH_MAX_SIZE", "32"))
+ENCODE_BATCH_WAIT_MS = float(os.getenv("MI_ENCODE_BATCH_WAIT_MS", "2"))
+
+# Query embedding cache: memory budget in MB (0 disables) and optional SQLite file to keep it across restarts
+QUERY_CACHE_MAX_MB = float(os.getenv("MI_QUERY_CACHE_MAX_MB", "64"))
+QUERY_CACHE_SQLITE_PATH = os.getenv("MI_QUERY_CACHE_SQLITE_PATH", "")
+
+# Incremental ingestion of historical incidents: poll historical_incidents.json for edits every N seconds
+# (0 disables), and compact once appended plus tombstoned rows reach this share of the index (and minimum)
+HISTORICAL_WATCH_SECONDS = float(os.getenv("MI_HISTORICAL_WATCH_SECONDS", "0"))
+HISTORICAL_COMPACT_RATIO = float(os.getenv("MI_HISTORICAL_COMPACT_RATIO", "0.2"))
+HISTORICAL_COMPACT_MIN_ROWS = int(os.getenv("MI_HISTORICAL_COMPACT_MIN_ROWS", "1000"))
+
+# Reference data backend: "json" loads the files in data/ into memory, "sqlite" queries the database built by
+# `python -m data.sql_repository import` (a relative path is inside the data directory), with this many
+# pooled read connections per worker process. Historical incidents always come from historical_incidents.json
+# and its overlay log, whichever backend is selected
+DATA_BACKEND = os.getenv("MI_DATA_BACKEND", "json")
+SQLITE_DATABASE_PATH = os.getenv("MI_SQLITE_DATABASE", "reference.db")
+SQLITE_POOL_SIZE = int(os.getenv("MI_SQLITE_POOL_SIZE", "4"))
+
+# Incident storm correlation: incidents on the same service whose text embeddings have at least
+# STORM_SIMILARITY cosine similarity share one detection while they keep arriving within
+# STORM_WINDOW_SECONDS of each other (0 disables)
+STORM_WINDOW_SECONDS = float(os.getenv("MI_STORM_WINDOW_SECONDS", "0"))
+STORM_SIMILARITY = float(os.getenv("MI_STORM_SIMILARITY", "0.85"))
+
+# Similar-incident search backend: "exact" or "ivf"
+SEARCH_BACKEND = os.getenv("MI_SEARCH_BACKEND", "exact")
+IVF_N_LISTS = int(os.getenv("MI_IVF_N_LISTS", "0"))  # 0 picks sqrt(corpus size)
+IVF_N_PROBE = int(os.getenv("MI_IVF_N_PROBE", "8"))
+
+
+def search_backend_options(backend: str) -> dict:
+    """Constructor options for the configured search backend"""
+    if backend == "ivf":
+        return {"n_lists": IVF_N_LISTS, "n_probe": IVF_N_PROBE}
+    return {}
+
+# Weighted scores further than this from the decision threshold skip the LLM call
+LLM_CONFIDENCE_BAND = float(os.getenv("MI_LLM_CONFIDENCE_BAND", "0.15"))
+
+# Weight of the blast radius predictor in the weighted score. It is always computed and reported, but
+# the default 0 leaves scoring as it was: the other weights in use sum to 0.9 and are not rescaled, so a
+# non-zero weight raises every weighted score by weight * blast radius score. That moves incidents
+# across the threshold and out of (or into) the confidence band above, changing which ones reach the LLM.
+BLAST_RADIUS_WEIGHT = float(os.getenv("MI_BLAST_RADIUS_WEIGHT", "0"))
+
+# LLM response cache: in-memory LRU size (0 disables), TTL, and optional SQLite file for the disk tier
+LLM_CACHE_SIZE = int(os.getenv("MI_LLM_CACHE_SIZE", "1024"))
+LLM_CACHE_TTL_SECONDS = float(os.getenv("MI_LLM_CACHE_TTL_SECONDS", "3600"))
+LLM_CACHE_SQLITE_PATH = os.getenv("MI_LLM_CACHE_SQLITE_PATH", "")
+LLM_CACHE_SQLITE_MAX_ENTRIES = int(os.getenv("MI_LLM_CACHE_SQLITE_MAX_ENTRIES", "100000"))
+
+# LLM provider: "openai", "gemini", or "stub" for an offline deterministic stand-in used in load tests
+LLM_PROVIDER = os.getenv("MI_LLM_PROVIDER", "openai")
+LLM_MODEL_NAME = os.getenv("MI_LLM_MODEL", "gpt-3.5-turbo")
+
+# Local stub behaviour: log-normal latency around STUB_LATENCY_MS, and failure / malformed-response rates
+STUB_LATENCY_MS = float(os.getenv("MI_STUB_LATENCY_MS", "0"))
+STUB_LATENCY_SIGMA = float(os.getenv("MI_STUB_LATENCY_SIGMA", "0"))
+STUB_FAILURE_RATE = float(os.getenv("MI_STUB_FAILURE_RATE", "0"))
+STUB_MALFORMED_RATE = float(os.getenv("MI_STUB_MALFORMED_RATE", "0"))
+STUB_SEED = int(os.environ["MI_STUB_SEED"]) if os.getenv("MI_STUB_SEED") else None
+
+# LLM call scheduling: concurrency cap, adaptive deadline bounds and retries with jittered backoff
+LLM_MAX_CONCURRENCY = int(os.getenv("MI_LLM_MAX_CONCURRENCY", "8"))
+LLM_MAX_TIMEOUT_SECONDS = float(os.getenv("MI_LLM_MAX_TIMEOUT_SECONDS", "30"))
+LLM_MIN_TIMEOUT_SECONDS = float(os.getenv("MI_LLM_MIN_TIMEOUT_SECONDS", "5"))
+LLM_MAX_RETRIES = int(os.getenv("MI_LLM_MAX_RETRIES", "2"))
+LLM_BACKOFF_BASE_SECONDS = float(os.getenv("MI_LLM_BACKOFF_BASE_SECONDS", "0.5"))
+
+# Incidents packed into one LLM prompt on batch paths (1 disables packing)
+LLM_PACK_SIZE = int(os.getenv("MI_LLM_PACK_SIZE", "8"))
+
+# Prompt token budget: caps on the variable sections of each incident, and list items shown in details
+LLM_SUMMARY_TOKEN_CAP = int(os.getenv("MI_LLM_SUMMARY_TOKEN_CAP", "64"))
+LLM_DESCRIPTION_TOKEN_CAP = int(os.getenv("MI_LLM_DESCRIPTION_TOKEN_CAP", "512"))
+LLM_DETAILS_TOKEN_CAP = int(os.getenv("MI_LLM_DETAILS_TOKEN_CAP", "512"))
+LLM_DETAIL_LIST_ITEMS = int(os.getenv("MI_LLM_DETAIL_LIST_ITEMS", "10"))
@@ -0,0 +1,170 @@
+#columnar
+from typing import Dict, Iterable, List, Sequence, Tuple, Type
+import datetime
+import numpy as np
+from pydantic import BaseModel
+
+CHUNK_SIZE = 10000
+
+
+class StringPool:
+    """Interns strings as dense int32 codes, so repeated ids are stored once"""
+
+    def __init__(self):
+        self.codes: Dict[str, int] = {}
+        self.strings: List[str] = []
+
+    def intern(self, text: str) -> int:
+        code = self.codes.get(text)
+        if code is None:
+            code = len(self.strings)
+            self.codes[text] = code
+            self.strings.append(text)
+        return code
+
+    def code(self, text: str) -> int:
+        """Code of an already interned string, or -1"""
+        return self.codes.get(text, -1)
+
+    def __getitem__(self, code: int) -> str:
+        return self.strings[code]
+
+    def __len__(self) -> int:
+        return len(self.strings)
+
+
+def parse_timestamps(values: Sequence[str]) -> np.ndarray:
+    """ISO 8601 strings to datetime64[us], parsed by NumPy in one call when it can"""
+    try:
+        return np.array(values, dtype="datetime64[us]")
+    except ValueError:
+        # Forms NumPy rejects (e.g. UTC offsets) go through the standard library
+        return np.array([datetime.datetime.fromisoformat(value) for value in values], dtype="datetime64[us]")
+
+
+class ColumnarTable:
+    """
+    Records of one pydantic model held column by column in NumPy arrays: strings as codes
+    into a StringPool, timestamps as datetime64[us], numbers and flags as native dtypes.
+    Model instances are only built when a caller asks for rows.
+    """
+
+    def __init__(self, model: Type[BaseModel], columns: Dict[str, np.ndarray], pools: Dict[str, StringPool],
+                 time_columns: Tuple[str, ...] = ()):
+        self.model = model
+        self.columns = columns
+        self.pools = pools
+        self.time_columns = time_columns
+
+    @classmethod
+    def from_models(cls, model: Type[BaseModel], records: Iterable[BaseModel],
+                    time_columns: Tuple[str, ...] = ()) -> "ColumnarTable":
+        """Fill the columns from a stream of models, CHUNK_SIZE at a time; the models are not kept"""
+        kinds = {}
+        for name, field in model.model_fields.items():
+            if name in time_columns:
+                kinds[name] = "time"
+            elif field.annotation is str:
+                kinds[name] = "str"
+            elif field.annotation in (float, int, bool):
+                kinds[name] = field.annotation
+            else:
+                kinds[name] = object
+        pools = {name: StringPool() for name, kind in kinds.items() if kind == "str"}
+        chunks: Dict[str, List[np.ndarray]] = {name: [] for name in kinds}
+        pending: List[BaseModel] = []
+
+        def flush():
+            for name, kind in kinds.items():
+                values = [getattr(record, name) for record in pending]
+                if kind == "time":
+                    chunks[name].append(parse_timestamps(values))
+                elif kind == "str":
+                    intern = pools[name].intern
+                    chunks[name].append(np.fromiter((intern(value) for value in values), dtype=np.int32, count=len(values)))
+                elif kind is object:
+                    column = np.empty(len(values), dtype=object)
+                    column[:] = values
+                    chunks[name].append(column)
+                else:
+                    chunks[name].append(np.array(values, dtype=kind))
+            pending.clear()
+
+        for record in records:
+            pending.append(record)
+            if len(pending) >= CHUNK_SIZE:
+                flush()
+        if pending:
+            flush()
+
+        empty = {"time": "datetime64[us]", "str": np.int32, float: np.float64, int: np.int64, bool: bool, object: object}
+        columns = {
+            name: np.concatenate(parts) if parts else np.empty(0, dtype=empty[kinds[name]])
+            for name, parts in chunks.items()
+        }
+        return cls(model, columns, pools, tuple(time_columns))
+
+    def __len__(self) -> int:
+        return len(next(iter(self.columns.values()))) if self.columns else 0
+
+    def column(self, name: str) -> np.ndarray:
+        return self.columns[name]
+
+    def take(self, rows: np.ndarray) -> "ColumnarTable":
+        """A new table holding the given rows in the given order; string pools are shared"""
+        return ColumnarTable(self.model, {name: column[rows] for name, column in self.columns.items()},
+                             self.pools, self.time_columns)
+
+    def value(self, name: str, row: int):
+        value = self.columns[name][row]
+        if name in self.pools:
+            return self.pools[name][value]
+        if name in self.time_columns:
+            return value.astype(datetime.datetime).isoformat()
+        return value.item() if isinstance(value, np.generic) else value
+
+    def row(self, row: int) -> BaseModel:
+        """Build the model for one row; the data was validated on load, so validation is skipped"""
+        return self.model.model_construct(**{name: self.value(name, row) for name in self.columns})
+
+    def rows(self, rows: Iterable[int]) -> List[BaseModel]:
+        return [self.row(row) for row in rows]
+
+    def nbytes(self) -> int:
+        """Approximate memory held by the columns and string pools"""
+        total = sum(column.nbytes for column in self.columns.values())
+        for pool in self.pools.values():
+            total += sum(len(text) + 49 for text in pool.strings) + 100 * len(pool)
+        return total
+
+
+def group_rows(table: ColumnarTable, key: str) -> Tuple[ColumnarTable, Dict[str, Tuple[int, int]]]:
+    """
+    Sort a table by a string column (stably, so load order is kept within a key) and return it
+    with key -> (start, end) row ranges.
+    """
+    order = np.argsort(table.column(key), kind="stable")
+    return _ranges(table.take(order), key)
+
+
+def _ranges(table: ColumnarTable, key: str) -> Tuple[ColumnarTable, Dict[str, Tuple[int, int]]]:
+    codes = table.column(key)
+    if not len(codes):
+        return table, {}
+    boundaries = np.flatnonzero(np.diff(codes)) + 1
+    starts = np.concatenate(([0], boundaries))
+    ends = np.concatenate((boundaries, [len(codes)]))
+    pool = table.pools[key]
+    return table, {pool[int(codes[start])]: (int(start), int(end)) for start, end in zip(starts, ends)}
+
+
+def sort_by_key_and_time(table: ColumnarTable, key: str, time_column: str) -> Tuple[ColumnarTable, Dict[str, Tuple[int, int]]]:
+    """Sort a table by key, then timestamp, and return it with key -> (start, end) row ranges"""
+    order = np.lexsort((table.column(time_column), table.column(key)))
+    return _ranges(table.take(order), key)
+
+
+def row_lookup(table: ColumnarTable, key: str) -> Dict[str, int]:
+    """key -> row for a unique string column; the last row wins on duplicates"""
+    pool = table.pools[key]
+    return {pool[int(code)]: row for row, code in enumerate(table.column(key))}
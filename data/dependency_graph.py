@@ -0,0 +1,231 @@
+#dependency_graph
+from typing import Dict, FrozenSet, Iterable, Iterator, List, Set
+import threading
+from models.model import ServiceCI, BlastRadius
+
+# Criticality from which a downstream CI is named in the blast radius
+CRITICAL_LEVEL = 4
+
+
+class DependencyGraph:
+    """
+    CI dependency graph with a reverse index (CI -> CIs listing it as a dependency) and the
+    blast radius of every CI precomputed from the transitive closure of that index, so a
+    lookup is one dict access. Upserting or removing CIs recomputes only the CIs upstream of
+    them; readers never wait, as the precomputed table is swapped in whole.
+    """
+
+    def __init__(self, service_cis: Iterable[ServiceCI] = ()):
+        self._lock = threading.Lock()
+        self._cis: Dict[str, ServiceCI] = {}
+        self._dependents: Dict[str, Set[str]] = {}
+        # Later CIs win on duplicate ids, as in DataRepository.get_service_ci_by_id
+        for ci in service_cis:
+            self._link(ci)
+        self._radius: Dict[str, BlastRadius] = self._compute_all()
+
+    def dependents(self, ci_id: str) -> FrozenSet[str]:
+        """CIs that list ci_id as a direct dependency"""
+        return frozenset(self._dependents.get(ci_id, ()))
+
+    def blast_radius(self, ci_id: str) -> BlastRadius:
+        radius = self._radius.get(ci_id)
+        if radius is None:
+            return BlastRadius(ci_id=ci_id, direct_dependents=0, downstream_cis=0, downstream_users=0,
+                               downstream_criticality=0, critical_dependents=[])
+        return radius
+
+    def upsert(self, service_cis: Iterable[ServiceCI]):
+        """Add CIs, or replace the ones with the same ci_id"""
+        with self._lock:
+            service_cis = list(service_cis)
+            changed = {ci.ci_id for ci in service_cis}
+            # CIs whose downstream may change: upstream of a changed CI before or after the edit
+            affected = self._upstream(changed)
+            for ci in service_cis:
+                self._link(ci)
+            self._refresh(affected | self._upstream(changed))
+
+    def remove(self, ci_ids: Iterable[str]) -> int:
+        """Drop CIs from the graph; returns how many were present"""
+        with self._lock:
+            removed = {ci_id for ci_id in ci_ids if ci_id in self._cis}
+            affected = self._upstream(removed)
+            for ci_id in removed:
+                self._unlink(self._cis[ci_id])
+            self._refresh(affected)
+            return len(removed)
+
+    def stats(self) -> Dict:
+        return {
+            "cis": len(self._cis),
+            "edges": sum(len(dependents) for dependents in self._dependents.values()),
+        }
+
+    def _link(self, ci: ServiceCI):
+        previous = self._cis.get(ci.ci_id)
+        if previous is not None:
+            self._unlink(previous)
+        self._cis[ci.ci_id] = ci
+        for dependency in ci.dependencies:
+            if dependency != ci.ci_id:
+                self._dependents.setdefault(dependency, set()).add(ci.ci_id)
+
+    def _unlink(self, ci: ServiceCI):
+        del self._cis[ci.ci_id]
+        for dependency in ci.dependencies:
+            dependents = self._dependents.get(dependency)
+            if dependents is not None:
+                dependents.discard(ci.ci_id)
+                if not dependents:
+                    del self._dependents[dependency]
+
+    def _nodes(self) -> Set[str]:
+        """Every CI, plus ids that are only referenced as dependencies"""
+        return set(self._cis) | set(self._dependents)
+
+    def _upstream(self, ci_ids: Set[str]) -> Set[str]:
+        """ci_ids and everything they depend on, directly or transitively"""
+        seen = set(ci_ids)
+        pending = list(ci_ids)
+        while pending:
+            ci = self._cis.get(pending.pop())
+            if ci is None:
+                continue
+            for dependency in ci.dependencies:
+                if dependency not in seen:
+                    seen.add(dependency)
+                    pending.append(dependency)
+        return seen
+
+    def _downstream(self, ci_id: str) -> Set[str]:
+        """Every CI depending on ci_id directly or transitively, by walking the reverse index"""
+        seen = set()
+        pending = [ci_id]
+        while pending:
+            for dependent in self._dependents.get(pending.pop(), ()):
+                if dependent not in seen:
+                    seen.add(dependent)
+                    pending.append(dependent)
+        seen.discard(ci_id)
+        return seen
+
+    def _refresh(self, affected: Set[str]):
+        radius = dict(self._radius)
+        nodes = self._nodes()
+        for ci_id in affected:
+            if ci_id in nodes:
+                radius[ci_id] = self._summarize(ci_id, self._downstream(ci_id))
+            else:
+                radius.pop(ci_id, None)
+        self._radius = radius
+
+    def _summarize(self, ci_id: str, downstream: Iterable[str]) -> BlastRadius:
+        users: Set[str] = set()
+        criticality = 0
+        critical = []
+        count = 0
+        for dependent_id in downstream:
+            count += 1
+            ci = self._cis.get(dependent_id)
+            if ci is None:
+                continue
+            users.update(ci.users)
+            criticality += ci.criticality
+            if ci.criticality >= CRITICAL_LEVEL:
+                critical.append(ci.name)
+        return BlastRadius(
+            ci_id=ci_id,
+            direct_dependents=len(self._dependents.get(ci_id, ())),
+            downstream_cis=count,
+            downstream_users=len(users),
+            downstream_criticality=criticality,
+            critical_dependents=sorted(critical),
+        )
+
+    def _compute_all(self) -> Dict[str, BlastRadius]:
+        """
+        Blast radius of every node in one pass: strongly connected components of the reverse
+        index (dependency cycles) are collapsed, then each component's downstream set is the
+        union of its successors' sets, held as int bitsets and built sinks first.
+        """
+        nodes = sorted(self._nodes())
+        position = {ci_id: i for i, ci_id in enumerate(nodes)}
+        successors = [[position[d] for d in self._dependents.get(ci_id, ())] for ci_id in nodes]
+        components = _strongly_connected(successors)
+
+        component_of = [0] * len(nodes)
+        for c, members in enumerate(components):
+            for member in members:
+                component_of[member] = c
+        member_bits = [sum(1 << member for member in members) for members in components]
+        reach = [0] * len(components)
+        # Tarjan emits a component only after every component it reaches
+        for c, members in enumerate(components):
+            bits = 0
+            for member in members:
+                for successor in successors[member]:
+                    other = component_of[successor]
+                    if other != c:
+                        bits |= reach[other] | member_bits[other]
+            reach[c] = bits
+
+        radius = {}
+        for c, members in enumerate(components):
+            for member in members:
+                # Members of a cycle are downstream of each other
+                bits = (reach[c] | member_bits[c]) & ~(1 << member)
+                radius[nodes[member]] = self._summarize(nodes[member], _bit_members(bits, nodes))
+        return radius
+
+
+def _strongly_connected(successors: List[List[int]]) -> List[List[int]]:
+    """Tarjan's algorithm without recursion; components come out sinks first"""
+    index = [-1] * len(successors)
+    low = [0] * len(successors)
+    on_stack = [False] * len(successors)
+    stack: List[int] = []
+    components = []
+    counter = 0
+    for root in range(len(successors)):
+        if index[root] >= 0:
+            continue
+        index[root] = low[root] = counter
+        counter += 1
+        stack.append(root)
+        on_stack[root] = True
+        work = [(root, iter(successors[root]))]
+        while work:
+            node, children = work[-1]
+            child = next(children, None)
+            if child is not None:
+                if index[child] < 0:
+                    index[child] = low[child] = counter
+                    counter += 1
+                    stack.append(child)
+                    on_stack[child] = True
+                    work.append((child, iter(successors[child])))
+                elif on_stack[child]:
+                    low[node] = min(low[node], index[child])
+                continue
+            work.pop()
+            if work:
+                parent = work[-1][0]
+                low[parent] = min(low[parent], low[node])
+            if low[node] == index[node]:
+                members = []
+                while True:
+                    member = stack.pop()
+                    on_stack[member] = False
+                    members.append(member)
+                    if member == node:
+                        break
+                components.append(members)
+    return components
+
+
+def _bit_members(bits: int, nodes: List[str]) -> Iterator[str]:
+    while bits:
+        lowest = bits & -bits
+        yield nodes[lowest.bit_length() - 1]
+        bits ^= lowest
@@ -0,0 +1,136 @@
+#embedding_index
+from typing import Callable, Dict, Iterable, List, Optional, Tuple
+from pathlib import Path
+import hashlib
+import json
+import os
+import struct
+import threading
+import numpy as np
+
+# File layout: MAGIC | uint32 header length | JSON header | padding to DATA_ALIGNMENT | float32 matrix
+MAGIC = b"MIEMB001"
+DATA_ALIGNMENT = 64
+INDEX_SUFFIX = ".emb"
+
+
+def file_sha256(path: Path, chunk_size: int = 1 << 20) -> str:
+    """Hash a file in chunks so large sources never need to be read into memory at once"""
+    digest = hashlib.sha256()
+    with open(path, 'rb') as f:
+        for chunk in iter(lambda: f.read(chunk_size), b""):
+            digest.update(chunk)
+    return digest.hexdigest()
+
+
+def index_path_for(source_path: Path) -> Path:
+    """The index lives next to its source, e.g. historical_incidents.json -> historical_incidents.emb"""
+    return source_path.with_suffix(INDEX_SUFFIX)
+
+
+def read_header(index_path: Path) -> Tuple[Dict, int]:
+    """Return the JSON header of an index file and the byte offset at which the matrix starts"""
+    with open(index_path, 'rb') as f:
+        if f.read(len(MAGIC)) != MAGIC:
+            raise ValueError(f"Not an embedding index file: {index_path}")
+        (header_len,) = struct.unpack("<I", f.read(4))
+        header = json.loads(f.read(header_len).decode("utf-8"))
+    offset = _data_offset(header_len)
+    return header, offset
+
+
+def _data_offset(header_len: int) -> int:
+    raw = len(MAGIC) + 4 + header_len
+    return (raw + DATA_ALIGNMENT - 1) // DATA_ALIGNMENT * DATA_ALIGNMENT
+
+
+def write_index(index_path: Path, embeddings: np.ndarray, model_name: str, source_sha256: str) -> np.ndarray:
+    """Write the matrix with its header to a temp file, then atomically swap it into place"""
+    embeddings = np.asarray(embeddings, dtype=np.float32)
+    if embeddings.ndim != 2:
+        raise ValueError(f"Expected a 2-D embedding matrix, got shape {embeddings.shape}")
+    return write_index_blocks(index_path, [embeddings], embeddings.shape[0], embeddings.shape[1], model_name, source_sha256)
+
+
+def write_index_blocks(index_path: Path, blocks: Iterable[np.ndarray], count: int, dim: int,
+                       model_name: str, source_sha256: str) -> np.ndarray:
+    """
+    write_index for a matrix produced block by block, so it is never held in memory whole.
+    Returns the written matrix memory-mapped; the mapping is taken before the rename, so it
+    stays valid even if another process replaces or deletes the file right after.
+    """
+    header = {
+        "model_name": model_name,
+        "source_sha256": source_sha256,
+        "count": int(count),
+        "dim": int(dim),
+        "dtype": "float32",
+    }
+    header_bytes = json.dumps(header, sort_keys=True).encode("utf-8")
+    offset = _data_offset(len(header_bytes))
+    tmp_path = index_path.with_name(f"{index_path.name}.{os.getpid()}.{threading.get_ident()}.tmp")
+    written = 0
+    with open(tmp_path, 'wb') as f:
+        f.write(MAGIC)
+        f.write(struct.pack("<I", len(header_bytes)))
+        f.write(header_bytes)
+        f.write(b"\0" * (offset - f.tell()))
+        for block in blocks:
+            block = np.ascontiguousarray(block, dtype=np.float32)
+            if block.ndim != 2 or (len(block) and block.shape[1] != dim):
+                raise ValueError(f"Expected blocks of shape (n, {dim}), got {block.shape}")
+            f.write(block.tobytes())
+            written += len(block)
+    if written != count:
+        os.remove(tmp_path)
+        raise ValueError(f"Expected {count} embedding rows, got {written}")
+    if count == 0:
+        embeddings = np.zeros((0, dim), dtype=np.float32)
+    else:
+        embeddings = np.memmap(tmp_path, dtype=np.float32, mode='r', offset=offset, shape=(count, dim))
+    os.replace(tmp_path, index_path)
+    return embeddings
+
+
+def open_index(index_path: Path, model_name: str, source_sha256: str) -> Optional[np.ndarray]:
+    """Memory-map an index file, or return None when it is missing or stale"""
+    if not index_path.exists():
+        return None
+    try:
+        header, offset = read_header(index_path)
+    except (ValueError, OSError, struct.error) as e:
+        print(f"Ignoring unreadable embedding index {index_path}: {e}")
+        return None
+    if header.get("model_name") != model_name or header.get("source_sha256") != source_sha256:
+        return None
+    shape = (header["count"], header["dim"])
+    if shape[0] == 0:
+        return np.zeros(shape, dtype=np.float32)
+    return np.memmap(index_path, dtype=np.float32, mode='r', offset=offset, shape=shape)
+
+
+def load_or_build_index(
+    source_path: Path,
+    model_name: str,
+    texts_fn: Callable[[], List[str]],
+    encode_fn: Callable[[List[str]], np.ndarray],
+) -> np.ndarray:
+    """
+    Return the L2-normalized embedding matrix for a source file, rebuilding the on-disk
+    index whenever the source content or the embedding model has changed.
+    """
+    index_path = index_path_for(source_path)
+    source_sha256 = file_sha256(source_path) if source_path.exists() else ""
+    embeddings = open_index(index_path, model_name, source_sha256)
+    if embeddings is not None:
+        return embeddings
+
+    print(f"Building embedding index {index_path} with {model_name}...")
+    texts = texts_fn()
+    if texts:
+        embeddings = np.asarray(encode_fn(texts), dtype=np.float32)
+    else:
+        embeddings = np.zeros((0, 0), dtype=np.float32)
+    if source_path.exists():
+        return write_index(index_path, embeddings, model_name, source_sha256)
+    return embeddings
@@ -0,0 +1,219 @@
+#embedding_server
+"""
+One process that owns the sentence-transformers model and encodes texts for every uvicorn
+worker over a local socket. Workers talk to it through EmbeddingClient and never load torch
+themselves; the historical embedding matrix is already shared between them through the
+memory-mapped .emb index, so per-worker memory stays small as workers are added.
+
+Run it directly with `python -m data.embedding_server`, or let the first worker start it
+(MI_EMBEDDING_SERVER_AUTOSTART).
+
+Connections unpickle what they receive, so they are authenticated: the socket must live in a
+directory only the current user can open, and the key is MI_EMBEDDING_SERVER_AUTHKEY or, when
+that is unset, a random key kept in a 0600 file next to the socket.
+"""
+from typing import List, Optional
+from multiprocessing.connection import Client, Listener
+import argparse
+import fcntl
+import os
+import secrets
+import stat
+import subprocess
+import tempfile
+import sys
+import threading
+import time
+import numpy as np
+import config
+
+
+class EmbeddingServerError(RuntimeError):
+    """The embedding server could not be reached or failed to encode"""
+
+
+def default_address() -> str:
+    """Socket path inside a per-user directory under the system temp dir"""
+    return os.path.join(tempfile.gettempdir(), f"mi-embedding-{os.getuid()}", "server.sock")
+
+
+def _check_private(path: str, mode_mask: int):
+    info = os.stat(path)
+    if info.st_uid != os.getuid() or info.st_mode & mode_mask:
+        raise EmbeddingServerError(
+            f"{path} must be owned by the current user and not accessible to others "
+            f"(found mode {stat.filemode(info.st_mode)})"
+        )
+
+
+def _private_dir(address: str) -> str:
+    """Create the socket's directory as 0700 if needed, and refuse one that other users can reach"""
+    directory = os.path.dirname(os.path.abspath(address))
+    os.makedirs(directory, mode=0o700, exist_ok=True)
+    _check_private(directory, 0o077)
+    return directory
+
+
+def _authkey(address: str) -> bytes:
+    """The configured secret, or the random key stored beside the socket (created on first use)"""
+    _private_dir(address)
+    if config.EMBEDDING_SERVER_AUTHKEY:
+        return config.EMBEDDING_SERVER_AUTHKEY.encode("utf-8")
+    key_path = f"{address}.key"
+    if not os.path.exists(key_path):
+        # Write the key under a temporary name and link it into place, so a concurrent
+        # reader never sees a partly written file and only one key ever wins
+        fd, tmp_path = tempfile.mkstemp(dir=os.path.dirname(key_path))  # created 0600
+        try:
+            with os.fdopen(fd, "wb") as f:
+                f.write(secrets.token_hex(32).encode("ascii"))
+            os.link(tmp_path, key_path)
+        except FileExistsError:
+            pass
+        finally:
+            os.unlink(tmp_path)
+    _check_private(key_path, 0o077)
+    with open(key_path, "rb") as f:
+        return f.read()
+
+
+def serve(address: str, model_name: str):
+    """Load the model once and answer ("encode", texts) requests until the process is stopped"""
+    from sentence_transformers import SentenceTransformer
+    model = SentenceTransformer(model_name, device="cpu")
+    model.encode(["warm up"])
+    # Requests from different workers are encoded one batch at a time; torch parallelises inside a batch
+    encode_lock = threading.Lock()
+
+    def handle(conn):
+        with conn:
+            while True:
+                try:
+                    op, payload = conn.recv()
+                except (EOFError, OSError):
+                    return
+                try:
+                    if op == "encode":
+                        with encode_lock:
+                            embeddings = model.encode(payload, convert_to_numpy=True, normalize_embeddings=True)
+                        conn.send(("ok", embeddings.astype(np.float32, copy=False)))
+                    elif op == "ping":
+                        conn.send(("ok", model_name))
+                    else:
+                        conn.send(("error", f"Unknown operation '{op}'"))
+                except Exception as e:
+                    conn.send(("error", str(e)))
+
+    authkey = _authkey(address)
+    if os.path.exists(address):
+        os.unlink(address)  # stale socket from a previous run
+    with Listener(address, family="AF_UNIX", authkey=authkey) as listener:
+        print(f"Embedding server for {model_name} listening on {address}")
+        while True:
+            conn = listener.accept()
+            threading.Thread(target=handle, args=(conn,), daemon=True).start()
+
+
+class EmbeddingClient:
+    """
+    Worker-side handle to the embedding server. Each thread keeps its own connection, since
+    a connection carries one request/response at a time.
+    """
+
+    def __init__(self, address: str, model_name: str, autostart: bool = False, start_timeout: float = 120.0):
+        self.address = address
+        self.model_name = model_name
+        self.autostart = autostart
+        self.start_timeout = start_timeout
+        self._local = threading.local()
+
+    def _connect(self):
+        conn = getattr(self._local, "conn", None)
+        if conn is None:
+            try:
+                conn = self._open()
+            except (FileNotFoundError, ConnectionRefusedError):
+                if not self.autostart:
+                    raise EmbeddingServerError(f"No embedding server listening on {self.address}")
+                self._start_server()
+                conn = self._open()
+            self._local.conn = conn
+        return conn
+
+    def _open(self):
+        """Connect and make sure the server encodes with the same model this worker expects"""
+        conn = Client(self.address, family="AF_UNIX", authkey=_authkey(self.address))
+        try:
+            conn.send(("ping", None))
+            status, server_model = conn.recv()
+        except (EOFError, OSError) as e:
+            conn.close()
+            raise EmbeddingServerError(f"Embedding server on {self.address} did not answer: {e}") from e
+        if status != "ok" or server_model != self.model_name:
+            conn.close()
+            raise EmbeddingServerError(
+                f"Embedding server on {self.address} serves model '{server_model}', expected '{self.model_name}'"
+            )
+        return conn
+
+    def _start_server(self):
+        """Start the server unless another worker already has; a lock file makes the choice once"""
+        with open(f"{self.address}.lock", "w") as lock:
+            fcntl.flock(lock, fcntl.LOCK_EX)
+            if self._server_listening():
+                return
+            print(f"Starting embedding server on {self.address}")
+            subprocess.Popen(
+                [sys.executable, "-m", "data.embedding_server", "--address", self.address, "--model", self.model_name],
+                stdin=subprocess.DEVNULL,
+                start_new_session=True,
+            )
+            deadline = time.monotonic() + self.start_timeout
+            while not self._server_listening():
+                if time.monotonic() > deadline:
+                    raise EmbeddingServerError(f"Embedding server did not start on {self.address} within {self.start_timeout:.0f}s")
+                time.sleep(0.2)
+
+    def _server_listening(self) -> bool:
+        try:
+            with Client(self.address, family="AF_UNIX", authkey=_authkey(self.address)) as conn:
+                conn.send(("ping", None))
+                return conn.recv()[0] == "ok"
+        except (FileNotFoundError, ConnectionRefusedError, EOFError):
+            return False
+
+    def _request(self, op: str, payload):
+        conn = self._connect()
+        try:
+            conn.send((op, payload))
+            status, result = conn.recv()
+        except (EOFError, OSError) as e:
+            # Drop the broken connection so the next call reconnects (and restarts the server if allowed)
+            self._local.conn = None
+            raise EmbeddingServerError(f"Lost connection to embedding server: {e}") from e
+        if status != "ok":
+            raise EmbeddingServerError(result)
+        return result
+
+    def encode(self, texts: List[str]) -> np.ndarray:
+        """L2-normalized float32 embeddings, computed by the server"""
+        return self._request("encode", list(texts))
+
+    def ping(self) -> str:
+        """Name of the model the server has loaded"""
+        return self._request("ping", None)
+
+
+def create_embedding_client(model_name: str) -> Optional[EmbeddingClient]:
+    """The client for the configured server, or None when the model should run in-process"""
+    if not config.EMBEDDING_SERVER_ADDRESS:
+        return None
+    return EmbeddingClient(config.EMBEDDING_SERVER_ADDRESS, model_name, autostart=config.EMBEDDING_SERVER_AUTOSTART)
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Serve sentence-transformers embeddings to local workers")
+    parser.add_argument("--address", default=config.EMBEDDING_SERVER_ADDRESS or default_address())
+    parser.add_argument("--model", default=config.EMBEDDING_MODEL_NAME)
+    args = parser.parse_args()
+    serve(args.address, args.model)
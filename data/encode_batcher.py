@@ -0,0 +1,111 @@
+#encode_batcher
+from typing import Callable, Dict, List, Tuple
+from collections import Counter
+from concurrent.futures import Future
+import asyncio
+import queue
+import threading
+import time
+import numpy as np
+
+
+class EncodeBatcher:
+    """
+    Micro-batcher in front of an encode function. Requests from any thread or coroutine are
+    queued; one background thread takes the first waiting request, keeps collecting for up
+    to max_wait_ms or until max_batch_size texts are gathered, runs a single encode over all
+    of them, and hands each caller back its own rows.
+    """
+
+    def __init__(self, encode_fn: Callable[[List[str]], np.ndarray], max_batch_size: int = 32,
+                 max_wait_ms: float = 2.0):
+        self.encode_fn = encode_fn
+        self.max_batch_size = max_batch_size
+        self.max_wait_ms = max_wait_ms
+        self._queue: "queue.Queue[Tuple[List[str], Future]]" = queue.Queue()
+        self._thread = None
+        self._start_lock = threading.Lock()
+        self._stats_lock = threading.Lock()
+        self._batch_sizes: Counter = Counter()
+        self._stats = {"requests": 0, "texts": 0, "batches": 0, "failed_batches": 0, "encode_ms": 0.0}
+
+    def _ensure_started(self):
+        if self._thread is None:
+            with self._start_lock:
+                if self._thread is None:
+                    self._thread = threading.Thread(target=self._run, name="mi-encode-batcher", daemon=True)
+                    self._thread.start()
+
+    def submit(self, texts: List[str]) -> Future:
+        """Queue texts for the next batch; the future resolves to their (len(texts), dim) embeddings"""
+        future: Future = Future()
+        self._ensure_started()
+        self._queue.put((list(texts), future))
+        return future
+
+    def encode(self, texts: List[str]) -> np.ndarray:
+        """Blocking encode through the batcher, for callers on worker threads"""
+        return self.submit(texts).result()
+
+    async def aencode(self, texts: List[str]) -> np.ndarray:
+        """Encode through the batcher without holding a thread while waiting"""
+        return await asyncio.wrap_future(self.submit(texts))
+
+    def _collect(self) -> List[Tuple[List[str], Future]]:
+        """Block for the first request, then gather more until the window closes or the batch is full"""
+        batch = [self._queue.get()]
+        size = len(batch[0][0])
+        deadline = time.monotonic() + self.max_wait_ms / 1000
+        while size < self.max_batch_size:
+            remaining = deadline - time.monotonic()
+            if remaining <= 0:
+                break
+            try:
+                request = self._queue.get(timeout=remaining)
+            except queue.Empty:
+                break
+            batch.append(request)
+            size += len(request[0])
+        return batch
+
+    def _run(self):
+        while True:
+            try:
+                self._process(self._collect())
+            except Exception as e:
+                print(f"Encode batcher iteration failed: {e}")
+
+    def _process(self, batch: List[Tuple[List[str], Future]]):
+        # Claim each future before encoding; callers that were cancelled while queued are dropped
+        batch = [(request_texts, future) for request_texts, future in batch
+                 if future.set_running_or_notify_cancel()]
+        if not batch:
+            return
+        texts = [text for request_texts, _ in batch for text in request_texts]
+        started = time.perf_counter()
+        try:
+            embeddings = self.encode_fn(texts)
+        except Exception as e:
+            with self._stats_lock:
+                self._stats["failed_batches"] += 1
+            for _, future in batch:
+                future.set_exception(e)
+            return
+        with self._stats_lock:
+            self._stats["requests"] += len(batch)
+            self._stats["texts"] += len(texts)
+            self._stats["batches"] += 1
+            self._stats["encode_ms"] += (time.perf_counter() - started) * 1000
+            self._batch_sizes[len(texts)] += 1
+        offset = 0
+        for request_texts, future in batch:
+            future.set_result(embeddings[offset:offset + len(request_texts)])
+            offset += len(request_texts)
+
+    def stats(self) -> Dict:
+        with self._stats_lock:
+            stats = dict(self._stats)
+            stats["batch_size_histogram"] = {str(size): count for size, count in sorted(self._batch_sizes.items())}
+        stats["queue_depth"] = self._queue.qsize()
+        stats["avg_batch_size"] = stats["texts"] / stats["batches"] if stats["batches"] else 0.0
+        return stats
@@ -0,0 +1,514 @@
+#historical_store
+from typing import Callable, Dict, Iterable, List, Optional, Tuple
+from pathlib import Path
+import base64
+import hashlib
+import json
+import os
+import threading
+import time
+import numpy as np
+from models.model import HistoricalIncident
+from data.embedding_index import INDEX_SUFFIX, load_or_build_index, open_index, write_index_blocks
+from data.vector_search import VectorSearch, create_search_backend
+from data.loaders import iter_models
+
+# Compacted indexes are written beside the source as <stem>.compacted-<content hash><INDEX_SUFFIX>
+COMPACTED_INFIX = ".compacted-"
+# Rows gathered at a time while writing a compacted index
+COMPACT_BLOCK_ROWS = 65536
+# dead_at value of a row that has not been tombstoned
+ALIVE = np.iinfo(np.int64).max
+
+
+def incident_text(incident) -> str:
+    """Text that is embedded for similarity search"""
+    return f"{incident.summary} {incident.description}"
+
+
+def _pack_embedding(vector: np.ndarray) -> str:
+    return base64.b64encode(np.asarray(vector, dtype="<f4").tobytes()).decode("ascii")
+
+
+def _unpack_embedding(text: str) -> np.ndarray:
+    return np.frombuffer(base64.b64decode(text), dtype="<f4").astype(np.float32)
+
+
+class HistoricalSnapshot:
+    """
+    Immutable view of the historical incidents. Rows [0, base_count) are covered by the
+    search index built at load or compaction time; rows [base_count, count) are a small delta
+    searched exactly. Replaced or removed rows stay in place but are tombstoned.
+
+    The row list, the delta buffer and the tombstones are shared with the snapshots published
+    before and after this one, so a write costs only the rows it touches. A snapshot reads the
+    first `count` rows, and a tombstone records the version that set it, which leaves it unseen
+    by older snapshots. Readers take one snapshot and use it throughout, so writers never block them.
+    """
+
+    def __init__(self, incidents: List[HistoricalIncident], count: int, base_index: VectorSearch,
+                 delta_embeddings: np.ndarray, dead_at: np.ndarray, version: int, live_count: int):
+        self.incidents = incidents
+        self.count = count
+        self.base_index = base_index
+        self.base_count = len(base_index)
+        self.delta_embeddings = delta_embeddings
+        # dead_at[row]: version that tombstoned the row, or ALIVE
+        self.dead_at = dead_at
+        self.version = version
+        self.live_count = live_count
+        self.dead_count = count - live_count
+        self._dead: Optional[np.ndarray] = None
+        self._live_incidents: Optional[List[HistoricalIncident]] = None
+
+    def __len__(self) -> int:
+        return self.live_count
+
+    @property
+    def dead(self) -> np.ndarray:
+        """Tombstone flags of rows [0, count) as of this snapshot"""
+        if self._dead is None:
+            self._dead = self.dead_at[:self.count] <= self.version
+        return self._dead
+
+    @property
+    def live_incidents(self) -> List[HistoricalIncident]:
+        if self._live_incidents is None:
+            self._live_incidents = [self.incidents[row] for row in np.flatnonzero(~self.dead)]
+        return self._live_incidents
+
+    def embeddings_for(self, rows: np.ndarray) -> np.ndarray:
+        """Embedding rows, gathered from the base matrix and the delta"""
+        in_base = rows[rows < self.base_count]
+        in_delta = rows[rows >= self.base_count] - self.base_count
+        parts = []
+        if len(in_base):
+            parts.append(np.asarray(self.base_index.embeddings[in_base], dtype=np.float32))
+        if len(in_delta) or not parts:
+            parts.append(self.delta_embeddings[in_delta])
+        return np.vstack(parts)
+
+    def search_batch(self, queries: np.ndarray, top_n: int) -> Tuple[np.ndarray, np.ndarray]:
+        """Top rows per query across base and delta, skipping tombstones; rows are padded with -1 / -inf"""
+        # Ask the base index for enough extra neighbours to cover any tombstoned ones it returns
+        base_k = min(self.base_count, top_n + self.dead_count)
+        rows, sims = self.base_index.search_batch(queries, base_k)
+        if len(self.delta_embeddings):
+            delta_sims = queries @ self.delta_embeddings.T
+            delta_rows = np.broadcast_to(np.arange(self.base_count, self.count), delta_sims.shape)
+            rows = np.concatenate([rows, delta_rows], axis=1)
+            sims = np.concatenate([sims, delta_sims.astype(np.float32, copy=False)], axis=1)
+        valid = rows >= 0
+        valid[valid] = self.dead_at[rows[valid]] > self.version
+        sims = np.where(valid, sims, -np.inf)
+        k = min(top_n, sims.shape[1])
+        order = np.argsort(-sims, axis=1, kind='stable')[:, :k]
+        rows = np.where(np.isfinite(np.take_along_axis(sims, order, axis=1)), np.take_along_axis(rows, order, axis=1), -1)
+        return rows, np.take_along_axis(sims, order, axis=1)
+
+    def search(self, query: np.ndarray, top_n: int) -> Tuple[np.ndarray, np.ndarray]:
+        rows, sims = self.search_batch(query[None, :], top_n)
+        keep = rows[0] >= 0
+        return rows[0][keep], sims[0][keep]
+
+
+class HistoricalStore:
+    """
+    Owns the historical incidents and their embeddings, and accepts new, edited and removed
+    incidents without a restart. Each change encodes only the affected incidents and
+    publishes a new HistoricalSnapshot with one reference swap. Compaction folds the delta
+    and tombstones back into a fresh search index over a memory-mapped .emb file named by a
+    hash of the rows' texts, so workers compacting to the same rows share one file.
+
+    The source file is never written. Changes made through the API are appended to an
+    overlay log beside it (historical_incidents.overlay.ndjson), replayed on load and tailed
+    by the watcher, so every worker sees every worker's changes and a file edit never drops
+    them. Each overlay entry carries its embedding, so a row is encoded once, by the worker
+    that wrote it, and never again on replay.
+    """
+
+    def __init__(self, source_path: Path, model_name: str, encode_fn: Callable[[List[str]], np.ndarray],
+                 search_backend: str, search_options: Dict, compact_ratio: float = 0.2, compact_min_rows: int = 1000):
+        self.source_path = Path(source_path)
+        self.model_name = model_name
+        self.encode_fn = encode_fn
+        self.search_backend = search_backend
+        self.search_options = search_options
+        self.compact_ratio = compact_ratio
+        self.compact_min_rows = compact_min_rows
+        self._snapshot: Optional[HistoricalSnapshot] = None
+        # Written only under _write_lock: the buffers snapshots share, grown by doubling, and
+        # incident id -> its live row for the latest snapshot
+        self._rows: List[HistoricalIncident] = []
+        self._delta = np.zeros((0, 0), dtype=np.float32)
+        self._dead_at = np.zeros(0, dtype=np.int64)
+        self._positions: Dict[str, int] = {}
+        self._write_lock = threading.RLock()
+        self._compact_lock = threading.Lock()
+        self._compacting = False
+        # Changes made through the API: incident id -> its latest version, or None once removed
+        self.overlay_path = self.source_path.with_name(f"{self.source_path.stem}.overlay.ndjson")
+        self._overlay: Dict[str, Optional[HistoricalIncident]] = {}
+        self._overlay_offset = 0
+        self._source_fingerprint = None
+        self._compacted_path: Optional[Path] = None
+        self._watcher: Optional[threading.Thread] = None
+        self._stop_watching = threading.Event()
+        self._stats = {"appended": 0, "removed": 0, "compactions": 0, "source_syncs": 0, "overlay_entries": 0}
+
+    @property
+    def snapshot(self) -> HistoricalSnapshot:
+        if self._snapshot is None:
+            with self._write_lock:
+                if self._snapshot is None:
+                    self._snapshot = self._load()
+        return self._snapshot
+
+    def _read_source(self) -> List[HistoricalIncident]:
+        return list(iter_models(self.source_path, HistoricalIncident))
+
+    def _fingerprint(self):
+        try:
+            stat = self.source_path.stat()
+        except FileNotFoundError:
+            return None
+        return stat.st_mtime_ns, stat.st_size
+
+    def _load(self) -> HistoricalSnapshot:
+        self._source_fingerprint = self._fingerprint()
+        self._remove_compacted_indexes()
+        incidents = self._read_source()
+        embeddings = load_or_build_index(
+            self.source_path, self.model_name, lambda: [incident_text(hist) for hist in incidents], self.encode_fn
+        )
+        # Publish the source rows, then apply the overlay on top as ordinary appends and removals
+        dim = embeddings.shape[1] if embeddings.ndim == 2 else 0
+        self._publish_base(incidents, self._build_index(embeddings), np.zeros((0, dim), dtype=np.float32),
+                           np.zeros(len(incidents), dtype=bool))
+        self._apply_overlay(self._read_overlay())
+        return self._snapshot
+
+    def _read_overlay(self) -> List[Dict]:
+        """Overlay entries written since the last read; a line still being written is left for next time"""
+        try:
+            with open(self.overlay_path, "rb") as f:
+                f.seek(self._overlay_offset)
+                data = f.read()
+        except FileNotFoundError:
+            return []
+        complete = data[:data.rfind(b"\n") + 1]
+        self._overlay_offset += len(complete)
+        return [json.loads(line) for line in complete.splitlines() if line.strip()]
+
+    def _remove_compacted_indexes(self):
+        """
+        Delete compacted indexes left by earlier runs or compactions. Processes still using one
+        keep their mapping; where the OS refuses to delete a mapped file it is left for later.
+        """
+        for path in self.source_path.parent.glob(f"{self.source_path.stem}{COMPACTED_INFIX}*{INDEX_SUFFIX}"):
+            try:
+                path.unlink()
+            except OSError:
+                pass
+
+    def _encode(self, incidents: List[HistoricalIncident]) -> np.ndarray:
+        return np.asarray(self.encode_fn([incident_text(incident) for incident in incidents]), dtype=np.float32)
+
+    def _apply_overlay(self, entries: List[Dict]) -> Tuple[int, int]:
+        """Replay overlay entries onto the current snapshot. Returns (upserted, removed)."""
+        # Embeddings the writing worker logged, for entries encoded with this model
+        logged: Dict[str, np.ndarray] = {}
+        for entry in entries:
+            if entry["op"] == "upsert":
+                incident = HistoricalIncident.model_validate(entry["incident"])
+                self._overlay[incident.incident_id] = incident
+                if entry.get("model_name") == self.model_name and "embedding" in entry:
+                    logged[incident.incident_id] = _unpack_embedding(entry["embedding"])
+                else:
+                    logged.pop(incident.incident_id, None)
+            else:
+                self._overlay[entry["incident_id"]] = None
+        self._stats["overlay_entries"] += len(entries)
+        # Only the last entry per id matters; ids keep log order so every worker appends the same rows
+        touched = dict.fromkeys(entry["incident"]["incident_id"] if entry["op"] == "upsert" else entry["incident_id"] for entry in entries)
+        self.snapshot
+        changed, gone = [], []
+        for incident_id in touched:
+            incident = self._overlay[incident_id]
+            row = self._positions.get(incident_id)
+            if incident is None:
+                if row is not None:
+                    gone.append(incident_id)
+            elif row is None or self._rows[row] != incident:
+                changed.append(incident)
+        if not changed:
+            return 0, self.remove(gone)
+        vectors = [logged.get(incident.incident_id) for incident in changed]
+        unlogged = [i for i, vector in enumerate(vectors) if vector is None]
+        if unlogged:
+            for i, vector in zip(unlogged, self._encode([changed[i] for i in unlogged])):
+                vectors[i] = vector
+        return self.append(changed, np.stack(vectors)), self.remove(gone)
+
+    def _log(self, entries: List[Dict]):
+        """Append entries to the overlay in one write, so concurrent workers never interleave lines"""
+        data = b"".join(json.dumps(entry).encode("utf-8") + b"\n" for entry in entries)
+        fd = os.open(self.overlay_path, os.O_WRONLY | os.O_APPEND | os.O_CREAT, 0o644)
+        try:
+            os.write(fd, data)
+            os.fsync(fd)
+        finally:
+            os.close(fd)
+
+    def _build_index(self, embeddings: np.ndarray) -> VectorSearch:
+        return create_search_backend(self.search_backend, self.search_options).build(embeddings)
+
+    def _publish_base(self, incidents: List[HistoricalIncident], base_index: VectorSearch,
+                      delta_embeddings: np.ndarray, dead: np.ndarray):
+        """Publish a snapshot over fresh buffers; snapshots already handed out keep the old ones"""
+        count = len(incidents)
+        self._rows = list(incidents)
+        self._delta = np.array(delta_embeddings, dtype=np.float32)
+        self._dead_at = np.full(count, ALIVE, dtype=np.int64)
+        self._dead_at[np.flatnonzero(dead)] = 0
+        self._positions = {incident.incident_id: row for row, incident in enumerate(incidents) if not dead[row]}
+        version = self._snapshot.version + 1 if self._snapshot is not None else 0
+        self._snapshot = HistoricalSnapshot(
+            self._rows, count, base_index, self._delta, self._dead_at, version, len(self._positions)
+        )
+
+    def _reserve(self, count: int, delta_used: int, delta_count: int, dim: int):
+        """Grow the shared buffers to hold count rows, delta_count of them in the delta, by doubling"""
+        if len(self._dead_at) < count:
+            dead_at = np.full(max(count, 2 * len(self._dead_at)), ALIVE, dtype=np.int64)
+            dead_at[:len(self._dead_at)] = self._dead_at
+            self._dead_at = dead_at
+        if len(self._delta) < delta_count or self._delta.shape[1] != dim:
+            delta = np.zeros((max(delta_count, 2 * len(self._delta)), dim), dtype=np.float32)
+            delta[:delta_used] = self._delta[:delta_used]
+            self._delta = delta
+
+    def append(self, incidents: Iterable[HistoricalIncident], embeddings: Optional[np.ndarray] = None) -> int:
+        """
+        Add incidents; one whose id already exists replaces the old version. Incidents are encoded
+        here unless their embeddings are passed in, one row per incident. Returns the number added.
+        """
+        incidents = list(incidents)
+        if not incidents:
+            return 0
+        # Later duplicates in the same call win
+        keep = list({incident.incident_id: i for i, incident in enumerate(incidents)}.values())
+        incidents = [incidents[i] for i in keep]
+        if embeddings is None:
+            encoded = self._encode(incidents)
+        else:
+            encoded = np.asarray(embeddings, dtype=np.float32)[keep]
+        with self._write_lock:
+            snapshot = self.snapshot
+            count = snapshot.count + len(incidents)
+            delta_used = snapshot.count - snapshot.base_count
+            self._reserve(count, delta_used, delta_used + len(incidents), encoded.shape[1])
+            # Rows past snapshot.count are not visible to any published snapshot yet
+            self._delta[delta_used:delta_used + len(incidents)] = encoded
+            self._rows.extend(incidents)
+            version = snapshot.version + 1
+            for row, incident in enumerate(incidents, start=snapshot.count):
+                replaced = self._positions.get(incident.incident_id)
+                if replaced is not None:
+                    self._dead_at[replaced] = version
+                self._positions[incident.incident_id] = row
+            self._snapshot = HistoricalSnapshot(
+                self._rows, count, snapshot.base_index, self._delta[:delta_used + len(incidents)],
+                self._dead_at, version, len(self._positions)
+            )
+            self._stats["appended"] += len(incidents)
+        self._maybe_compact()
+        return len(incidents)
+
+    def remove(self, incident_ids: Iterable[str]) -> int:
+        """Tombstone incidents by id. Returns how many were live."""
+        with self._write_lock:
+            snapshot = self.snapshot
+            rows = [self._positions.pop(incident_id) for incident_id in dict.fromkeys(incident_ids)
+                    if incident_id in self._positions]
+            if not rows:
+                return 0
+            version = snapshot.version + 1
+            self._dead_at[rows] = version
+            self._snapshot = HistoricalSnapshot(
+                self._rows, snapshot.count, snapshot.base_index, snapshot.delta_embeddings,
+                self._dead_at, version, len(self._positions)
+            )
+            self._stats["removed"] += len(rows)
+        self._maybe_compact()
+        return len(rows)
+
+    def add(self, incidents: Iterable[HistoricalIncident]) -> int:
+        """append for API callers: the incidents are recorded in the overlay log before they are searchable"""
+        incidents = list(incidents)
+        if not incidents:
+            return 0
+        encoded = self._encode(incidents)
+        with self._write_lock:
+            self.snapshot
+            self._log([
+                {"op": "upsert", "incident": incident.model_dump(mode="json"),
+                 "model_name": self.model_name, "embedding": _pack_embedding(vector)}
+                for incident, vector in zip(incidents, encoded)
+            ])
+            self._overlay.update((incident.incident_id, incident) for incident in incidents)
+            return self.append(incidents, encoded)
+
+    def delete(self, incident_ids: Iterable[str]) -> int:
+        """remove for API callers: removals of live incidents are recorded in the overlay log"""
+        with self._write_lock:
+            self.snapshot
+            incident_ids = [incident_id for incident_id in dict.fromkeys(incident_ids) if incident_id in self._positions]
+            if not incident_ids:
+                return 0
+            self._log([{"op": "remove", "incident_id": incident_id} for incident_id in incident_ids])
+            self._overlay.update((incident_id, None) for incident_id in incident_ids)
+            return self.remove(incident_ids)
+
+    def needs_compaction(self, snapshot: HistoricalSnapshot) -> bool:
+        pending = len(snapshot.delta_embeddings) + snapshot.dead_count
+        return pending >= max(self.compact_min_rows, self.compact_ratio * max(1, snapshot.base_count))
+
+    def _maybe_compact(self):
+        with self._write_lock:
+            if self._compacting or not self.needs_compaction(self.snapshot):
+                return
+            self._compacting = True
+        threading.Thread(target=self._compact_in_background, name="mi-historical-compaction", daemon=True).start()
+
+    def _compact_in_background(self):
+        try:
+            self.compact()
+        except Exception as e:
+            print(f"Historical index compaction failed: {e}")
+        finally:
+            self._compacting = False
+
+    def compact(self):
+        """
+        Rebuild the search index over the live rows. The expensive part works on a snapshot
+        taken up front; changes made meanwhile are carried over when swapping in.
+        """
+        with self._compact_lock:
+            self._compact()
+
+    def _compacted_index(self, snapshot: HistoricalSnapshot, live_rows: np.ndarray,
+                         incidents: List[HistoricalIncident]) -> Tuple[np.ndarray, Path]:
+        """
+        The live rows' embeddings, memory-mapped from an .emb file keyed by a hash of the model and
+        the rows' texts. A worker that already wrote the same rows leaves nothing to gather or write.
+        """
+        digest = hashlib.sha256(self.model_name.encode("utf-8"))
+        for incident in incidents:
+            digest.update(json.dumps(incident_text(incident)).encode("utf-8") + b"\n")
+        key = digest.hexdigest()
+        path = self.source_path.with_name(f"{self.source_path.stem}{COMPACTED_INFIX}{key[:16]}{INDEX_SUFFIX}")
+        embeddings = open_index(path, self.model_name, key)
+        if embeddings is None:
+            dim = snapshot.embeddings_for(live_rows[:1]).shape[1]
+            blocks = (snapshot.embeddings_for(live_rows[start:start + COMPACT_BLOCK_ROWS])
+                      for start in range(0, len(live_rows), COMPACT_BLOCK_ROWS))
+            embeddings = write_index_blocks(path, blocks, len(live_rows), dim, self.model_name, key)
+        return embeddings, path
+
+    def _compact(self):
+        started = time.perf_counter()
+        snapshot = self.snapshot
+        live_rows = np.flatnonzero(~snapshot.dead)
+        incidents = [snapshot.incidents[row] for row in live_rows]
+        embeddings, path = self._compacted_index(snapshot, live_rows, incidents)
+        base_index = self._build_index(embeddings)
+
+        with self._write_lock:
+            current = self.snapshot
+            # Rows appended since the compaction started become the new delta
+            extra = current.incidents[snapshot.count:current.count]
+            extra_embeddings = current.delta_embeddings[snapshot.count - snapshot.base_count:]
+            # Tombstones set since the compaction started, on rows it kept and on the new delta
+            dead = np.concatenate([current.dead[live_rows], current.dead[snapshot.count:]])
+            self._publish_base(incidents + extra, base_index, extra_embeddings, dead)
+            self._stats["compactions"] += 1
+            previous, self._compacted_path = self._compacted_path, path
+        if previous is not None and previous != path:
+            try:
+                previous.unlink()
+            except OSError:
+                pass
+        print(f"Compacted historical index to {len(incidents)} incidents in {time.perf_counter() - started:.2f}s")
+
+    def sync_overlay(self) -> Tuple[int, int]:
+        """Apply overlay entries other workers appended since the last read. Returns (upserted, removed)."""
+        with self._write_lock:
+            self.snapshot
+            return self._apply_overlay(self._read_overlay())
+
+    def sync_from_source(self) -> Tuple[int, int]:
+        """
+        Bring the store in line with the source file after it was edited or replaced, with the overlay
+        applied on top: new and changed incidents are appended, ones in neither are tombstoned.
+        Returns (upserted, removed).
+        """
+        with self._write_lock:
+            fingerprint = self._fingerprint()
+            self.snapshot
+            self._apply_overlay(self._read_overlay())
+            wanted = {incident.incident_id: incident for incident in self._read_source()}
+            for incident_id, incident in self._overlay.items():
+                if incident is None:
+                    wanted.pop(incident_id, None)
+                else:
+                    wanted[incident_id] = incident
+            changed = [
+                incident for incident_id, incident in wanted.items()
+                if incident_id not in self._positions or self._rows[self._positions[incident_id]] != incident
+            ]
+            missing = [incident_id for incident_id in self._positions if incident_id not in wanted]
+            upserted = self.append(changed)
+            removed = self.remove(missing)
+            self._source_fingerprint = fingerprint
+            self._stats["source_syncs"] += 1
+        if upserted or removed:
+            print(f"Synced {self.source_path}: {upserted} new or changed, {removed} removed")
+        return upserted, removed
+
+    def _overlay_size(self) -> int:
+        try:
+            return self.overlay_path.stat().st_size
+        except FileNotFoundError:
+            return 0
+
+    def watch(self, interval_seconds: float):
+        """Poll the source file's mtime and size and the overlay's length, syncing whenever they change"""
+        if self._watcher is not None:
+            return
+
+        def poll():
+            while not self._stop_watching.wait(interval_seconds):
+                try:
+                    if self._fingerprint() != self._source_fingerprint:
+                        self.sync_from_source()
+                    elif self._overlay_size() > self._overlay_offset:
+                        self.sync_overlay()
+                except Exception as e:
+                    print(f"Failed to sync {self.source_path}: {e}")
+
+        self.snapshot
+        self._watcher = threading.Thread(target=poll, name="mi-historical-watch", daemon=True)
+        self._watcher.start()
+
+    def stop_watching(self):
+        self._stop_watching.set()
+
+    def stats(self) -> Dict:
+        snapshot = self._snapshot
+        stats = dict(self._stats)
+        if snapshot is not None:
+            stats.update(live=len(snapshot), base_rows=snapshot.base_count,
+                         delta_rows=len(snapshot.delta_embeddings), tombstones=snapshot.dead_count)
+        stats["compacting"] = self._compacting
+        return stats
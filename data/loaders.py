@@ -0,0 +1,228 @@
+#loaders
+"""
+Streaming readers for the reference datasets. A dataset may be a JSON array (the original
+format) or NDJSON, one object per line. Either way records are parsed one at a time and
+validated in chunks, so a multi-GB export is never held as one list of dicts.
+"""
+from typing import Any, Dict, Iterator, List, Type, TypeVar
+from pathlib import Path
+import json
+import re
+from pydantic import BaseModel, TypeAdapter
+
+try:
+    import orjson
+    _loads = orjson.loads
+except ImportError:  # orjson is optional; the stdlib parser gives the same results, only slower
+    orjson = None
+    _loads = json.loads
+
+M = TypeVar("M", bound=BaseModel)
+
+NDJSON_SUFFIXES = (".ndjson", ".jsonl")
+DATASET_SUFFIXES = NDJSON_SUFFIXES + (".json",)
+READ_SIZE = 1 << 20
+VALIDATE_CHUNK = 10000
+# Longest text after a parsed element that may still be the rest of a number split across reads
+MAX_SCALAR_TAIL = 64
+# Everything up to the next structural byte of an array, stepping over complete strings (escapes included)
+# Candidate split points tried per buffer before decoding it element by element
+BATCH_SPLIT_ATTEMPTS = 4
+_STRUCTURE_SCAN = re.compile(rb'(?:[^"\[\]{},]+|"(?:[^"\\]+|\\.)*")*', re.DOTALL)
+
+
+def find_dataset(data_dir: Path, name: str) -> Path:
+    """The file holding a dataset: name.ndjson or name.jsonl when present, else name.json"""
+    for suffix in DATASET_SUFFIXES:
+        path = data_dir / f"{name}{suffix}"
+        if path.exists():
+            return path
+    return data_dir / f"{name}.json"
+
+
+def is_ndjson(path: Path) -> bool:
+    """NDJSON by suffix, or a file whose first non-blank character is not the '[' of an array"""
+    if path.suffix in NDJSON_SUFFIXES:
+        return True
+    with open(path, 'rb') as f:
+        while True:
+            chunk = f.read(4096)
+            if not chunk:
+                return False
+            stripped = chunk.lstrip()
+            if stripped:
+                return not stripped.startswith(b"[")
+
+
+def iter_ndjson(path: Path) -> Iterator[Dict[str, Any]]:
+    with open(path, 'rb') as f:
+        for line_number, line in enumerate(f, 1):
+            line = line.strip()
+            if not line:
+                continue
+            try:
+                yield _loads(line)
+            except ValueError as e:
+                raise ValueError(f"{path}:{line_number}: invalid JSON record: {e}") from e
+
+
+def iter_json_array(path: Path, read_size: int = READ_SIZE) -> Iterator[Dict[str, Any]]:
+    """Elements of a top-level JSON array, decoded one by one: with orjson when it is installed"""
+    if orjson is not None:
+        return _iter_json_array_orjson(path, read_size)
+    return _iter_json_array_stdlib(path, read_size)
+
+
+def _iter_json_array_orjson(path: Path, read_size: int) -> Iterator[Dict[str, Any]]:
+    """
+    Each time the buffer is refilled, everything up to the last '},' that parses is decoded
+    with a single orjson.loads call. Splitting at a '},' that is not between two top-level
+    elements leaves unbalanced brackets or an open string, which orjson rejects, so the
+    previous candidate is tried instead (a few times at most). What is left is walked element
+    by element with a regex that only stops at brackets, braces and commas outside strings.
+    Each element found this way is decoded by orjson too.
+    """
+    with open(path, 'rb') as f:
+        buffer = b""
+        while not buffer.strip():
+            more = f.read(read_size)
+            if not more:
+                return  # empty file
+            buffer += more
+        position = len(buffer) - len(buffer.lstrip())
+        if buffer[position:position + 1] != b"[":
+            raise ValueError(f"{path}: expected a JSON array")
+        start = scan = position + 1  # start of the current element, and where scanning resumes
+        depth = 0
+        after_comma = False
+        eof = False
+        batch_tried = False
+        while True:
+            if not batch_tried and scan == start:
+                batch_tried = True
+                cut = buffer.rfind(b"},", start)
+                for _ in range(BATCH_SPLIT_ATTEMPTS):
+                    if cut < 0:
+                        break
+                    try:
+                        elements = orjson.loads(b"[" + buffer[start:cut + 1] + b"]")
+                    except orjson.JSONDecodeError:
+                        cut = buffer.rfind(b"},", start, cut)
+                        continue
+                    yield from elements
+                    start = scan = cut + 2
+                    after_comma = True
+                    break
+            end = _STRUCTURE_SCAN.match(buffer, scan).end()
+            if end >= len(buffer) or buffer[end] == 0x22:  # out of data, or a string cut off by the buffer
+                if eof:
+                    raise ValueError(f"{path}: unterminated JSON array")
+                more = f.read(read_size)
+                eof = not more
+                buffer = buffer[start:] + more
+                scan -= start
+                start = 0
+                batch_tried = False
+                continue
+            byte = buffer[end]
+            scan = end + 1
+            if byte in b"[{":
+                depth += 1
+            elif byte in b"]}" and depth:
+                depth -= 1
+            elif byte == 0x7D:
+                raise ValueError(f"{path}: unbalanced '}}' in JSON array")
+            elif depth == 0:
+                # A ',' or the array's closing ']' ends the current element
+                element = buffer[start:end].strip()
+                if element:
+                    try:
+                        yield orjson.loads(element)
+                    except orjson.JSONDecodeError as e:
+                        raise ValueError(f"{path}: invalid JSON array element: {e}") from e
+                elif byte == 0x2C or after_comma:
+                    raise ValueError(f"{path}: {'empty element' if byte == 0x2C else 'trailing comma'} in JSON array")
+                if byte == 0x5D:
+                    return
+                after_comma = True
+                start = scan
+
+
+def _iter_json_array_stdlib(path: Path, read_size: int) -> Iterator[Dict[str, Any]]:
+    """
+    Elements of a top-level JSON array, decoded one by one from a sliding buffer. Each element
+    is parsed by the C scanner behind json's raw_decode; an element cut off at the end of the
+    buffer is retried once more of the file has been read.
+    """
+    decoder = json.JSONDecoder()
+    with open(path, 'r', encoding='utf-8') as f:
+        buffer = ""
+        while not buffer.strip():
+            more = f.read(read_size)
+            if not more:
+                return  # empty file
+            buffer += more
+        eof = False
+        position = _skip(buffer, 0, " \t\r\n")
+        if buffer[position] != "[":
+            raise ValueError(f"{path}: expected a JSON array")
+        position += 1
+        after_comma = False
+        while True:
+            position = _skip(buffer, position, " \t\r\n")
+            if position < len(buffer) and buffer[position] == "]":
+                if after_comma:
+                    raise ValueError(f"{path}: trailing comma in JSON array")
+                return
+            if position < len(buffer):
+                try:
+                    element, end = decoder.raw_decode(buffer, position)
+                except json.JSONDecodeError:
+                    if eof:
+                        raise
+                else:
+                    # The element is complete only if its closing delimiter is in the buffer too;
+                    # a number cut at the end of the buffer (e.g. "3.5e" + "10") parses early, so
+                    # anything else close to the end means read more and decode it again
+                    after = _skip(buffer, end, " \t\r\n")
+                    delimited = after < len(buffer) and buffer[after] in ",]"
+                    if delimited or eof or len(buffer) - end > MAX_SCALAR_TAIL:
+                        if after < len(buffer) and not delimited:
+                            raise ValueError(f"{path}: expected ',' or ']' after array element")
+                        yield element
+                        after_comma = delimited and buffer[after] == ","
+                        position = after + 1 if after_comma else after
+                        continue
+            if eof:
+                raise ValueError(f"{path}: unterminated JSON array")
+            # Keep the unparsed tail and read more
+            more = f.read(read_size)
+            eof = not more
+            buffer = buffer[position:] + more
+            position = 0
+
+
+def _skip(text: str, position: int, characters: str) -> int:
+    while position < len(text) and text[position] in characters:
+        position += 1
+    return position
+
+
+def iter_records(path: Path) -> Iterator[Dict[str, Any]]:
+    """Raw records of a dataset file in either format; a missing file has none"""
+    if not path.exists():
+        return iter(())
+    return iter_ndjson(path) if is_ndjson(path) else iter_json_array(path)
+
+
+def iter_models(path: Path, model: Type[M], chunk_size: int = VALIDATE_CHUNK) -> Iterator[M]:
+    """Validated models, chunk_size records per validation call"""
+    adapter = TypeAdapter(List[model])
+    chunk = []
+    for record in iter_records(path):
+        chunk.append(record)
+        if len(chunk) >= chunk_size:
+            yield from adapter.validate_python(chunk)
+            chunk = []
+    if chunk:
+        yield from adapter.validate_python(chunk)
@@ -0,0 +1,122 @@
+#query_cache
+from typing import Dict, Optional
+from collections import OrderedDict
+import hashlib
+import sqlite3
+import threading
+import time
+import unicodedata
+import numpy as np
+from data.write_behind import WriteBehind
+
+# Rough per-entry cost of the key, tuple and dict slot on top of the vector itself
+ENTRY_OVERHEAD_BYTES = 200
+
+
+def normalize_query_text(text: str) -> str:
+    """Canonical form of a query: Unicode NFC with runs of whitespace collapsed to one space"""
+    return " ".join(unicodedata.normalize("NFC", text).split())
+
+
+class QueryEmbeddingCache:
+    """
+    Query embeddings keyed by a hash of (model name, normalized text). The in-memory LRU is
+    bounded by max_bytes rather than an entry count; an optional SQLite file keeps entries
+    across restarts and is consulted on a memory miss. Lookups only read from SQLite: new
+    rows and last_access touches are written behind in periodic batches.
+    """
+
+    def __init__(self, model_name: str, max_bytes: int = 64 * 1024 * 1024,
+                 sqlite_path: Optional[str] = None, sqlite_max_entries: int = 1000000):
+        self.model_name = model_name
+        self.max_bytes = max_bytes
+        self.sqlite_max_entries = sqlite_max_entries
+        self._memory: "OrderedDict[str, np.ndarray]" = OrderedDict()
+        self._bytes = 0
+        self._lock = threading.Lock()
+        self._stats = {"memory_hits": 0, "disk_hits": 0, "misses": 0, "evictions": 0}
+        self._db = None
+        self._writes: Optional[WriteBehind] = None
+        self._writes_since_prune = 0
+        if sqlite_path:
+            self._db = sqlite3.connect(sqlite_path, check_same_thread=False)
+            self._db.execute("PRAGMA journal_mode=WAL")
+            self._db.execute(
+                "CREATE TABLE IF NOT EXISTS query_embeddings ("
+                "key TEXT PRIMARY KEY, embedding BLOB NOT NULL, last_access REAL NOT NULL)"
+            )
+            self._db.execute("CREATE INDEX IF NOT EXISTS idx_query_embeddings_last_access ON query_embeddings(last_access)")
+            self._db.commit()
+            self._writes = WriteBehind(sqlite_path, name="mi-query-cache-writes")
+
+    def make_key(self, text: str) -> str:
+        return hashlib.sha256(f"{self.model_name}\0{normalize_query_text(text)}".encode("utf-8")).hexdigest()
+
+    def get(self, key: str) -> Optional[np.ndarray]:
+        with self._lock:
+            embedding = self._memory.get(key)
+            if embedding is not None:
+                self._memory.move_to_end(key)
+                self._stats["memory_hits"] += 1
+                return embedding
+
+            if self._db is not None:
+                row = self._db.execute("SELECT embedding FROM query_embeddings WHERE key = ?", (key,)).fetchone()
+                if row is not None:
+                    self._writes.add(
+                        "UPDATE query_embeddings SET last_access = ? WHERE key = ?", (time.time(), key), ("touch", key)
+                    )
+                    embedding = np.frombuffer(row[0], dtype=np.float32)
+                    self._put_memory(key, embedding)
+                    self._stats["disk_hits"] += 1
+                    return embedding
+
+            self._stats["misses"] += 1
+            return None
+
+    def set(self, key: str, embedding: np.ndarray):
+        # A read-only copy, so a caller mutating its array cannot corrupt the cache
+        embedding = np.array(embedding, dtype=np.float32)
+        embedding.flags.writeable = False
+        with self._lock:
+            self._put_memory(key, embedding)
+            if self._db is not None:
+                self._writes.add(
+                    "INSERT OR REPLACE INTO query_embeddings (key, embedding, last_access) VALUES (?, ?, ?)",
+                    (key, embedding.tobytes(), time.time()), ("set", key)
+                )
+                # The disk size limit is enforced every 100 writes rather than on each one
+                self._writes_since_prune += 1
+                if self._writes_since_prune >= 100:
+                    self._prune_disk()
+
+    def _put_memory(self, key: str, embedding: np.ndarray):
+        previous = self._memory.pop(key, None)
+        if previous is not None:
+            self._bytes -= previous.nbytes + ENTRY_OVERHEAD_BYTES
+        self._memory[key] = embedding
+        self._bytes += embedding.nbytes + ENTRY_OVERHEAD_BYTES
+        while self._bytes > self.max_bytes and self._memory:
+            _, evicted = self._memory.popitem(last=False)
+            self._bytes -= evicted.nbytes + ENTRY_OVERHEAD_BYTES
+            self._stats["evictions"] += 1
+
+    def _prune_disk(self):
+        """Drop the least recently used rows beyond the size limit"""
+        self._writes_since_prune = 0
+        self._writes.add(
+            "DELETE FROM query_embeddings WHERE key IN ("
+            "SELECT key FROM query_embeddings ORDER BY last_access DESC LIMIT -1 OFFSET ?)",
+            (self.sqlite_max_entries,), "prune"
+        )
+
+    def stats(self) -> Dict:
+        with self._lock:
+            stats = dict(self._stats)
+            stats["memory_entries"] = len(self._memory)
+            stats["memory_bytes"] = self._bytes
+        if self._writes is not None:
+            stats["disk_writes"] = self._writes.stats()
+        lookups = stats["memory_hits"] + stats["disk_hits"] + stats["misses"]
+        stats["hit_rate"] = (stats["memory_hits"] + stats["disk_hits"]) / lookups if lookups else 0.0
+        return stats
@@ -1,40 +1,184 @@
 from typing import Dict, List, Any, Optional, Tuple
 from pathlib import Path
+import asyncio
 import datetime
 import os
-import json
-from models.model import Incident, HistoricalIncident, ServiceCI, User, ChangeRecord, ServiceHealth, ReassignmentRecord
-from typing import List
-from sklearn.metrics.pairwise import cosine_similarity
+from models.model import Incident, HistoricalIncident, ServiceCI, User, ChangeRecord, ServiceHealth, ReassignmentRecord, BlastRadius, UserImpact
 import numpy as np
-from sentence_transformers import SentenceTransformer
 from pydantic import ValidationError
+from data.historical_store import HistoricalStore, incident_text
+from data.timeseries import TimeSeries, EMPTY_SERIES, build_series_index
+from data.columnar import ColumnarTable, group_rows, row_lookup
+from data.dependency_graph import DependencyGraph
+from data.user_bitsets import UserBitsets
+from data.embedding_server import create_embedding_client
+from data.encode_batcher import EncodeBatcher
+from data.query_cache import QueryEmbeddingCache
+from data.loaders import find_dataset, iter_models
+import config
+
+
+class ReadOnlyRepositoryError(PermissionError):
+    """The repository backend does not accept writes through the API"""
+
 
 class DataRepository:
-    def __init__(self, data_dir: str = "data"):
+    def __init__(self, data_dir: str = "data", model_name: str = config.EMBEDDING_MODEL_NAME,
+                 search_backend: str = config.SEARCH_BACKEND, search_options: Optional[Dict] = None):
         self.data_dir = Path(data_dir)
-        self._historical_incidents = None
+        self.model_name = model_name
+        self.search_backend = search_backend
+        self.search_options = search_options if search_options is not None else config.search_backend_options(search_backend)
         self._service_cis = None
-        self._users = None
-        self._change_records = None
-        self._service_health = None
-        self._reassignments = None
-        self.model = SentenceTransformer('all-MiniLM-L6-v2', device="cpu")  # Lightweight and good general-purpose model
-    
-    def _load_json_data(self, filename: str) -> List[Dict]:
-        file_path = self.data_dir / filename
-        
-        if not file_path.exists():
-            return []
-        with open(file_path, 'r') as f:
-            return json.load(f)
+        # Secondary indexes, built when the corresponding dataset is loaded
+        self._ci_by_name: Dict[str, ServiceCI] = {}
+        self._ci_by_id: Dict[str, ServiceCI] = {}
+        # Reverse dependencies and precomputed blast radius per CI, built from service_cis
+        self._dependency_graph: Optional[DependencyGraph] = None
+        # Users, changes, health samples and reassignments are held as NumPy columns
+        # (data.columnar); models are only built for the rows a caller asks for
+        self._users_table: Optional[ColumnarTable] = None
+        self._user_rows: Dict[str, int] = {}
+        self._changes_by_ci: Optional[Dict[str, TimeSeries]] = None
+        self._health_by_ci: Optional[Dict[str, TimeSeries]] = None
+        self._reassignments_table: Optional[ColumnarTable] = None
+        self._reassignments_by_incident: Optional[Dict[str, Tuple[int, int]]] = None
+        # Users as dense ids with VIP, department and per-CI membership bitsets, for user impact
+        self._user_bitsets: Optional[UserBitsets] = None
+        # Historical incidents with their embeddings and search index; accepts appends without a restart
+        self.historical = HistoricalStore(
+            find_dataset(self.data_dir, "historical_incidents"), model_name, self.encode,
+            search_backend, self.search_options, config.HISTORICAL_COMPACT_RATIO, config.HISTORICAL_COMPACT_MIN_ROWS
+        )
+        self._model = None
+        # Set when encoding is delegated to the shared embedding server (MI_EMBEDDING_SERVER)
+        self.embedding_client = create_embedding_client(model_name)
+        # Small concurrent encodes are gathered into one batched call
+        self.encode_batcher = None
+        if config.ENCODE_BATCH_MAX_SIZE > 1:
+            self.encode_batcher = EncodeBatcher(self._encode_now, config.ENCODE_BATCH_MAX_SIZE, config.ENCODE_BATCH_WAIT_MS)
+        # Re-submitted tickets often carry the same text, so query embeddings are cached
+        self.query_cache = None
+        if config.QUERY_CACHE_MAX_MB > 0:
+            self.query_cache = QueryEmbeddingCache(
+                model_name, int(config.QUERY_CACHE_MAX_MB * 1024 * 1024), config.QUERY_CACHE_SQLITE_PATH or None
+            )
+    
+    def warm_up(self):
+        """Load every reference dataset and run one dummy encode so the first request pays no load cost"""
+        self.historical.snapshot
+        self._warm_up_reference_data()
+        self._warm_up_derived_indexes()
+        self.encode(["warm up"])
+        if config.HISTORICAL_WATCH_SECONDS > 0:
+            self.watch_historical_incidents(config.HISTORICAL_WATCH_SECONDS)
+    
+    def _warm_up_reference_data(self):
+        self.service_cis
+        self.users_table
+        self.changes_by_ci
+        self.health_by_ci
+        self.reassignments_by_incident
+    
+    def _warm_up_derived_indexes(self):
+        """Indexes derived from the CIs and users: blast radius per CI and user membership bitsets"""
+        self.dependency_graph
+        self.user_bitsets.precompute(self.service_cis)
+    
+    def _iter_dataset(self, name: str, model):
+        """Stream a dataset (name.ndjson, name.jsonl or name.json) as validated models"""
+        return iter_models(find_dataset(self.data_dir, name), model)
+    
+    def _load_table(self, name: str, model, time_columns: Tuple[str, ...] = ()) -> ColumnarTable:
+        """Stream a dataset straight into columns; the validated models are dropped chunk by chunk"""
+        return ColumnarTable.from_models(model, self._iter_dataset(name, model), time_columns)
     
     @property
     def historical_incidents(self) -> List[HistoricalIncident]:
-        if self._historical_incidents is None:
-            data = self._load_json_data("historical_incidents.json")
-            self._historical_incidents = [HistoricalIncident(**item) for item in data]
-        return self._historical_incidents
+        """Live historical incidents in the current snapshot"""
+        return self.historical.snapshot.live_incidents
+    
+    def add_historical_incidents(self, incidents: List[HistoricalIncident]) -> int:
+        """Add resolved incidents (or new versions of existing ones) to similarity search without a reindex"""
+        return self.historical.add(incidents)
+    
+    def remove_historical_incidents(self, incident_ids: List[str]) -> int:
+        """Drop historical incidents from similarity search; their rows are reclaimed at the next compaction"""
+        return self.historical.delete(incident_ids)
+    
+    def watch_historical_incidents(self, interval_seconds: float):
+        """Pick up edits to historical_incidents.json while running, checking every interval_seconds"""
+        self.historical.watch(interval_seconds)
+    
+    @property
+    def model(self):
+        """The embedding model, loaded on first use so importing this module stays cheap"""
+        if self._model is None:
+            # sentence_transformers pulls in torch; only pay for it when embeddings are needed
+            from sentence_transformers import SentenceTransformer
+            self._model = SentenceTransformer(self.model_name, device="cpu")  # Lightweight and good general-purpose model
+        return self._model
+    
+    def encode(self, texts: List[str]) -> np.ndarray:
+        """Encode texts into L2-normalized float32 embeddings"""
+        if self.encode_batcher is not None and len(texts) < self.encode_batcher.max_batch_size:
+            return self.encode_batcher.encode(texts)
+        return self._encode_now(texts)
+    
+    async def aencode(self, texts: List[str]) -> np.ndarray:
+        """encode for coroutines: waits on the batcher instead of occupying a thread"""
+        if self.encode_batcher is not None and len(texts) < self.encode_batcher.max_batch_size:
+            return await self.encode_batcher.aencode(texts)
+        loop = asyncio.get_running_loop()
+        return await loop.run_in_executor(None, self._encode_now, texts)
+    
+    def encode_queries(self, texts: List[str]) -> np.ndarray:
+        """encode with the query embedding cache in front; only uncached texts reach the model"""
+        if self.query_cache is None:
+            return self.encode(texts)
+        keys, embeddings, missing = self._lookup_queries(texts)
+        if missing:
+            self._fill_queries(keys, embeddings, missing, self.encode([texts[i] for i in missing]))
+        return np.stack(embeddings)
+    
+    async def aencode_queries(self, texts: List[str]) -> np.ndarray:
+        """encode_queries for coroutines"""
+        if self.query_cache is None:
+            return await self.aencode(texts)
+        keys, embeddings, missing = self._lookup_queries(texts)
+        if missing:
+            self._fill_queries(keys, embeddings, missing, await self.aencode([texts[i] for i in missing]))
+        return np.stack(embeddings)
+    
+    def _lookup_queries(self, texts: List[str]) -> Tuple[List[str], List[Optional[np.ndarray]], List[int]]:
+        keys = [self.query_cache.make_key(text) for text in texts]
+        embeddings = [self.query_cache.get(key) for key in keys]
+        missing = [i for i, embedding in enumerate(embeddings) if embedding is None]
+        return keys, embeddings, missing
+    
+    def _fill_queries(self, keys: List[str], embeddings: List, missing: List[int], encoded: np.ndarray):
+        for i, embedding in zip(missing, encoded):
+            self.query_cache.set(keys[i], embedding)
+            embeddings[i] = embedding
+    
+    def get_metrics(self) -> Dict:
+        """Counters for the encode batcher and query embedding cache"""
+        metrics = {}
+        if self.encode_batcher is not None:
+            metrics["encode_batches"] = self.encode_batcher.stats()
+        if self.query_cache is not None:
+            metrics["query_embedding_cache"] = self.query_cache.stats()
+        metrics["historical_index"] = self.historical.stats()
+        if self._dependency_graph is not None:
+            metrics["dependency_graph"] = self._dependency_graph.stats()
+        if self._user_bitsets is not None:
+            metrics["user_bitsets"] = self._user_bitsets.stats()
+        return metrics
+    
+    def _encode_now(self, texts: List[str]) -> np.ndarray:
+        if self.embedding_client is not None:
+            return self.embedding_client.encode(texts)
+        return self.model.encode(texts, convert_to_numpy=True, normalize_embeddings=True).astype(np.float32, copy=False)
       
     @property
     def service_cis(self) -> List[ServiceCI]:
@@ -42,7 +186,7 @@ class DataRepository:
         
         if self._service_cis is None:
             #print(f"Before_self._service_cis: {self._service_cis}")
-            data = self._load_json_data("service_cis.json")
+            data = self._iter_dataset("service_cis", ServiceCI)
             #print(f"Loaded data: {data}")
             #self._service_cis = []
             #for item in data:
@@ -55,66 +199,158 @@ class DataRepository:
                 #except Exception as e:
                     #print(f"Failed to create ServiceCI from {item}, error: {e}")
                     
-            self._service_cis = [ServiceCI(**item) for item in data] 
+            service_cis = list(data)
             #print(f"After_self._service_cis: {self._service_cis}")
+            self._index_service_cis(service_cis)
         return self._service_cis
     
+    def _index_service_cis(self, service_cis: List[ServiceCI]):
+        # First CI wins on duplicate names, matching the old linear scan
+        ci_by_name = {}
+        for ci in service_cis:
+            ci_by_name.setdefault(ci.name.lower(), ci)
+        self._ci_by_name = ci_by_name
+        self._ci_by_id = {ci.ci_id: ci for ci in service_cis}
+        self._service_cis = service_cis
+    
+    @property
+    def dependency_graph(self) -> DependencyGraph:
+        if self._dependency_graph is None:
+            self._dependency_graph = DependencyGraph(self.service_cis)
+        return self._dependency_graph
+    
+    def get_blast_radius(self, ci_id: str) -> BlastRadius:
+        """Downstream CIs, users and criticality of a CI, precomputed; a dict lookup per call"""
+        return self.dependency_graph.blast_radius(ci_id)
+    
+    def upsert_service_cis(self, service_cis: List[ServiceCI]) -> int:
+        """Add CIs or replace them by ci_id; only the affected part of the dependency graph is recomputed"""
+        replacements = {ci.ci_id: ci for ci in service_cis}
+        updated = []
+        for ci in self.service_cis:
+            if ci.ci_id in replacements:
+                # Replaces the first CI with this id and drops any duplicates after it
+                if replacements[ci.ci_id] is not None:
+                    updated.append(replacements[ci.ci_id])
+                    replacements[ci.ci_id] = None
+            else:
+                updated.append(ci)
+        updated.extend(ci for ci in replacements.values() if ci is not None)
+        self._index_service_cis(updated)
+        if self._dependency_graph is not None:
+            self._dependency_graph.upsert(service_cis)
+        return len(service_cis)
+    
+    def remove_service_cis(self, ci_ids: List[str]) -> int:
+        """Drop CIs by id; returns how many ids were present"""
+        removed = set(ci_ids) & {ci.ci_id for ci in self.service_cis}
+        if removed:
+            self._index_service_cis([ci for ci in self.service_cis if ci.ci_id not in removed])
+            if self._dependency_graph is not None:
+                self._dependency_graph.remove(removed)
+        return len(removed)
+    
     @property
     def users(self) -> List[User]:
-        if self._users is None:
-            data = self._load_json_data("users.json")
-            self._users = [User(**item) for item in data]
-        return self._users
+        """Every user as a model, built on each call; lookups use users_table instead"""
+        table = self.users_table
+        return table.rows(range(len(table)))
+    
+    @property
+    def users_table(self) -> ColumnarTable:
+        if self._users_table is None:
+            table = self._load_table("users", User)
+            self._user_rows = row_lookup(table, "user_id")
+            self._users_table = table
+        return self._users_table
     
     @property
     def change_records(self) -> List[ChangeRecord]:
-        if self._change_records is None:
-            data = self._load_json_data("change_records.json")
-            self._change_records = [ChangeRecord(**item) for item in data]
-        return self._change_records
+        """Every change record, grouped by CI; lookups use the per-CI series instead"""
+        return [record for series in self.changes_by_ci.values() for record in series.records]
+    
+    @property
+    def changes_by_ci(self) -> Dict[str, TimeSeries]:
+        """Change records streamed from disk straight into per-CI series of risk scores"""
+        if self._changes_by_ci is None:
+            self._changes_by_ci = build_series_index(
+                self._load_table("change_records", ChangeRecord, ("implemented_at",)), "ci_id", "implemented_at", "risk_score"
+            )
+        return self._changes_by_ci
     
     @property
     def service_health(self) -> List[ServiceHealth]:
-        if self._service_health is None:
-            data = self._load_json_data("service_health.json")
-            self._service_health = [ServiceHealth(**item) for item in data]
-        return self._service_health
+        """Every health sample, grouped by CI; lookups use the per-CI series instead"""
+        return [record for series in self.health_by_ci.values() for record in series.records]
+    
+    @property
+    def health_by_ci(self) -> Dict[str, TimeSeries]:
+        """Health samples streamed from disk straight into per-CI series of health scores"""
+        if self._health_by_ci is None:
+            self._health_by_ci = build_series_index(
+                self._load_table("service_health", ServiceHealth, ("timestamp",)), "ci_id", "timestamp", "health_score"
+            )
+        return self._health_by_ci
     
     @property
     def reassignments(self) -> List[ReassignmentRecord]:
-        if self._reassignments is None:
-            data = self._load_json_data("reassignments.json")
-            self._reassignments = [ReassignmentRecord(**item) for item in data]
-        return self._reassignments
+        """Every reassignment, grouped by incident; lookups use get_reassignment_history instead"""
+        self.reassignments_by_incident
+        return self._reassignments_table.rows(range(len(self._reassignments_table)))
+    
+    @property
+    def reassignments_by_incident(self) -> Dict[str, Tuple[int, int]]:
+        """incident_id -> (start, end) rows of the reassignments table, which is grouped by incident in load order"""
+        if self._reassignments_by_incident is None:
+            table, ranges = group_rows(self._load_table("reassignments", ReassignmentRecord, ("timestamp",)), "incident_id")
+            self._reassignments_table = table
+            self._reassignments_by_incident = ranges
+        return self._reassignments_by_incident
     
     def get_service_ci(self, service_name: str) -> Optional[ServiceCI]:
-        #print(f"service_name: {service_name}") 
-        for ci in self.service_cis:
-            #print(f"CI: {ci}") #service_name, ci.name, and self.service_cis
-            #print(f"self.service_cis: {self.service_cis}")
-            if ci.name.lower() == service_name.lower():
-                return ci                
-        return None
+        self.service_cis
+        return self._ci_by_name.get(service_name.lower())
+    
+    def get_service_ci_by_id(self, ci_id: str) -> Optional[ServiceCI]:
+        self.service_cis
+        return self._ci_by_id.get(ci_id)
         
     def get_similar_incidents(self, incident: Incident, top_n: int = 5) -> List[HistoricalIncident]:
         """
         Uses vector similarity (cosine similarity) to find similar historical incidents.
         """
         # Prepare the incident text
-        query_text = f"{incident.summary} {incident.description}"
-        query_embedding = self.model.encode([query_text])[0]  # shape: (dim,)
-
-        # Prepare embeddings for historical incidents
-        texts = [f"{hist.summary} {hist.description}" for hist in self.historical_incidents]
-        historical_embeddings = self.model.encode(texts)  # shape: (num_incidents, dim)
-
-        # Compute cosine similarity
-        similarities = cosine_similarity([query_embedding], historical_embeddings)[0]
-
-        # Combine with historical incidents and sort by similarity
-        scored_incidents = list(zip(self.historical_incidents, similarities))
-        scored_incidents.sort(key=lambda x: x[1], reverse=True)
-        return [incident for incident, _ in scored_incidents[:top_n]]
+        query_text = incident_text(incident)
+        query_embedding = self.encode_queries([query_text])[0]  # shape: (dim,)
+        return self._search_similar(query_embedding, top_n)
+    
+    async def aget_similar_incidents(self, incident: Incident, top_n: int = 5,
+                                     executor=None) -> List[HistoricalIncident]:
+        """
+        get_similar_incidents for coroutines, sharing encode batches with concurrent requests.
+        The search itself is CPU-bound, so it runs on executor rather than the event loop.
+        """
+        query_embedding = (await self.aencode_queries([incident_text(incident)]))[0]
+        loop = asyncio.get_running_loop()
+        return await loop.run_in_executor(executor, self._search_similar, query_embedding, top_n)
+    
+    def _search_similar(self, query_embedding: np.ndarray, top_n: int) -> List[HistoricalIncident]:
+        # Embeddings are normalized, so the search backend ranks by dot product
+        snapshot = self.historical.snapshot
+        indices, _ = snapshot.search(query_embedding, top_n)
+        return [snapshot.incidents[i] for i in indices]
+    
+    def get_similar_incidents_batch(self, incidents: List[Incident], top_n: int = 5) -> List[List[HistoricalIncident]]:
+        """
+        Batched get_similar_incidents: one encode call for every uncached query text and one
+        search over the query matrix. Results are returned in input order.
+        """
+        if not incidents:
+            return []
+        query_embeddings = self.encode_queries([incident_text(incident) for incident in incidents])  # shape: (batch, dim)
+        snapshot = self.historical.snapshot
+        indices, _ = snapshot.search_batch(query_embeddings, top_n)
+        return [[snapshot.incidents[i] for i in row if i >= 0] for row in indices]
         
     def get_similar_incidents_old(self, incident: Incident, top_n: int = 5) -> List[HistoricalIncident]:
         """
@@ -138,29 +374,65 @@ class DataRepository:
         return [incident for incident, _ in scored_incidents[:top_n]]   
 
     def get_users_for_service(self, service_ci: ServiceCI) -> List[User]:
-        return [user for user in self.users if user.user_id in service_ci.users]
-    
-    def get_recent_changes(self, ci_id: str, days: int = 7) -> List[ChangeRecord]:
-        """Get changes for a specific CI in the last N days"""
-        now = datetime.datetime.now()
-        cutoff = now - datetime.timedelta(days=days)
-        
+        table = self.users_table
+        # dict.fromkeys drops duplicate ids while keeping the CI's order
         return [
-            change for change in self.change_records
-            if change.ci_id == ci_id and 
-            datetime.datetime.fromisoformat(change.implemented_at) > cutoff
+            table.row(self._user_rows[user_id]) for user_id in dict.fromkeys(service_ci.users)
+            if user_id in self._user_rows
         ]
     
+    @property
+    def user_bitsets(self) -> UserBitsets:
+        if self._user_bitsets is None:
+            self._user_bitsets = UserBitsets(*self._user_columns())
+        return self._user_bitsets
+    
+    def _user_columns(self) -> Tuple[List[str], np.ndarray, List[str]]:
+        """User ids, VIP flags and departments, in dataset order"""
+        table = self.users_table
+        user_ids = table.pools["user_id"].strings
+        departments = table.pools["department"].strings
+        return (
+            [user_ids[code] for code in table.column("user_id").tolist()],
+            table.column("is_vip"),
+            [departments[code] for code in table.column("department").tolist()],
+        )
+    
+    def get_user_impact(self, service_ci: ServiceCI, affected_user_ids: List[str]) -> UserImpact:
+        """Service user count, and the VIPs and departments among the affected ones, from bitsets"""
+        return self.user_bitsets.impact(service_ci, affected_user_ids)
+    
+    def get_user_impacts(self, service_cis: List[ServiceCI], affected_user_ids: List[List[str]]) -> List[UserImpact]:
+        """get_user_impact for a batch of incidents in one set of array operations"""
+        return self.user_bitsets.impact_batch(service_cis, affected_user_ids)
+    
+    def get_recent_changes(self, ci_id: str, days: int = 7) -> List[ChangeRecord]:
+        """Get changes for a specific CI in the last N days, oldest first"""
+        return self.get_change_series(ci_id, days).records
+    
+    def get_change_series(self, ci_id: str, days: int = 7) -> TimeSeries:
+        """Changes for a CI in the last N days as a time-sorted series of risk scores"""
+        return self.changes_by_ci.get(ci_id, EMPTY_SERIES).last_days(days)
+    
     def get_reassignment_history(self, incident_id: str) -> List[ReassignmentRecord]:
-        return [r for r in self.reassignments if r.incident_id == incident_id]
+        start, end = self.reassignments_by_incident.get(incident_id, (0, 0))
+        return self._reassignments_table.rows(range(start, end))
     
     def get_service_health_history(self, ci_id: str, days: int = 30) -> List[ServiceHealth]:
-        """Get service health records for a specific CI in the last N days"""
-        now = datetime.datetime.now()
-        cutoff = now - datetime.timedelta(days=days)
-        
-        return [
-            health for health in self.service_health
-            if health.ci_id == ci_id and 
-            datetime.datetime.fromisoformat(health.timestamp) > cutoff
-        ]
\ No newline at end of file
+        """Get service health records for a specific CI in the last N days, oldest first"""
+        return self.get_service_health_series(ci_id, days).records
+    
+    def get_service_health_series(self, ci_id: str, days: int = 30) -> TimeSeries:
+        """Health samples for a CI in the last N days as a time-sorted series of health scores"""
+        return self.health_by_ci.get(ci_id, EMPTY_SERIES).last_days(days)
+
+
+def create_data_repository(data_dir: str = "data") -> DataRepository:
+    """The repository for the configured backend (MI_DATA_BACKEND): the JSON files or the SQLite database"""
+    if config.DATA_BACKEND == "sqlite":
+        # Imported here so the JSON backend never loads SQLAlchemy
+        from data.sql_repository import SQLDataRepository
+        return SQLDataRepository(data_dir)
+    if config.DATA_BACKEND != "json":
+        raise ValueError(f"Unknown data backend: {config.DATA_BACKEND}")
+    return DataRepository(data_dir)
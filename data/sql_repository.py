@@ -0,0 +1,552 @@
+#sql_repository
+"""
+DataRepository backed by a local SQLite database instead of the JSON files. CIs, users, CI
+memberships and dependencies, changes, health samples and reassignments live in indexed
+tables, so lookups and time windows are index range scans instead of data held in RAM.
+The database is read-only: CI edits through the API are refused with ReadOnlyRepositoryError.
+
+Historical incidents are not in the database. With either backend the HistoricalStore is
+authoritative for them: historical_incidents.json plus its overlay log of incidents added or
+removed through the API. So POST and DELETE /historical-incidents keep working here.
+
+Build (or rebuild) the database from the JSON files, with the service stopped:
+    python -m data.sql_repository import --data-dir data
+Check every accessor against the JSON backend:
+    python -m data.sql_repository verify --data-dir data
+"""
+from typing import Dict, Iterable, List, Optional, Sequence, Set
+from pathlib import Path
+import argparse
+import datetime
+import json
+import os
+import sys
+import numpy as np
+from sqlalchemy import Boolean, Column, Float, Index, Integer, MetaData, String, Table, create_engine, event, func, insert, select
+from sqlalchemy.engine import Engine
+from models.model import ServiceCI, User, ChangeRecord, ServiceHealth, ReassignmentRecord, BlastRadius, UserImpact
+from data.dependency_graph import CRITICAL_LEVEL
+from data.columnar import ColumnarTable, parse_timestamps
+from data.loaders import VALIDATE_CHUNK, find_dataset, iter_models
+from data.repo import DataRepository, ReadOnlyRepositoryError
+from data.timeseries import TimeSeries, EMPTY_SERIES
+import config
+
+# SQLite caps the number of bound parameters per statement
+MAX_IN_PARAMETERS = 500
+
+metadata = MetaData()
+
+# Every table keeps its load order in an integer primary key, so ties and duplicates resolve
+# the same way as in the JSON backend
+service_cis_table = Table(
+    "service_cis", metadata,
+    Column("position", Integer, primary_key=True),
+    Column("ci_id", String, nullable=False, index=True),
+    Column("name", String, nullable=False),
+    Column("name_lower", String, nullable=False, index=True),
+    Column("type", String, nullable=False),
+    Column("criticality", Integer, nullable=False),
+)
+
+ci_dependencies_table = Table(
+    "ci_dependencies", metadata,
+    Column("ci_position", Integer, primary_key=True),
+    Column("position", Integer, primary_key=True),
+    Column("depends_on", String, nullable=False, index=True),
+)
+
+ci_users_table = Table(
+    "ci_users", metadata,
+    Column("ci_position", Integer, primary_key=True),
+    Column("position", Integer, primary_key=True),
+    Column("user_id", String, nullable=False, index=True),
+)
+
+users_table = Table(
+    "users", metadata,
+    Column("position", Integer, primary_key=True),
+    Column("user_id", String, nullable=False, index=True),
+    Column("name", String, nullable=False),
+    Column("department", String, nullable=False),
+    Column("is_vip", Boolean, nullable=False),
+)
+
+# Timestamps are kept as the original text and as microseconds since the epoch for range scans
+change_records_table = Table(
+    "change_records", metadata,
+    Column("seq", Integer, primary_key=True),
+    Column("change_id", String, nullable=False),
+    Column("summary", String, nullable=False),
+    Column("ci_id", String, nullable=False),
+    Column("implemented_at", String, nullable=False),
+    Column("implemented_us", Integer, nullable=False),
+    Column("risk_score", Float, nullable=False),
+    Index("ix_change_records_ci_time", "ci_id", "implemented_us", "seq"),
+)
+
+service_health_table = Table(
+    "service_health", metadata,
+    Column("seq", Integer, primary_key=True),
+    Column("ci_id", String, nullable=False),
+    Column("timestamp", String, nullable=False),
+    Column("timestamp_us", Integer, nullable=False),
+    Column("health_score", Float, nullable=False),
+    Index("ix_service_health_ci_time", "ci_id", "timestamp_us", "seq"),
+)
+
+reassignments_table = Table(
+    "reassignments", metadata,
+    Column("seq", Integer, primary_key=True),
+    Column("incident_id", String, nullable=False),
+    Column("timestamp", String, nullable=False),
+    Column("from_group", String, nullable=False),
+    Column("to_group", String, nullable=False),
+    Index("ix_reassignments_incident", "incident_id", "seq"),
+)
+
+
+def create_reader(database_path: Path, pool_size: int = config.SQLITE_POOL_SIZE) -> Engine:
+    """A read-only engine keeping up to pool_size connections open for the worker's threads"""
+    engine = create_engine(f"sqlite:///{database_path}", pool_size=pool_size, max_overflow=pool_size)
+
+    @event.listens_for(engine, "connect")
+    def configure(dbapi_connection, _):
+        dbapi_connection.execute("PRAGMA query_only = ON")
+        dbapi_connection.execute("PRAGMA busy_timeout = 5000")
+
+    return engine
+
+
+def _cutoff_us(days: int) -> int:
+    """The last_days cutoff of the JSON backend, in microseconds since the epoch"""
+    cutoff = datetime.datetime.now() - datetime.timedelta(days=days)
+    return int(np.datetime64(cutoff, "us").astype(np.int64))
+
+
+class SQLDataRepository(DataRepository):
+    """
+    DataRepository reading reference data from SQLite; built by import_json. Historical
+    incidents, including API writes, are served by the inherited HistoricalStore.
+    """
+
+    def __init__(self, data_dir: str = "data", database_path: Optional[str] = None,
+                 pool_size: int = config.SQLITE_POOL_SIZE, **kwargs):
+        super().__init__(data_dir, **kwargs)
+        path = Path(database_path or config.SQLITE_DATABASE_PATH)
+        self.database_path = path if path.is_absolute() else self.data_dir / path
+        self.pool_size = pool_size
+        self._engine = None
+
+    @property
+    def engine(self) -> Engine:
+        # Created on first use, so each worker process gets its own connection pool
+        if self._engine is None:
+            if not self.database_path.exists():
+                raise FileNotFoundError(
+                    f"{self.database_path} not found; build it with: python -m data.sql_repository import"
+                )
+            self._engine = create_reader(self.database_path, self.pool_size)
+        return self._engine
+
+    def _fetch(self, statement) -> List:
+        with self.engine.connect() as connection:
+            return connection.execute(statement).all()
+
+    def _warm_up_reference_data(self):
+        # Opens the first pooled connection; the data itself stays on disk
+        self._fetch(select(service_cis_table.c.position).limit(1))
+
+    def _warm_up_derived_indexes(self):
+        # Nothing to build: blast radius and user impact are answered with indexed queries
+        pass
+
+    def _ci_models(self, rows: Sequence) -> List[ServiceCI]:
+        positions = [row.position for row in rows]
+        dependencies = self._lists_by_ci(ci_dependencies_table, ci_dependencies_table.c.depends_on, positions)
+        users = self._lists_by_ci(ci_users_table, ci_users_table.c.user_id, positions)
+        return [
+            ServiceCI(ci_id=row.ci_id, name=row.name, type=row.type, criticality=row.criticality,
+                      dependencies=dependencies.get(row.position, []), users=users.get(row.position, []))
+            for row in rows
+        ]
+
+    def _lists_by_ci(self, table: Table, value_column, positions: List[int]) -> Dict[int, List[str]]:
+        lists: Dict[int, List[str]] = {}
+        for start in range(0, len(positions), MAX_IN_PARAMETERS):
+            rows = self._fetch(
+                select(table.c.ci_position, value_column)
+                .where(table.c.ci_position.in_(positions[start:start + MAX_IN_PARAMETERS]))
+                .order_by(table.c.ci_position, table.c.position)
+            )
+            for ci_position, value in rows:
+                lists.setdefault(ci_position, []).append(value)
+        return lists
+
+    @property
+    def service_cis(self) -> List[ServiceCI]:
+        return self._ci_models(self._fetch(select(service_cis_table).order_by(service_cis_table.c.position)))
+
+    def get_service_ci(self, service_name: str) -> Optional[ServiceCI]:
+        # First CI wins on duplicate names
+        rows = self._fetch(
+            select(service_cis_table).where(service_cis_table.c.name_lower == service_name.lower())
+            .order_by(service_cis_table.c.position).limit(1)
+        )
+        return self._ci_models(rows)[0] if rows else None
+
+    def get_service_ci_by_id(self, ci_id: str) -> Optional[ServiceCI]:
+        # Last CI wins on duplicate ids
+        rows = self._fetch(
+            select(service_cis_table).where(service_cis_table.c.ci_id == ci_id)
+            .order_by(service_cis_table.c.position.desc()).limit(1)
+        )
+        return self._ci_models(rows)[0] if rows else None
+
+    def _latest_positions(self, ci_ids: Iterable[str]) -> Dict[str, int]:
+        """Position of the row each ci_id resolves to; the last one wins on duplicate ids"""
+        ci_ids = list(ci_ids)
+        latest: Dict[str, int] = {}
+        for start in range(0, len(ci_ids), MAX_IN_PARAMETERS):
+            rows = self._fetch(
+                select(service_cis_table.c.ci_id, func.max(service_cis_table.c.position))
+                .where(service_cis_table.c.ci_id.in_(ci_ids[start:start + MAX_IN_PARAMETERS]))
+                .group_by(service_cis_table.c.ci_id)
+            )
+            latest.update((ci_id, position) for ci_id, position in rows)
+        return latest
+
+    def _dependents(self, ci_ids: Set[str]) -> Set[str]:
+        """CIs whose current row lists one of ci_ids as a dependency, other than itself"""
+        d, s = ci_dependencies_table, service_cis_table
+        ci_ids = list(ci_ids)
+        candidates = []
+        for start in range(0, len(ci_ids), MAX_IN_PARAMETERS):
+            candidates.extend(self._fetch(
+                select(s.c.ci_id, s.c.position, d.c.depends_on)
+                .join(d, d.c.ci_position == s.c.position)
+                .where(d.c.depends_on.in_(ci_ids[start:start + MAX_IN_PARAMETERS]))
+            ))
+        latest = self._latest_positions({ci_id for ci_id, _, _ in candidates})
+        return {ci_id for ci_id, position, depends_on in candidates if latest[ci_id] == position and ci_id != depends_on}
+
+    def get_blast_radius(self, ci_id: str) -> BlastRadius:
+        """The same figures as DependencyGraph, walking the depends_on index instead of an in-memory graph"""
+        direct = self._dependents({ci_id})
+        downstream = set(direct)
+        frontier = direct
+        while frontier:
+            frontier = self._dependents(frontier) - downstream
+            downstream |= frontier
+        downstream.discard(ci_id)
+
+        positions = list(self._latest_positions(downstream).values())
+        users: Set[str] = set()
+        criticality = 0
+        critical = []
+        for start in range(0, len(positions), MAX_IN_PARAMETERS):
+            batch = positions[start:start + MAX_IN_PARAMETERS]
+            for name, level in self._fetch(
+                select(service_cis_table.c.name, service_cis_table.c.criticality)
+                .where(service_cis_table.c.position.in_(batch))
+            ):
+                criticality += level
+                if level >= CRITICAL_LEVEL:
+                    critical.append(name)
+            users.update(user_id for user_id, in self._fetch(
+                select(ci_users_table.c.user_id).where(ci_users_table.c.ci_position.in_(batch)).distinct()
+            ))
+        return BlastRadius(
+            ci_id=ci_id,
+            direct_dependents=len(direct),
+            downstream_cis=len(downstream),
+            downstream_users=len(users),
+            downstream_criticality=criticality,
+            critical_dependents=sorted(critical),
+        )
+
+    def get_user_impact(self, service_ci: ServiceCI, affected_user_ids: List[str]) -> UserImpact:
+        """The same figures as UserBitsets, from an indexed lookup of the CI's users"""
+        service_users = self.get_users_for_service(service_ci)
+        affected_ids = set(affected_user_ids)
+        affected = [user for user in service_users if user.user_id in affected_ids]
+        return UserImpact(
+            service_users=len(service_users),
+            affected_service_users=len(affected),
+            vip_affected=any(user.is_vip for user in affected),
+            departments=sorted({user.department for user in affected}),
+        )
+
+    def get_user_impacts(self, service_cis: List[ServiceCI], affected_user_ids: List[List[str]]) -> List[UserImpact]:
+        return [self.get_user_impact(ci, user_ids) for ci, user_ids in zip(service_cis, affected_user_ids)]
+
+    def upsert_service_cis(self, service_cis: List[ServiceCI]) -> int:
+        raise ReadOnlyRepositoryError("The SQLite backend is read-only; edit the JSON files and re-run the importer")
+
+    def remove_service_cis(self, ci_ids: List[str]) -> int:
+        raise ReadOnlyRepositoryError("The SQLite backend is read-only; edit the JSON files and re-run the importer")
+
+    @property
+    def users(self) -> List[User]:
+        rows = self._fetch(select(users_table).order_by(users_table.c.position))
+        return [User(user_id=r.user_id, name=r.name, department=r.department, is_vip=r.is_vip) for r in rows]
+
+    def get_users_for_service(self, service_ci: ServiceCI) -> List[User]:
+        user_ids = list(dict.fromkeys(service_ci.users))
+        found: Dict[str, User] = {}
+        for start in range(0, len(user_ids), MAX_IN_PARAMETERS):
+            rows = self._fetch(
+                select(users_table).where(users_table.c.user_id.in_(user_ids[start:start + MAX_IN_PARAMETERS]))
+                .order_by(users_table.c.position)
+            )
+            # Rows come in load order, so the last row wins on duplicate ids
+            for r in rows:
+                found[r.user_id] = User(user_id=r.user_id, name=r.name, department=r.department, is_vip=r.is_vip)
+        return [found[user_id] for user_id in user_ids if user_id in found]
+
+    @property
+    def change_records(self) -> List[ChangeRecord]:
+        t = change_records_table
+        return [self._change(r) for r in self._fetch(select(t).order_by(t.c.ci_id, t.c.implemented_us, t.c.seq))]
+
+    def _changes_since(self, ci_id: str, days: int) -> List[ChangeRecord]:
+        t = change_records_table
+        rows = self._fetch(
+            select(t).where(t.c.ci_id == ci_id, t.c.implemented_us > _cutoff_us(days))
+            .order_by(t.c.implemented_us, t.c.seq)
+        )
+        return [self._change(r) for r in rows]
+
+    @staticmethod
+    def _change(r) -> ChangeRecord:
+        return ChangeRecord(change_id=r.change_id, summary=r.summary, ci_id=r.ci_id,
+                            implemented_at=r.implemented_at, risk_score=r.risk_score)
+
+    def get_recent_changes(self, ci_id: str, days: int = 7) -> List[ChangeRecord]:
+        """Get changes for a specific CI in the last N days, oldest first"""
+        return self._changes_since(ci_id, days)
+
+    def get_change_series(self, ci_id: str, days: int = 7) -> TimeSeries:
+        return _series(ChangeRecord, self._changes_since(ci_id, days), "implemented_at", "risk_score")
+
+    @property
+    def service_health(self) -> List[ServiceHealth]:
+        t = service_health_table
+        return [self._health(r) for r in self._fetch(select(t).order_by(t.c.ci_id, t.c.timestamp_us, t.c.seq))]
+
+    def _health_since(self, ci_id: str, days: int) -> List[ServiceHealth]:
+        t = service_health_table
+        rows = self._fetch(
+            select(t).where(t.c.ci_id == ci_id, t.c.timestamp_us > _cutoff_us(days))
+            .order_by(t.c.timestamp_us, t.c.seq)
+        )
+        return [self._health(r) for r in rows]
+
+    @staticmethod
+    def _health(r) -> ServiceHealth:
+        return ServiceHealth(ci_id=r.ci_id, timestamp=r.timestamp, health_score=r.health_score)
+
+    def get_service_health_history(self, ci_id: str, days: int = 30) -> List[ServiceHealth]:
+        """Get service health records for a specific CI in the last N days, oldest first"""
+        return self._health_since(ci_id, days)
+
+    def get_service_health_series(self, ci_id: str, days: int = 30) -> TimeSeries:
+        return _series(ServiceHealth, self._health_since(ci_id, days), "timestamp", "health_score")
+
+    @property
+    def reassignments(self) -> List[ReassignmentRecord]:
+        t = reassignments_table
+        return [self._reassignment(r) for r in self._fetch(select(t).order_by(t.c.incident_id, t.c.seq))]
+
+    def get_reassignment_history(self, incident_id: str) -> List[ReassignmentRecord]:
+        t = reassignments_table
+        return [self._reassignment(r) for r in self._fetch(select(t).where(t.c.incident_id == incident_id).order_by(t.c.seq))]
+
+    @staticmethod
+    def _reassignment(r) -> ReassignmentRecord:
+        return ReassignmentRecord(incident_id=r.incident_id, timestamp=r.timestamp,
+                                  from_group=r.from_group, to_group=r.to_group)
+
+
+def _series(model, records: List, time_column: str, value_column: str) -> TimeSeries:
+    """A TimeSeries over records that the query already returned in timestamp order"""
+    if not records:
+        return EMPTY_SERIES
+    table = ColumnarTable.from_models(model, records, (time_column,))
+    return TimeSeries(table.column(time_column), table.column(value_column).astype(np.float64, copy=False), table)
+
+
+def _chunks(items: Iterable, size: int = VALIDATE_CHUNK) -> Iterable[List]:
+    chunk = []
+    for item in items:
+        chunk.append(item)
+        if len(chunk) >= size:
+            yield chunk
+            chunk = []
+    if chunk:
+        yield chunk
+
+
+def _epoch_us(timestamps: List[str]) -> List[int]:
+    return parse_timestamps(timestamps).astype(np.int64).tolist()
+
+
+def import_json(data_dir: str = "data", database_path: Optional[str] = None) -> Path:
+    """
+    Build the SQLite database from the JSON (or NDJSON) files in data_dir, streaming each
+    dataset in chunks. The new file replaces the old one only once it is complete.
+    """
+    data_dir = Path(data_dir)
+    path = Path(database_path or config.SQLITE_DATABASE_PATH)
+    path = path if path.is_absolute() else data_dir / path
+    tmp_path = path.with_name(path.name + ".tmp")
+    for stale in (tmp_path, Path(f"{tmp_path}-wal"), Path(f"{tmp_path}-shm")):
+        if stale.exists():
+            stale.unlink()
+
+    engine = create_engine(f"sqlite:///{tmp_path}")
+
+    @event.listens_for(engine, "connect")
+    def configure(dbapi_connection, _):
+        dbapi_connection.execute("PRAGMA journal_mode = WAL")
+        dbapi_connection.execute("PRAGMA synchronous = NORMAL")
+
+    def models(name, model):
+        return iter_models(find_dataset(data_dir, name), model)
+
+    counts = {}
+    metadata.create_all(engine)
+    with engine.begin() as connection:
+        position = 0
+        for chunk in _chunks(models("service_cis", ServiceCI)):
+            connection.execute(insert(service_cis_table), [
+                {"position": position + i, "ci_id": ci.ci_id, "name": ci.name, "name_lower": ci.name.lower(),
+                 "type": ci.type, "criticality": ci.criticality}
+                for i, ci in enumerate(chunk)
+            ])
+            dependencies = [
+                {"ci_position": position + i, "position": j, "depends_on": depends_on}
+                for i, ci in enumerate(chunk) for j, depends_on in enumerate(ci.dependencies)
+            ]
+            memberships = [
+                {"ci_position": position + i, "position": j, "user_id": user_id}
+                for i, ci in enumerate(chunk) for j, user_id in enumerate(ci.users)
+            ]
+            if dependencies:
+                connection.execute(insert(ci_dependencies_table), dependencies)
+            if memberships:
+                connection.execute(insert(ci_users_table), memberships)
+            position += len(chunk)
+        counts["service_cis"] = position
+
+        position = 0
+        for chunk in _chunks(models("users", User)):
+            connection.execute(insert(users_table), [
+                dict(user.model_dump(), position=position + i) for i, user in enumerate(chunk)
+            ])
+            position += len(chunk)
+        counts["users"] = position
+
+        counts["change_records"] = 0
+        for chunk in _chunks(models("change_records", ChangeRecord)):
+            epoch = _epoch_us([change.implemented_at for change in chunk])
+            connection.execute(insert(change_records_table), [
+                dict(change.model_dump(), implemented_us=us) for change, us in zip(chunk, epoch)
+            ])
+            counts["change_records"] += len(chunk)
+
+        counts["service_health"] = 0
+        for chunk in _chunks(models("service_health", ServiceHealth)):
+            epoch = _epoch_us([sample.timestamp for sample in chunk])
+            connection.execute(insert(service_health_table), [
+                dict(sample.model_dump(), timestamp_us=us) for sample, us in zip(chunk, epoch)
+            ])
+            counts["service_health"] += len(chunk)
+
+        counts["reassignments"] = 0
+        for chunk in _chunks(models("reassignments", ReassignmentRecord)):
+            connection.execute(insert(reassignments_table), [record.model_dump() for record in chunk])
+            counts["reassignments"] += len(chunk)
+    # Closing the last connection checkpoints the WAL back into the database file
+    engine.dispose()
+    os.replace(tmp_path, path)
+    print(f"Imported into {path}: " + ", ".join(f"{count} {name}" for name, count in counts.items()))
+    return path
+
+
+def verify_parity(data_dir: str = "data", database_path: Optional[str] = None,
+                  windows: Sequence[int] = (1, 7, 30, 365, 36500)) -> List[str]:
+    """
+    Compare every reference data accessor of the SQLite backend with the JSON backend, for
+    every CI, user and incident in the files. Returns one line per mismatch.
+    """
+    json_repo = DataRepository(data_dir)
+    sql_repo = SQLDataRepository(data_dir, database_path)
+    mismatches = []
+
+    def check(label: str, expected, actual):
+        if _dump(expected) != _dump(actual):
+            mismatches.append(label)
+
+    check("service_cis", json_repo.service_cis, sql_repo.service_cis)
+    check("users", json_repo.users, sql_repo.users)
+    for ci in json_repo.service_cis:
+        check(f"get_service_ci({ci.name!r})", json_repo.get_service_ci(ci.name), sql_repo.get_service_ci(ci.name))
+        check(f"get_service_ci_by_id({ci.ci_id!r})", json_repo.get_service_ci_by_id(ci.ci_id), sql_repo.get_service_ci_by_id(ci.ci_id))
+        check(f"get_users_for_service({ci.ci_id!r})", json_repo.get_users_for_service(ci), sql_repo.get_users_for_service(ci))
+        check(f"get_blast_radius({ci.ci_id!r})", json_repo.get_blast_radius(ci.ci_id), sql_repo.get_blast_radius(ci.ci_id))
+        # Every other user of the CI affected, plus one id that is not a user
+        affected = ci.users[::2] + ["\0missing"]
+        check(f"get_user_impact({ci.ci_id!r})",
+              json_repo.get_user_impact(ci, affected), sql_repo.get_user_impact(ci, affected))
+
+    ci_ids = {ci.ci_id for ci in json_repo.service_cis} | set(json_repo.changes_by_ci) | set(json_repo.health_by_ci)
+    for ci_id in sorted(ci_ids):
+        for days in windows:
+            check(f"get_recent_changes({ci_id!r}, {days})",
+                  json_repo.get_recent_changes(ci_id, days), sql_repo.get_recent_changes(ci_id, days))
+            check(f"get_service_health_history({ci_id!r}, {days})",
+                  json_repo.get_service_health_history(ci_id, days), sql_repo.get_service_health_history(ci_id, days))
+            for getter in ("get_change_series", "get_service_health_series"):
+                expected, actual = getattr(json_repo, getter)(ci_id, days), getattr(sql_repo, getter)(ci_id, days)
+                if not (np.array_equal(expected.timestamps, actual.timestamps) and np.array_equal(expected.values, actual.values)):
+                    mismatches.append(f"{getter}({ci_id!r}, {days})")
+
+    for incident_id in sorted(json_repo.reassignments_by_incident):
+        check(f"get_reassignment_history({incident_id!r})",
+              json_repo.get_reassignment_history(incident_id), sql_repo.get_reassignment_history(incident_id))
+    check("get_reassignment_history(<unknown id>)",
+          json_repo.get_reassignment_history("\0missing"), sql_repo.get_reassignment_history("\0missing"))
+
+    # The full lists may be grouped differently, so compare them as multisets
+    for name in ("change_records", "service_health", "reassignments"):
+        expected = sorted(json.dumps(r.model_dump(), sort_keys=True) for r in getattr(json_repo, name))
+        actual = sorted(json.dumps(r.model_dump(), sort_keys=True) for r in getattr(sql_repo, name))
+        if expected != actual:
+            mismatches.append(name)
+    return mismatches
+
+
+def _dump(value):
+    if value is None:
+        return None
+    if isinstance(value, list):
+        return [item.model_dump() for item in value]
+    return value.model_dump()
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Build or check the SQLite reference data backend")
+    parser.add_argument("command", choices=["import", "verify"])
+    parser.add_argument("--data-dir", default="data")
+    parser.add_argument("--database", default=None, help="defaults to MI_SQLITE_DATABASE inside the data directory")
+    parser.add_argument("--verify", action="store_true", help="after import, check parity with the JSON backend")
+    args = parser.parse_args()
+    if args.command == "import":
+        import_json(args.data_dir, args.database)
+    if args.command == "verify" or args.verify:
+        mismatches = verify_parity(args.data_dir, args.database)
+        for mismatch in mismatches:
+            print(f"MISMATCH {mismatch}")
+        print("SQLite backend matches the JSON backend" if not mismatches else f"{len(mismatches)} mismatches")
+        sys.exit(1 if mismatches else 0)
@@ -0,0 +1,53 @@
+#timeseries
+from typing import Dict, List, Optional
+import datetime
+import numpy as np
+from data.columnar import ColumnarTable, sort_by_key_and_time
+
+
+class TimeSeries:
+    """
+    One CI's rows of a columnar table, in timestamp order: views of the timestamp (datetime64)
+    and value columns, so window queries are a binary search. The rows are contiguous in the
+    table, starting at start; records are only built as models when asked for.
+    """
+
+    def __init__(self, timestamps: np.ndarray, values: np.ndarray, table: Optional[ColumnarTable] = None, start: int = 0):
+        self.timestamps = timestamps
+        self.values = values
+        self.table = table
+        self.start = start
+
+    @property
+    def records(self) -> List:
+        if self.table is None:
+            return []
+        return self.table.rows(range(self.start, self.start + len(self)))
+
+    def __len__(self) -> int:
+        return len(self.timestamps)
+
+    def since(self, cutoff: datetime.datetime) -> "TimeSeries":
+        """Records strictly after cutoff, still in timestamp order"""
+        start = int(np.searchsorted(self.timestamps, np.datetime64(cutoff, "us"), side="right"))
+        return TimeSeries(self.timestamps[start:], self.values[start:], self.table, self.start + start)
+
+    def last_days(self, days: int) -> "TimeSeries":
+        return self.since(datetime.datetime.now() - datetime.timedelta(days=days))
+
+
+EMPTY_SERIES = TimeSeries(np.array([], dtype="datetime64[us]"), np.array([], dtype=np.float64))
+
+
+def build_series_index(table: ColumnarTable, key: str, time_column: str, value_column: str) -> Dict[str, TimeSeries]:
+    """
+    Sort the table by key and timestamp once, then give each key a TimeSeries over its slice.
+    Returns the index; every series shares the one sorted table.
+    """
+    table, ranges = sort_by_key_and_time(table, key, time_column)
+    timestamps = table.column(time_column)
+    values = table.column(value_column).astype(np.float64, copy=False)
+    return {
+        k: TimeSeries(timestamps[start:end], values[start:end], table, start)
+        for k, (start, end) in ranges.items()
+    }
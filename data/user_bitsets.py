@@ -0,0 +1,92 @@
+#user_bitsets
+from typing import Dict, Iterable, List, Sequence, Tuple
+import numpy as np
+from models.model import ServiceCI, UserImpact
+
+
+def popcount(words: np.ndarray, axis=None):
+    """Set bits in uint64 words, in total or along an axis"""
+    return np.bitwise_count(words).sum(axis=axis, dtype=np.int64)
+
+
+class UserBitsets:
+    """
+    Users as dense integer ids (their row in the users dataset), with VIP and per-department
+    masks and a membership mask per CI, all as NumPy uint64 words. User impact for an incident
+    is then an AND and a popcount instead of list scans, and a batch of incidents is the same
+    operations over a 2-D array.
+    """
+
+    def __init__(self, user_ids: Sequence[str], is_vip: np.ndarray, departments: Sequence[str]):
+        # Later rows win on duplicate ids, as in DataRepository.get_users_for_service
+        self.rows: Dict[str, int] = {user_id: row for row, user_id in enumerate(user_ids)}
+        self.words = (len(user_ids) + 63) // 64
+        self.vip = self._mask(np.flatnonzero(np.asarray(is_vip, dtype=bool)))
+        self.department_names = sorted(set(departments))
+        codes = {name: code for code, name in enumerate(self.department_names)}
+        department_codes = np.fromiter((codes[name] for name in departments), dtype=np.int64, count=len(departments))
+        self.department_masks = np.zeros((len(self.department_names), self.words), dtype=np.uint64)
+        for code in range(len(self.department_names)):
+            self.department_masks[code] = self._mask(np.flatnonzero(department_codes == code))
+        # ci_id -> (the CI's user list it was built from, membership mask, member count)
+        self._membership: Dict[str, Tuple[List[str], np.ndarray, int]] = {}
+
+    def _mask(self, rows: np.ndarray) -> np.ndarray:
+        words = np.zeros(self.words, dtype=np.uint64)
+        rows = np.asarray(rows, dtype=np.uint64)
+        np.bitwise_or.at(words, (rows >> np.uint64(6)).astype(np.intp), np.uint64(1) << (rows & np.uint64(63)))
+        return words
+
+    def mask(self, user_ids: Iterable[str]) -> np.ndarray:
+        """Mask of the known users among user_ids"""
+        rows = self.rows
+        return self._mask(np.array([rows[user_id] for user_id in user_ids if user_id in rows], dtype=np.int64))
+
+    def membership(self, service_ci: ServiceCI) -> Tuple[np.ndarray, int]:
+        """Mask and count of the CI's known users, cached until the CI's user list changes"""
+        cached = self._membership.get(service_ci.ci_id)
+        if cached is not None and (cached[0] is service_ci.users or cached[0] == service_ci.users):
+            return cached[1], cached[2]
+        words = self.mask(service_ci.users)
+        count = int(popcount(words))
+        self._membership[service_ci.ci_id] = (service_ci.users, words, count)
+        return words, count
+
+    def precompute(self, service_cis: Iterable[ServiceCI]):
+        for service_ci in service_cis:
+            self.membership(service_ci)
+
+    def impact(self, service_ci: ServiceCI, affected_user_ids: Iterable[str]) -> UserImpact:
+        return self.impact_batch([service_ci], [affected_user_ids])[0]
+
+    def impact_batch(self, service_cis: Sequence[ServiceCI], affected: Sequence[Iterable[str]]) -> List[UserImpact]:
+        """User impact of many incidents at once: one row of words per incident"""
+        if not service_cis:
+            return []
+        memberships = [self.membership(service_ci) for service_ci in service_cis]
+        members = np.stack([words for words, _ in memberships])
+        hits = members & np.stack([self.mask(user_ids) for user_ids in affected])
+        affected_counts = popcount(hits, axis=1)
+        vip_affected = (hits & self.vip).any(axis=1)
+        # departments[i, d]: incident i affects a service user of department d
+        departments = np.zeros((len(service_cis), len(self.department_names)), dtype=bool)
+        for code, department_mask in enumerate(self.department_masks):
+            departments[:, code] = (hits & department_mask).any(axis=1)
+        return [
+            UserImpact(
+                service_users=count,
+                affected_service_users=int(affected_counts[i]),
+                vip_affected=bool(vip_affected[i]),
+                departments=[self.department_names[code] for code in np.flatnonzero(departments[i])],
+            )
+            for i, (_, count) in enumerate(memberships)
+        ]
+
+    def stats(self) -> Dict:
+        return {
+            "users": len(self.rows),
+            "departments": len(self.department_names),
+            "cis": len(self._membership),
+            "bytes": (self.vip.nbytes + self.department_masks.nbytes
+                      + sum(words.nbytes for _, words, _ in self._membership.values())),
+        }
@@ -0,0 +1,147 @@
+#vector_search
+from typing import Dict, Optional, Tuple, Type
+import numpy as np
+
+
+def top_k(scores: np.ndarray, k: int) -> np.ndarray:
+    """Indices of the k highest scores, best first, without sorting the whole array"""
+    k = min(k, len(scores))
+    if k <= 0:
+        return np.empty(0, dtype=np.int64)
+    if k < len(scores):
+        candidates = np.argpartition(scores, -k)[-k:]
+    else:
+        candidates = np.arange(len(scores))
+    return candidates[np.argsort(-scores[candidates], kind='stable')]
+
+
+class VectorSearch:
+    """Nearest-neighbour search over L2-normalized embeddings, where cosine similarity is a dot product"""
+
+    def __init__(self):
+        self.embeddings = np.zeros((0, 0), dtype=np.float32)
+
+    def build(self, embeddings: np.ndarray) -> "VectorSearch":
+        self.embeddings = embeddings
+        return self
+
+    def __len__(self) -> int:
+        return len(self.embeddings)
+
+    def search(self, query: np.ndarray, top_n: int) -> Tuple[np.ndarray, np.ndarray]:
+        """Return (indices, similarities) of the top_n neighbours of one query vector"""
+        raise NotImplementedError
+
+    def search_batch(self, queries: np.ndarray, top_n: int) -> Tuple[np.ndarray, np.ndarray]:
+        """Search a (num_queries, dim) matrix; rows are padded with -1 / -inf when fewer than top_n exist"""
+        k = min(top_n, len(self))
+        indices = np.full((len(queries), k), -1, dtype=np.int64)
+        similarities = np.full((len(queries), k), -np.inf, dtype=np.float32)
+        for row, query in enumerate(queries):
+            idx, sims = self.search(query, k)
+            indices[row, :len(idx)] = idx
+            similarities[row, :len(sims)] = sims
+        return indices, similarities
+
+
+class ExactSearch(VectorSearch):
+    """Brute-force search: one matrix-vector product plus argpartition"""
+
+    def search(self, query: np.ndarray, top_n: int) -> Tuple[np.ndarray, np.ndarray]:
+        if len(self) == 0:
+            return np.empty(0, dtype=np.int64), np.empty(0, dtype=np.float32)
+        scores = self.embeddings @ query
+        idx = top_k(scores, top_n)
+        return idx, scores[idx]
+
+    def search_batch(self, queries: np.ndarray, top_n: int) -> Tuple[np.ndarray, np.ndarray]:
+        k = min(top_n, len(self))
+        if k == 0:
+            return np.empty((len(queries), 0), dtype=np.int64), np.empty((len(queries), 0), dtype=np.float32)
+        # One matmul for the whole batch
+        scores = queries @ self.embeddings.T  # shape: (num_queries, num_incidents)
+        if k < scores.shape[1]:
+            candidates = np.argpartition(scores, -k, axis=1)[:, -k:]
+        else:
+            candidates = np.broadcast_to(np.arange(scores.shape[1]), scores.shape)
+        candidate_scores = np.take_along_axis(scores, candidates, axis=1)
+        order = np.argsort(-candidate_scores, axis=1, kind='stable')
+        return np.take_along_axis(candidates, order, axis=1), np.take_along_axis(candidate_scores, order, axis=1)
+
+
+class IVFSearch(VectorSearch):
+    """
+    Inverted-file approximate search. Vectors are clustered with spherical k-means; a query
+    only scores the members of its n_probe closest clusters. Raising n_probe trades latency
+    for recall, and n_probe == n_lists is exact.
+    """
+
+    def __init__(self, n_lists: int = 0, n_probe: int = 8, n_iter: int = 10,
+                 sample_per_list: int = 64, seed: int = 0):
+        super().__init__()
+        self.n_lists = n_lists  # 0 picks sqrt(corpus size)
+        self.n_probe = n_probe
+        self.n_iter = n_iter
+        self.sample_per_list = sample_per_list
+        self.seed = seed
+        self.centroids = np.zeros((0, 0), dtype=np.float32)
+        self.list_members = np.empty(0, dtype=np.int64)
+        self.list_offsets = np.zeros(1, dtype=np.int64)
+
+    def build(self, embeddings: np.ndarray) -> "IVFSearch":
+        super().build(embeddings)
+        n = len(embeddings)
+        if n == 0:
+            return self
+        n_lists = self.n_lists or int(np.sqrt(n))
+        n_lists = max(1, min(n_lists, n))
+        rng = np.random.default_rng(self.seed)
+
+        # Train centroids on a sample, then assign every vector in chunks to bound memory
+        sample_size = min(n, n_lists * self.sample_per_list)
+        sample = np.asarray(embeddings[np.sort(rng.choice(n, sample_size, replace=False))], dtype=np.float32)
+        centroids = sample[rng.choice(sample_size, n_lists, replace=False)].copy()
+        for _ in range(self.n_iter):
+            assign = np.argmax(sample @ centroids.T, axis=1)
+            sums = np.zeros_like(centroids)
+            np.add.at(sums, assign, sample)
+            norms = np.linalg.norm(sums, axis=1, keepdims=True)
+            non_empty = norms[:, 0] > 0
+            centroids[non_empty] = sums[non_empty] / norms[non_empty]
+
+        assign = np.empty(n, dtype=np.int64)
+        for start in range(0, n, 65536):
+            block = np.asarray(embeddings[start:start + 65536], dtype=np.float32)
+            assign[start:start + len(block)] = np.argmax(block @ centroids.T, axis=1)
+
+        self.centroids = centroids
+        self.list_members = np.argsort(assign, kind='stable')
+        self.list_offsets = np.concatenate(([0], np.cumsum(np.bincount(assign, minlength=n_lists))))
+        return self
+
+    def search(self, query: np.ndarray, top_n: int) -> Tuple[np.ndarray, np.ndarray]:
+        if len(self) == 0:
+            return np.empty(0, dtype=np.int64), np.empty(0, dtype=np.float32)
+        probes = top_k(self.centroids @ query, self.n_probe)
+        # Sorted candidate ids keep reads from a memory-mapped matrix sequential
+        candidates = np.sort(np.concatenate([
+            self.list_members[self.list_offsets[p]:self.list_offsets[p + 1]] for p in probes
+        ]))
+        scores = np.asarray(self.embeddings[candidates], dtype=np.float32) @ query
+        idx = top_k(scores, top_n)
+        return candidates[idx], scores[idx]
+
+
+SEARCH_BACKENDS: Dict[str, Type[VectorSearch]] = {
+    "exact": ExactSearch,
+    "ivf": IVFSearch,
+}
+
+
+def create_search_backend(name: str, options: Optional[Dict] = None) -> VectorSearch:
+    """Instantiate a search backend by its configured name"""
+    try:
+        backend_cls = SEARCH_BACKENDS[name.lower()]
+    except KeyError:
+        raise ValueError(f"Unknown search backend '{name}'. Choose from: {', '.join(SEARCH_BACKENDS)}")
+    return backend_cls(**(options or {}))
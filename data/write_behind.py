@@ -0,0 +1,78 @@
+#write_behind
+from typing import Dict, Hashable, Optional, Tuple
+from collections import OrderedDict
+import atexit
+import sqlite3
+import threading
+
+
+class WriteBehind:
+    """
+    Write-behind buffer for a SQLite cache tier. Callers queue statements, which costs no I/O;
+    a background thread applies everything queued in one transaction every flush_seconds on
+    its own connection, so lookups on the event loop never wait on a commit. A statement queued
+    with a dedupe key replaces the pending one with the same key (e.g. repeated last_access
+    touches of one row) and moves to the end, keeping the order of the latest writes.
+    """
+
+    def __init__(self, sqlite_path: str, flush_seconds: float = 1.0, name: str = "mi-sqlite-write-behind"):
+        self.sqlite_path = sqlite_path
+        self.flush_seconds = flush_seconds
+        self.name = name
+        self._pending: "OrderedDict[Hashable, Tuple[str, tuple]]" = OrderedDict()
+        self._sequence = 0
+        self._lock = threading.Lock()
+        # Serializes flushes from the thread and from atexit
+        self._flush_lock = threading.Lock()
+        self._db: Optional[sqlite3.Connection] = None
+        self._thread: Optional[threading.Thread] = None
+        self._stop = threading.Event()
+        self._stats = {"flushes": 0, "statements": 0, "failed_flushes": 0}
+
+    def add(self, statement: str, params: tuple = (), dedupe: Optional[Hashable] = None):
+        with self._lock:
+            if dedupe is None:
+                self._sequence += 1
+                dedupe = ("seq", self._sequence)
+            self._pending.pop(dedupe, None)
+            self._pending[dedupe] = (statement, params)
+            if self._thread is None:
+                self._thread = threading.Thread(target=self._run, name=self.name, daemon=True)
+                self._thread.start()
+                atexit.register(self.close)
+
+    def _run(self):
+        while not self._stop.wait(self.flush_seconds):
+            try:
+                self.flush()
+            except Exception as e:
+                print(f"{self.name}: flush failed: {e}")
+
+    def flush(self):
+        """Apply every queued statement in one transaction"""
+        with self._flush_lock:
+            with self._lock:
+                pending, self._pending = list(self._pending.values()), OrderedDict()
+            if not pending:
+                return
+            if self._db is None:
+                self._db = sqlite3.connect(self.sqlite_path, check_same_thread=False)
+            try:
+                with self._db:
+                    for statement, params in pending:
+                        self._db.execute(statement, params)
+            except Exception:
+                self._stats["failed_flushes"] += 1
+                raise
+            self._stats["flushes"] += 1
+            self._stats["statements"] += len(pending)
+
+    def close(self):
+        self._stop.set()
+        self.flush()
+
+    def stats(self) -> Dict:
+        with self._lock:
+            stats = dict(self._stats)
+            stats["pending"] = len(self._pending)
+        return stats
@@ -1,7 +1,7 @@
 #Extractor
-from typing import Dict, Tuple
+from typing import Dict, List, Tuple
 from data.repo import DataRepository
-from models.model import Incident, ServiceCI
+from models.model import Incident, HistoricalIncident, ServiceCI, UserImpact
 
 
 class FeatureExtractor:
@@ -12,21 +12,27 @@ class FeatureExtractor:
     def get_user_impact_score(self, incident: Incident, service_ci: ServiceCI) -> Tuple[float, Dict]:
         """Calculate the user impact score based on affected users percentage and criticality"""
         print("Calculating user impact score...")
-        all_service_users = self.data_repo.get_users_for_service(service_ci)
-        
-        if not all_service_users:
+        impact = self.data_repo.get_user_impact(service_ci, incident.affected_users or [])
+        score, details = self._score_user_impact(incident, impact)
+        print(f"User impact score: {score} \n details: {details}")
+        return score, details
+    
+    def get_user_impact_scores(self, incidents: List[Incident], service_cis: List[ServiceCI]) -> List[Tuple[float, Dict]]:
+        """User impact scores for a batch, from one set of bitset operations over every incident"""
+        impacts = self.data_repo.get_user_impacts(service_cis, [incident.affected_users or [] for incident in incidents])
+        return [self._score_user_impact(incident, impact) for incident, impact in zip(incidents, impacts)]
+    
+    def _score_user_impact(self, incident: Incident, impact: UserImpact) -> Tuple[float, Dict]:
+        if not impact.service_users:
             return 0.0, {"affected_users_pct": 0, "vip_affected": False, "critical_depts": []}
         
         # Calculate affected percentage (if specified in incident)
         affected_count = len(incident.affected_users) if incident.affected_users else 0
-        affected_pct = affected_count / len(all_service_users) if all_service_users else 0
-        
-        # Check if VIP users are affected
-        affected_users = [u for u in all_service_users if u.user_id in incident.affected_users]
-        vip_affected = any(user.is_vip for user in affected_users)
+        affected_pct = affected_count / impact.service_users
         
-        # Identify affected departments
-        affected_depts = set(user.department for user in affected_users)
+        # VIPs and departments among the affected service users, from the repository's bitsets
+        vip_affected = impact.vip_affected
+        affected_depts = impact.departments
         
         # If no explicit affected users are specified but priority is high, assume high impact
         if not incident.affected_users and incident.priority <= 2:
@@ -47,14 +53,28 @@ class FeatureExtractor:
             "vip_affected": vip_affected,
             "critical_depts": list(affected_depts)
         }
-        print(f"User impact score: {score} \n details: {details}")
         return score, details
     
     def get_resolution_time_score(self, incident: Incident) -> Tuple[float, Dict]:
         """Predict resolution time based on similar historical incidents"""
         # print("Calculating resolution time score...")
         similar_incidents = self.data_repo.get_similar_incidents(incident)
-        
+        return self._score_resolution_time(similar_incidents)
+    
+    async def aget_resolution_time_score(self, incident: Incident, executor=None) -> Tuple[float, Dict]:
+        """
+        get_resolution_time_score for coroutines; the query encode joins the repository's
+        micro-batch and the similarity search runs on executor
+        """
+        similar_incidents = await self.data_repo.aget_similar_incidents(incident, executor=executor)
+        return self._score_resolution_time(similar_incidents)
+    
+    def get_resolution_time_scores(self, incidents: List[Incident]) -> List[Tuple[float, Dict]]:
+        """Resolution time scores for a batch, embedding every incident in a single encode call"""
+        similar_per_incident = self.data_repo.get_similar_incidents_batch(incidents)
+        return [self._score_resolution_time(similar) for similar in similar_per_incident]
+    
+    def _score_resolution_time(self, similar_incidents: List[HistoricalIncident]) -> Tuple[float, Dict]:
         if not similar_incidents:
             # No similar incidents found, moderate score due to uncertainty
             return 0.5, {"avg_resolution_time": "unknown", "similar_incidents": 0}
@@ -111,13 +131,14 @@ class FeatureExtractor:
     def get_change_volume_score(self, service_ci: ServiceCI, days: int = 7) -> Tuple[float, Dict]:
         """Analyze recent changes and their risk scores"""
         # print("Calculating change volume score...")
-        recent_changes = self.data_repo.get_recent_changes(service_ci.ci_id, days)
+        recent_changes = self.data_repo.get_change_series(service_ci.ci_id, days)
         
-        if not recent_changes:
+        if not len(recent_changes):
             return 0.1, {"change_count": 0, "avg_risk_score": 0}
         
         # Calculate average risk score
-        avg_risk_score = sum(change.risk_score for change in recent_changes) / len(recent_changes)
+        risk_scores = recent_changes.values
+        avg_risk_score = float(risk_scores.mean())
         
         # More changes with higher risk scores = higher chance of major incident
         # Normalize to 0-1 range
@@ -127,7 +148,7 @@ class FeatureExtractor:
         details = {
             "change_count": len(recent_changes),
             "avg_risk_score": avg_risk_score,
-            "high_risk_changes": sum(1 for c in recent_changes if c.risk_score > 0.7)
+            "high_risk_changes": int((risk_scores > 0.7).sum())
         }
         # print(f"Change volume score: {score} \n details: {details}")
         return score, details
@@ -135,22 +156,20 @@ class FeatureExtractor:
     def get_service_health_score(self, service_ci: ServiceCI, days: int = 30) -> Tuple[float, Dict]:
         """Analyze service health trends"""
         # print("Calculating service health score...")
-        health_records = self.data_repo.get_service_health_history(service_ci.ci_id, days)
+        # Series arrive sorted by timestamp
+        health_records = self.data_repo.get_service_health_series(service_ci.ci_id, days)
         
-        if not health_records:
+        if not len(health_records):
             return 0.5, {"current_health": "unknown", "trend": "unknown"}
         
-        # Sort by timestamp
-        health_records.sort(key=lambda x: x.timestamp)
-        
         # Calculate current health (most recent)
-        current_health = health_records[-1].health_score
+        health_scores = health_records.values
+        current_health = float(health_scores[-1])
         
         # Calculate health trend
         if len(health_records) >= 3:
             # Use last 3 records for trend
-            recent_records = health_records[-3:]
-            scores = [r.health_score for r in recent_records]
+            scores = health_scores[-3:].tolist()
             
             if scores[2] < scores[0]:
                 trend = "declining"
@@ -174,4 +193,26 @@ class FeatureExtractor:
             "records_analyzed": len(health_records)
         }
         # print(f"Service health score: {score} \n details: {details}")
-        return score, details
\ No newline at end of file
+        return score, details
+    
+    def get_blast_radius_score(self, service_ci: ServiceCI) -> Tuple[float, Dict]:
+        """Score how much depends on the CI: downstream users and criticality, precomputed per CI"""
+        radius = self.data_repo.get_blast_radius(service_ci.ci_id)
+        
+        if not radius.downstream_cis:
+            return 0.0, {"downstream_cis": 0, "downstream_users": 0, "downstream_criticality": 0}
+        
+        # More users and more critical services behind this CI = wider outage
+        # Normalize to 0-1 range
+        user_factor = min(1.0, radius.downstream_users / 50)  # Caps at 50 users
+        criticality_factor = min(1.0, radius.downstream_criticality / 20)  # Caps at e.g. four criticality-5 CIs
+        score = (0.5 * user_factor) + (0.5 * criticality_factor)
+        
+        details = {
+            "direct_dependents": radius.direct_dependents,
+            "downstream_cis": radius.downstream_cis,
+            "downstream_users": radius.downstream_users,
+            "downstream_criticality": radius.downstream_criticality,
+            "critical_dependents": radius.critical_dependents
+        }
+        return score, details
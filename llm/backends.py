@@ -0,0 +1,142 @@
+#backends
+from typing import AsyncIterator, Optional
+import asyncio
+import json
+import os
+import random
+import re
+import config
+
+
+class LLMBackend:
+    """A chat model that turns a prompt into response text"""
+    model_name: str = ""
+
+    async def ainvoke(self, prompt: str) -> str:
+        raise NotImplementedError
+
+    async def astream(self, prompt: str) -> AsyncIterator[str]:
+        """Stream the response in chunks; backends without streaming yield it whole"""
+        yield await self.ainvoke(prompt)
+
+
+class LangChainChatBackend(LLMBackend):
+    """Adapter for any LangChain chat model"""
+
+    def __init__(self, chat_model, model_name: str):
+        self.chat_model = chat_model
+        self.model_name = model_name
+
+    async def ainvoke(self, prompt: str) -> str:
+        response = await self.chat_model.ainvoke(prompt)
+        return response.content
+
+    async def astream(self, prompt: str) -> AsyncIterator[str]:
+        async for chunk in self.chat_model.astream(prompt):
+            if chunk.content:
+                yield chunk.content
+
+
+class StubLLMError(RuntimeError):
+    """Simulated provider failure raised by LocalStubBackend"""
+
+
+class LocalStubBackend(LLMBackend):
+    """
+    Offline stand-in for a chat model, for load tests. It answers with schema-valid
+    MIReasoningOutput JSON whose decision follows the weighted score in the prompt.
+    Latency is log-normal around latency_ms (latency_sigma=0 makes it constant);
+    failure_rate of calls raise StubLLMError and malformed_rate return plain text
+    to exercise the parser fallback. A seed makes a run reproducible.
+    """
+    model_name = "local-stub"
+    _score_pattern = re.compile(r"WEIGHTED SCORE:\s*([0-9.]+)\s*\(Threshold:\s*([0-9.]+)\)")
+    _id_pattern = re.compile(r"^ID:\s*(\S+)\s*$", re.MULTILINE)
+
+    def __init__(self, latency_ms: float = 0.0, latency_sigma: float = 0.0, failure_rate: float = 0.0,
+                 malformed_rate: float = 0.0, seed: Optional[int] = None):
+        self.latency_ms = latency_ms
+        self.latency_sigma = latency_sigma
+        self.failure_rate = failure_rate
+        self.malformed_rate = malformed_rate
+        self.random = random.Random(seed)
+        self.calls = 0
+        self.total_latency_ms = 0.0
+
+    def sample_latency_ms(self) -> float:
+        if self.latency_ms <= 0:
+            return 0.0
+        if self.latency_sigma <= 0:
+            return self.latency_ms
+        return self.random.lognormvariate(0.0, self.latency_sigma) * self.latency_ms
+
+    def build_response(self, prompt: str) -> str:
+        """A single reasoning object, or a {"results": [...]} list when the prompt packs several incidents"""
+        matches = self._score_pattern.findall(prompt)
+        if len(matches) > 1:
+            ids = self._id_pattern.findall(prompt)
+            return json.dumps({"results": [
+                dict(self._reasoning(float(score), float(threshold)), incident_id=incident_id)
+                for incident_id, (score, threshold) in zip(ids, matches)
+            ]})
+        weighted_score, threshold = (float(matches[0][0]), float(matches[0][1])) if matches else (0.0, 0.5)
+        return json.dumps(self._reasoning(weighted_score, threshold))
+
+    def _reasoning(self, weighted_score: float, threshold: float) -> dict:
+        decision = weighted_score >= threshold
+        label = "Major Incident" if decision else "Regular Incident"
+        return {
+            "summary_reasoning": f"Stub: weighted score {weighted_score:.2f} against threshold {threshold:.2f} suggests a {label}.",
+            "full_reasoning": "\n".join([
+                "• User Impact: Stub analysis.",
+                "• Resolution Time: Stub analysis.",
+                "• Reassignment Count: Stub analysis.",
+                "• Change Volume: Stub analysis.",
+                "• Service Health: Stub analysis.",
+                "• Blast Radius: Stub analysis.",
+                f"• Overall Assessment: Classified as {label} by the local stub backend.",
+            ]),
+            "decision": decision,
+        }
+
+    async def ainvoke(self, prompt: str) -> str:
+        self.calls += 1
+        latency_ms = self.sample_latency_ms()
+        self.total_latency_ms += latency_ms
+        if latency_ms:
+            await asyncio.sleep(latency_ms / 1000)
+        if self.random.random() < self.failure_rate:
+            raise StubLLMError("Simulated LLM provider failure")
+        if self.random.random() < self.malformed_rate:
+            return "This incident is not a major incident based on the stub analysis."
+        return self.build_response(prompt)
+
+
+    async def astream(self, prompt: str) -> AsyncIterator[str]:
+        """Deliver the response in small chunks after the simulated latency, like a token stream"""
+        response = await self.ainvoke(prompt)
+        for start in range(0, len(response), 16):
+            yield response[start:start + 16]
+            await asyncio.sleep(0)
+
+
+def create_backend(provider: str, model_name: str) -> LLMBackend:
+    """Build the LLM backend for a configured provider name, importing only that provider's client"""
+    provider = provider.lower()
+    if provider == "openai":
+        from langchain_openai import ChatOpenAI
+        api_key = os.getenv("OPENAI_API_KEY")
+        return LangChainChatBackend(ChatOpenAI(model=model_name, temperature=0, openai_api_key=api_key), model_name)
+    if provider == "gemini":
+        from langchain_google_genai import ChatGoogleGenerativeAI
+        api_key = os.getenv("GOOGLE_API_KEY")
+        return LangChainChatBackend(ChatGoogleGenerativeAI(model=model_name, google_api_key=api_key, temperature=0), model_name)
+    if provider == "stub":
+        return LocalStubBackend(
+            latency_ms=config.STUB_LATENCY_MS,
+            latency_sigma=config.STUB_LATENCY_SIGMA,
+            failure_rate=config.STUB_FAILURE_RATE,
+            malformed_rate=config.STUB_MALFORMED_RATE,
+            seed=config.STUB_SEED,
+        )
+    raise ValueError(f"Unknown LLM provider '{provider}'. Choose from: openai, gemini, stub")
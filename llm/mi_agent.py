@@ -1,18 +1,28 @@
 #mi_agent
-from data.repo import DataRepository
+import asyncio
+import time
+from concurrent.futures import ThreadPoolExecutor
+from typing import AsyncIterator, Dict, List, Optional, Tuple, Union
+from data.repo import create_data_repository
 from features.extractor import FeatureExtractor
-from llm.mi_detection import MIDetectionLLM
-from models.model import Incident, MIDetectionResult
+from llm.mi_detection import MIDetectionLLM, build_templated_reasoning
+from llm.storm import StormCorrelator
+from models.model import Incident, MIDetectionResult, ServiceCI
+import config
+
+
+def elapsed_ms(started: float) -> float:
+    return (time.perf_counter() - started) * 1000
 
 
 class MIDetectionAgent:
-    def __init__(self, data_repo_path: str = "data"):
-        self.data_repo = DataRepository(data_repo_path)
+    def __init__(self, data_repo_path: str = "data", llm_engine: Optional[MIDetectionLLM] = None):
+        self.data_repo = create_data_repository(data_repo_path)
         self.feature_extractor = FeatureExtractor(self.data_repo)
         try:
             print("Feature extractor initialized")
             print("Before llm...")
-            self.llm_engine = MIDetectionLLM()
+            self.llm_engine = llm_engine if llm_engine is not None else MIDetectionLLM()
             print("After llm...")
         except Exception as e:
             print(f"Exception during init: {e}")
@@ -31,54 +41,112 @@ class MIDetectionAgent:
             'reassignment_count': 0.15,
             'change_volume': 0.15,
             'service_health': 0.15,
+            # Reported to the LLM either way; 0 (the default) keeps it out of the weighted score
+            'blast_radius': config.BLAST_RADIUS_WEIGHT,
             'similar_incidents': 0.10
         }
         
+        # Order in which predictors are reported and shown to the LLM
+        self.feature_order = ['user_impact', 'resolution_time', 'reassignment_count', 'change_volume', 'service_health',
+                              'blast_radius']
+        
         # Decision threshold
         self.threshold = 0.50
+        
+        # Scores further than this from the threshold are decided without the LLM
+        self.llm_confidence_band = config.LLM_CONFIDENCE_BAND
+        self.llm_stats = {"llm_calls": 0, "llm_skipped": 0}
+        
+        # During incident storms, near-duplicate incidents on a service share one detection
+        self.storm = None
+        if config.STORM_WINDOW_SECONDS > 0:
+            self.storm = StormCorrelator(self, config.STORM_WINDOW_SECONDS, config.STORM_SIMILARITY)
+        
+        # Bounded pool for embedding work; the model releases the GIL during inference
+        self.embedding_executor = ThreadPoolExecutor(
+            max_workers=config.EMBEDDING_WORKERS, thread_name_prefix="mi-embedding"
+        )
     
-    async def detect_major_incident(self, incident: Incident) -> MIDetectionResult:
-        """Main method to detect if an incident is a major incident"""
-        # Get the service CI
-        #print(f"incident.service_ci_name: {incident.service_ci_name}")
+    def warm_up(self):
+        """Preload reference data and the embedding model ahead of the first request"""
+        self.data_repo.warm_up()
+        if not hasattr(self, "llm_engine"):
+            print("Warning: LLM client failed to initialise during warm-up")
+    
+    def _get_service_ci(self, incident: Incident) -> ServiceCI:
         service_ci = self.data_repo.get_service_ci(incident.service_ci_name)
         if not service_ci:
             raise ValueError(f"Service CI not found: {incident.service_ci_name}")
-        
-        # Extract features
-        scores = {}
-        details = {}
-        
-         # Get user impact score
-        
-        scores['user_impact'], details['user_impact'] = self.feature_extractor.get_user_impact_score(incident, service_ci)
-        
-        # Get resolution time score
-        scores['resolution_time'], details['resolution_time'] = self.feature_extractor.get_resolution_time_score(incident)
-
-        # Get reassignment score
-        scores['reassignment_count'], details['reassignment_count'] = self.feature_extractor.get_reassignment_score(incident)
-        
-        # Get change volume score
-        scores['change_volume'], details['change_volume'] = self.feature_extractor.get_change_volume_score(service_ci)
-        
-        # Get service health score
-        scores['service_health'], details['service_health'] = self.feature_extractor.get_service_health_score(service_ci)        
-        
-        # Calculate weighted score
-        weighted_score = sum(scores[key] * self.feature_weights[key] for key in scores)
-        
-        # Get LLM reasoning with structured output
-        reasoning_output = await self.llm_engine.get_reasoning(incident, scores, details, weighted_score)
-        print(self.llm_engine.get_reasoning)
-
+        return service_ci
+    
+    def _extract_lookup_features(self, incident: Incident, service_ci: ServiceCI, timings: Dict[str, float],
+                                 computed: Optional[Dict[str, Tuple[float, Dict]]] = None) -> Dict[str, Tuple[float, Dict]]:
+        """
+        Cheap lookup-based features, run inline; the embedding-based resolution time score is not
+        included. Features already in computed (e.g. scored for a whole batch) are kept.
+        """
+        lookup_features = {
+            'user_impact': lambda: self.feature_extractor.get_user_impact_score(incident, service_ci),
+            'reassignment_count': lambda: self.feature_extractor.get_reassignment_score(incident),
+            'change_volume': lambda: self.feature_extractor.get_change_volume_score(service_ci),
+            'service_health': lambda: self.feature_extractor.get_service_health_score(service_ci),
+            'blast_radius': lambda: self.feature_extractor.get_blast_radius_score(service_ci),
+        }
+        computed = dict(computed or {})
+        for name, compute in lookup_features.items():
+            if name in computed:
+                continue
+            started = time.perf_counter()
+            computed[name] = compute()
+            timings[name] = elapsed_ms(started)
+        return computed
+    
+    def _assemble_features(self, computed: Dict[str, Tuple[float, Dict]]) -> Tuple[Dict, Dict]:
+        """Split (score, details) pairs into predictor scores and details, in reporting order"""
+        scores = {name: computed[name][0] for name in self.feature_order}
+        details = {name: computed[name][1] for name in self.feature_order}
+        return scores, details
+    
+    async def _run_in_embedding_pool(self, fn, *args):
+        """Run embedding work on the bounded pool so transformer inference never blocks the event loop"""
+        loop = asyncio.get_running_loop()
+        return await loop.run_in_executor(self.embedding_executor, fn, *args)
+    
+    def _weighted_score(self, scores: Dict) -> float:
+        return sum(scores[key] * self.feature_weights[key] for key in scores)
+    
+    def _is_decisive(self, weighted_score: float) -> bool:
+        return abs(weighted_score - self.threshold) > self.llm_confidence_band
+    
+    async def _get_reasoning(self, incident: Incident, scores: Dict, details: Dict, weighted_score: float) -> Dict:
+        """Ask the LLM only for borderline scores; decisive ones get templated reasoning"""
+        if self._is_decisive(weighted_score):
+            self.llm_stats["llm_skipped"] += 1
+            return build_templated_reasoning(scores, details, weighted_score, self.threshold)
+        self.llm_stats["llm_calls"] += 1
+        return await self.llm_engine.get_reasoning(incident, scores, details, weighted_score)
+    
+    def get_metrics(self) -> Dict:
+        """Counters describing the work the agent has done"""
+        metrics = {"llm": dict(self.llm_stats)}
+        metrics.update(self.data_repo.get_metrics())
+        if self.storm is not None:
+            metrics["storm"] = self.storm.stats()
+        llm_engine = getattr(self, "llm_engine", None)
+        if llm_engine is not None and llm_engine.cache is not None:
+            metrics["llm_cache"] = llm_engine.cache.stats()
+        if llm_engine is not None:
+            metrics["llm_scheduler"] = llm_engine.scheduler.stats()
+            metrics["llm_prompt"] = dict(llm_engine.prompt_stats)
+            metrics["llm_packing"] = dict(llm_engine.pack_stats)
+        return metrics
+    
+    def _build_result(self, scores: Dict, details: Dict, weighted_score: float,
+                      reasoning_output: Dict, timings: Dict[str, float]) -> MIDetectionResult:
         # Extract decision and reasoning
         is_major_incident = reasoning_output["decision"]
         llm_reasoning = reasoning_output["full_reasoning"]
         summary_reasoning = reasoning_output["summary_reasoning"]
-        #is_major_incident = True
-        #llm_reasoning = "Resolution Time: Estimated to exceed 6 hours."
-        #summary_reasoning = "Mocked: High user impact and long resolution time suggest a major incident."
         
         # Calculate confidence based on how far the score is from the threshold
         confidence = abs(weighted_score - self.threshold) / 0.35  # Normalize to approximate 0-1 range
@@ -99,5 +167,155 @@ class MIDetectionAgent:
             llm_reasoning=llm_reasoning,
             recommendation=recommendation,
             summary_reasoning=summary_reasoning,  # New field
-            details=details  # New field
-        )
\ No newline at end of file
+            details=details,  # New field
+            feature_timings=timings
+        )
+    
+    async def _score_incident(self, incident: Incident) -> Tuple[Dict, Dict, float, Dict[str, float]]:
+        """Predictor scores, details, weighted score and per-feature timings for one incident"""
+        # Get the service CI
+        service_ci = self._get_service_ci(incident)
+        
+        # Extract features: start the embedding work first, then do the cheap lookups while it runs
+        timings = {}
+        started = time.perf_counter()
+        if self.data_repo.encode_batcher is not None:
+            # The encode waits on the micro-batcher, so concurrent requests share one model call
+            resolution_call = self.feature_extractor.aget_resolution_time_score(incident, self.embedding_executor)
+        else:
+            resolution_call = self._run_in_embedding_pool(self.feature_extractor.get_resolution_time_score, incident)
+        resolution_task = asyncio.ensure_future(resolution_call)
+        try:
+            computed = self._extract_lookup_features(incident, service_ci, timings)
+        except Exception:
+            resolution_task.cancel()
+            raise
+        computed['resolution_time'] = await resolution_task
+        timings['resolution_time'] = elapsed_ms(started)
+        scores, details = self._assemble_features(computed)
+        
+        # Calculate weighted score
+        weighted_score = self._weighted_score(scores)
+        return scores, details, weighted_score, timings
+    
+    async def detect_major_incident(self, incident: Incident) -> MIDetectionResult:
+        """Main method to detect if an incident is a major incident"""
+        if self.storm is not None:
+            return await self.storm.detect(incident)
+        return await self._detect_major_incident(incident)
+    
+    async def _detect_major_incident(self, incident: Incident) -> MIDetectionResult:
+        scores, details, weighted_score, timings = await self._score_incident(incident)
+        
+        # Get LLM reasoning with structured output
+        reasoning_output = await self._get_reasoning(incident, scores, details, weighted_score)
+
+        return self._build_result(scores, details, weighted_score, reasoning_output, timings)
+    
+    async def stream_major_incident(self, incident: Incident) -> AsyncIterator[Tuple[str, Dict]]:
+        """
+        Progressive detection. Yields ("features", ...) as soon as the predictor scores are
+        known, then ("token", ...) for each chunk of LLM reasoning, then ("result", ...) with
+        the full MIDetectionResult.
+        """
+        scores, details, weighted_score, timings = await self._score_incident(incident)
+        yield "features", {
+            "incident_id": incident.incident_id,
+            "predictor_scores": scores,
+            "weighted_score": weighted_score,
+            "details": details,
+            "feature_timings": timings
+        }
+        
+        if self._is_decisive(weighted_score):
+            self.llm_stats["llm_skipped"] += 1
+            reasoning_output = build_templated_reasoning(scores, details, weighted_score, self.threshold)
+        else:
+            self.llm_stats["llm_calls"] += 1
+            reasoning_output = None
+            async for kind, payload in self.llm_engine.stream_reasoning(incident, scores, details, weighted_score):
+                if kind == "token":
+                    yield "token", {"text": payload}
+                else:
+                    reasoning_output = payload
+        
+        result = self._build_result(scores, details, weighted_score, reasoning_output, timings)
+        yield "result", dict(result.dict(), incident_id=incident.incident_id)
+    
+    async def detect_major_incidents(self, incidents: List[Incident]) -> List[Union[MIDetectionResult, Exception]]:
+        """
+        Detect major incidents for a batch. All query texts are embedded in one encode call and
+        ranked with one similarity matmul. Results come back in input order; an item that fails
+        holds its exception instead of failing the whole batch.
+        """
+        results: List[Union[MIDetectionResult, Exception, None]] = [None] * len(incidents)
+        
+        # Resolve service CIs, recording failures per item
+        resolved = []
+        for position, incident in enumerate(incidents):
+            try:
+                resolved.append((position, incident, self._get_service_ci(incident)))
+            except Exception as e:
+                results[position] = e
+        
+        # Resolution time scores for the whole batch at once
+        started = time.perf_counter()
+        try:
+            resolution_times = await self._run_in_embedding_pool(
+                self.feature_extractor.get_resolution_time_scores, [incident for _, incident, _ in resolved]
+            )
+        except Exception as e:
+            for position, _, _ in resolved:
+                results[position] = e
+            return results
+        batch_resolution_ms = elapsed_ms(started)
+        
+        # User impact for the whole batch in one set of bitset operations
+        started = time.perf_counter()
+        try:
+            user_impacts = self.feature_extractor.get_user_impact_scores(
+                [incident for _, incident, _ in resolved], [service_ci for _, _, service_ci in resolved]
+            )
+        except Exception as e:
+            for position, _, _ in resolved:
+                results[position] = e
+            return results
+        batch_user_impact_ms = elapsed_ms(started)
+        
+        pending = []
+        for (position, incident, service_ci), resolution_time, user_impact in zip(resolved, resolution_times, user_impacts):
+            try:
+                timings = {'resolution_time': batch_resolution_ms, 'user_impact': batch_user_impact_ms}
+                computed = self._extract_lookup_features(incident, service_ci, timings, {'user_impact': user_impact})
+                computed['resolution_time'] = resolution_time
+                scores, details = self._assemble_features(computed)
+                pending.append((position, incident, scores, details, self._weighted_score(scores), timings))
+            except Exception as e:
+                results[position] = e
+        
+        # Decisive scores get templated reasoning; borderline ones share packed LLM calls
+        reasoning_outputs = [None] * len(pending)
+        borderline = []
+        for index, (_, incident, scores, details, weighted_score, _) in enumerate(pending):
+            if self._is_decisive(weighted_score):
+                self.llm_stats["llm_skipped"] += 1
+                reasoning_outputs[index] = build_templated_reasoning(scores, details, weighted_score, self.threshold)
+            else:
+                borderline.append(index)
+        if borderline:
+            self.llm_stats["llm_calls"] += len(borderline)
+            try:
+                batch_outputs = await self.llm_engine.get_reasoning_batch(
+                    [(pending[i][1], pending[i][2], pending[i][3], pending[i][4]) for i in borderline]
+                )
+            except Exception as e:
+                batch_outputs = [e] * len(borderline)
+            for index, reasoning_output in zip(borderline, batch_outputs):
+                reasoning_outputs[index] = reasoning_output
+        
+        for (position, _, scores, details, weighted_score, timings), reasoning_output in zip(pending, reasoning_outputs):
+            if isinstance(reasoning_output, Exception):
+                results[position] = reasoning_output
+            else:
+                results[position] = self._build_result(scores, details, weighted_score, reasoning_output, timings)
+        return results
@@ -1,40 +1,125 @@
 #midetection
-from typing import Dict, List
-from langchain_openai import ChatOpenAI
-from langchain.output_parsers import PydanticOutputParser
-from models.model import Incident, MIReasoningOutput
-import openai
-import os
+from typing import AsyncIterator, Dict, List, Optional, Tuple, Union
+import asyncio
+from models.model import Incident, MIReasoningOutput, MIPackedReasoningOutput
+from llm.response_cache import ResponseCache
+from llm.backends import LLMBackend, create_backend
+from llm.scheduler import LLMScheduler
+from llm.prompt import PromptBuilder, TokenCounter
+import config
 
-from langchain_google_genai import ChatGoogleGenerativeAI
-#from langchain.output_parsers import PydanticOutputParser
-#from your_output_model import MIReasoningOutput  # replace with your actual model
-from langchain_google_genai import ChatGoogleGenerativeAI
 
+def _describe_predictor(predictor: str, detail: Dict) -> str:
+    """One sentence summarising a predictor's details for templated reasoning"""
+    if predictor == 'user_impact':
+        depts = ", ".join(detail.get("critical_depts") or []) or "none identified"
+        vip = "VIP users affected" if detail.get("vip_affected") else "no VIP users affected"
+        return f"{detail.get('affected_users_pct', 0):.1f}% of service users affected, {vip}; departments: {depts}."
+    if predictor == 'resolution_time':
+        if not detail.get("similar_incidents"):
+            return "No similar historical incidents found."
+        return (f"{detail['similar_incidents']} similar incidents averaged {detail.get('avg_resolution_time', 'unknown')}, "
+                f"{detail.get('similar_major_incidents_pct', 0):.0f}% of them major.")
+    if predictor == 'reassignment_count':
+        groups = ", ".join(detail.get("groups_involved") or []) or "none"
+        return f"{detail.get('reassignment_count', 0)} reassignments; groups involved: {groups}."
+    if predictor == 'change_volume':
+        return (f"{detail.get('change_count', 0)} recent changes with average risk {detail.get('avg_risk_score', 0):.2f}, "
+                f"{detail.get('high_risk_changes', 0)} high-risk.")
+    if predictor == 'service_health':
+        return f"Current health {detail.get('current_health', 'unknown')}, trend {detail.get('trend', 'unknown')}."
+    if predictor == 'blast_radius':
+        if not detail.get("downstream_cis"):
+            return "No other CIs depend on this service."
+        critical = ", ".join(detail.get("critical_dependents") or []) or "none"
+        return (f"{detail['downstream_cis']} dependent CIs with {detail.get('downstream_users', 0)} users "
+                f"and total criticality {detail.get('downstream_criticality', 0)}; critical dependents: {critical}.")
+    return "; ".join(f"{key}: {value}" for key, value in detail.items()) + "."
+
+
+def build_templated_reasoning(scores: Dict, details: Dict, weighted_score: float, threshold: float) -> Dict:
+    """
+    Deterministic reasoning in the same shape as get_reasoning, built from the predictor details.
+    Used when the weighted score makes the decision obvious and an LLM call is not worth it.
+    """
+    decision = weighted_score >= threshold
+    label = "Major Incident" if decision else "Regular Incident"
+    direction = "above" if decision else "below"
+    
+    lines = []
+    for predictor, score in scores.items():
+        title = predictor.replace('_', ' ').title()
+        lines.append(f"• {title}: Score {score:.2f}. {_describe_predictor(predictor, details.get(predictor, {}))}")
+    lines.append(f"• Overall Assessment: Weighted score {weighted_score:.2f} is {direction} the {threshold:.2f} threshold; classified as {label}.")
+    
+    return {
+        "summary_reasoning": f"Weighted score {weighted_score:.2f} is {direction} the {threshold:.2f} threshold: {label}.",
+        "full_reasoning": "\n".join(lines),
+        "decision": decision
+    }
+
+def create_response_cache() -> Optional[ResponseCache]:
+    """Response cache from configuration, or None when MI_LLM_CACHE_SIZE is 0"""
+    if config.LLM_CACHE_SIZE <= 0:
+        return None
+    return ResponseCache(
+        max_entries=config.LLM_CACHE_SIZE,
+        ttl_seconds=config.LLM_CACHE_TTL_SECONDS,
+        sqlite_path=config.LLM_CACHE_SQLITE_PATH or None,
+        sqlite_max_entries=config.LLM_CACHE_SQLITE_MAX_ENTRIES,
+    )
+
+
+def create_scheduler() -> LLMScheduler:
+    return LLMScheduler(
+        max_concurrency=config.LLM_MAX_CONCURRENCY,
+        max_timeout=config.LLM_MAX_TIMEOUT_SECONDS,
+        min_timeout=config.LLM_MIN_TIMEOUT_SECONDS,
+        max_retries=config.LLM_MAX_RETRIES,
+        backoff_base=config.LLM_BACKOFF_BASE_SECONDS,
+    )
 
-#os.environ["OPENAI_API_KEY"]    
 
 class MIDetectionLLM:
-    def __init__(self, model_name: str = "gpt-3.5-turbo"):
+    def __init__(self, model_name: str = config.LLM_MODEL_NAME, cache: Optional[ResponseCache] = None,
+                 backend: Optional[LLMBackend] = None, scheduler: Optional[LLMScheduler] = None):
         print("Inside MIDetectionLLM __init__")
-        openai.api_key = os.getenv("OPENAI_API_KEY")
-        #api_key = os.environ["OPENAI_API_KEY"]
-        #self.llm = ChatOpenAI(model="gpt-3.5-turbo", temperature=0)
-        self.llm = ChatOpenAI(model=model_name, temperature=0, openai_api_key=api_key)
-        #self.llm = ChatOpenAI(model=model_name, temperature=0)
-        self.parser = PydanticOutputParser(pydantic_object=MIReasoningOutput)
+        # The backend is pluggable: the configured provider by default, or e.g. LocalStubBackend for load tests
+        self.llm = backend if backend is not None else create_backend(config.LLM_PROVIDER, model_name)
+        self.model_name = self.llm.model_name
+        self.cache = cache if cache is not None else create_response_cache()
+        self.scheduler = scheduler if scheduler is not None else create_scheduler()
+        # Decision threshold quoted in the prompt, also used for the deterministic fallback
+        self.threshold = 0.50
+        self._parser = None
+        self._packed_parser = None
+        self.token_counter = TokenCounter(self.model_name)
+        self.prompt_stats = {"prompts": 0, "total_tokens": 0, "last_tokens": 0, "max_tokens": 0, "truncated_prompts": 0}
+        # Batch path: packed calls, incidents they carried, and incidents that still needed a single call
+        self.pack_stats = {"packs": 0, "packed_incidents": 0, "pack_failures": 0, "pack_misses": 0, "unpacked_incidents": 0}
+        self._compile_prompts()
         ##self.parser = PydanticOutputParser(pydantic_object)=MIReasoningOutput
     
 
-#----Code for gemini     
-    #def __init__(self, model_name: str = "gemini-1.5-pro-001", api_key: str = ""):
-     #   self.llm = ChatGoogleGenerativeAI(
-      #      model=model_name,
-       #     google_api_key="$$$",
-        #    temperature=0
-        #)
-        #self.parser = PydanticOutputParser(pydantic_object=MIReasoningOutput)
-#----    
+    @property
+    def parser(self):
+        """Structured output parser, created on first use so importing this module stays cheap"""
+        if self._parser is None:
+            # Same class as langchain.output_parsers.PydanticOutputParser; langchain_core takes ~0.6s to import
+            from langchain_core.output_parsers import PydanticOutputParser
+            self._parser = PydanticOutputParser(pydantic_object=MIReasoningOutput)
+        return self._parser
+    
+    @property
+    def packed_parser(self):
+        """Parser for packed multi-incident responses, created on first use"""
+        if self._packed_parser is None:
+            from langchain_core.output_parsers import PydanticOutputParser
+            self._packed_parser = PydanticOutputParser(pydantic_object=MIPackedReasoningOutput)
+        return self._packed_parser
+    
+    # Gemini: set MI_LLM_PROVIDER=gemini and MI_LLM_MODEL (e.g. gemini-1.5-pro-001); see llm/backends.py
+    
     def generate_few_shot_examples(self) -> List[Dict]:
         """Generate few-shot examples for the LLM prompt"""
         # In a real implementation, these would come from a curated set of historical cases
@@ -66,59 +151,40 @@ class MIDetectionLLM:
             }
         ]
     
-    def generate_reasoning_prompt(self, incident: Incident, scores: Dict, details: Dict, weighted_score: float) -> str:
-        """Generate the LLM reasoning prompt with few-shot examples"""
-        few_shot_examples = self.generate_few_shot_examples()
-        
-        # Format few-shot examples
-        examples_text = ""
-        for i, example in enumerate(few_shot_examples):
-            examples_text += f"\nEXAMPLE {i+1}:\n"
-            examples_text += f"Incident: {example['incident_summary']}\n"
-            examples_text += "Predictor Scores:\n"
+    def format_few_shot_examples(self) -> str:
+        examples_text = []
+        for i, example in enumerate(self.generate_few_shot_examples()):
+            examples_text.append(f"\nEXAMPLE {i+1}:\n")
+            examples_text.append(f"Incident: {example['incident_summary']}\n")
+            examples_text.append("Predictor Scores:\n")
             for predictor, score in example['predictor_scores'].items():
-                examples_text += f"- {predictor}: {score:.2f}\n"
-            examples_text += f"Weighted Score: {example['weighted_score']:.2f}\n"
-            examples_text += f"Reasoning: {example['reasoning']}\n"
-            examples_text += f"Decision: {example['decision']}\n"
-        
-        # Format current incident details
-        details_text = ""
+                examples_text.append(f"- {predictor}: {score:.2f}\n")
+            examples_text.append(f"Weighted Score: {example['weighted_score']:.2f}\n")
+            examples_text.append(f"Reasoning: {example['reasoning']}\n")
+            examples_text.append(f"Decision: {example['decision']}\n")
+        return "".join(examples_text)
+    
+    def format_details(self, details: Dict, max_list_items: int = config.LLM_DETAIL_LIST_ITEMS) -> str:
+        """Format predictor details, summarising long lists (e.g. many critical_depts) as 'first N (+k more)'"""
+        details_text = []
         for predictor, detail in details.items():
-            details_text += f"{predictor}:\n"
+            details_text.append(f"{predictor}:\n")
             for key, value in detail.items():
-                details_text += f"- {key}: {value}\n"
-                
-        # Format parser instructions
-        format_instructions = self.parser.get_format_instructions()
+                if isinstance(value, (list, tuple, set)) and len(value) > max_list_items:
+                    value = f"{list(value)[:max_list_items]} (+{len(value) - max_list_items} more)"
+                details_text.append(f"- {key}: {value}\n")
+        return "".join(details_text)
+    
+    def _compile_prompts(self):
+        """Render the static parts of the single and packed prompts once, with their token counts"""
+        examples_text = self.format_few_shot_examples()
         
-        # Build the prompt
-       
-        prompt = f"""
+        self._single_head = """
 You are an ITSM expert specializing in Major Incident detection. Analyze whether the following incident should be classified as a Major Incident.
 
 INCIDENT DETAILS:
-ID: {incident.incident_id}
-Summary: {incident.summary}
-Description: {incident.description}
-Service: {incident.service_ci_name}
-Priority: {incident.priority}
-Status: {incident.status}
-
-PREDICTOR SCORES:
-- User Impact: {scores['user_impact']:.2f}
-- Resolution Time: {scores['resolution_time']:.2f}
-- Reassignment Count: {scores['reassignment_count']:.2f}
-- Change Volume: {scores['change_volume']:.2f}
-- Service Health: {scores['service_health']:.2f}
-
-
-
-DETAILED ANALYSIS:
-{details_text}
-
-WEIGHTED SCORE: {weighted_score:.2f} (Threshold: 0.50)
-
+"""
+        self._single_tail = f"""
 PREVIOUS EXAMPLES:
 {examples_text}
 
@@ -126,7 +192,7 @@ Based on this data, analyze whether this incident should be classified as a Majo
 Consider the predictor scores, their implications, and any edge cases not fully captured by the metrics.
 
 Your response should follow this format:
-{format_instructions}
+{self.parser.get_format_instructions()}
 
 In your response:
 1. The summary_reasoning should be a concise one-line summary similar to the example reasonings.
@@ -136,32 +202,258 @@ In your response:
    • Reassignment Count: [Your analysis of the reassignment score and its implications]
    • Change Volume: [Your analysis of the change volume score and its implications]
    • Service Health: [Your analysis of the service health score and its implications]
+   • Blast Radius: [Your analysis of the services and users depending on this CI]
    • Overall Assessment: [Your final assessment based on all factors]
 3. The decision should be a boolean (True for Major Incident, False for Regular Incident).
 
 ANALYSIS:
 """
+        self._packed_head = f"""
+You are an ITSM expert specializing in Major Incident detection. Analyze each of the following incidents independently and decide whether it should be classified as a Major Incident.
+
+PREVIOUS EXAMPLES:
+{examples_text}
+
+INCIDENTS:
+"""
+        self._packed_tail = f"""
+For each incident, consider the predictor scores, their implications, and any edge cases not fully captured by the metrics.
+
+Your response should follow this format:
+{self.packed_parser.get_format_instructions()}
+
+In your response:
+1. Return exactly one entry in "results" per incident, with incident_id copied exactly from its ID line.
+2. The summary_reasoning should be a concise one-line summary similar to the example reasonings.
+3. The full_reasoning should be formatted as bullet points, one for each predictor score, followed by • Overall Assessment.
+4. The decision should be a boolean (True for Major Incident, False for Regular Incident).
+
+ANALYSIS:
+"""
+        self._static_tokens = {
+            name: self.token_counter.count(getattr(self, name))
+            for name in ("_single_head", "_single_tail", "_packed_head", "_packed_tail")
+        }
+    
+    def _add_incident_section(self, builder: PromptBuilder, incident: Incident, scores: Dict,
+                              details: Dict, weighted_score: float):
+        """Append one incident's variable section, truncating free text and details to their token caps"""
+        summary, _, summary_cut = self.token_counter.truncate(incident.summary, config.LLM_SUMMARY_TOKEN_CAP)
+        description, _, description_cut = self.token_counter.truncate(incident.description, config.LLM_DESCRIPTION_TOKEN_CAP)
+        details_text, _, details_cut = self.token_counter.truncate(self.format_details(details), config.LLM_DETAILS_TOKEN_CAP)
+        scores_text = "".join(
+            f"- {predictor.replace('_', ' ').title()}: {score:.2f}\n" for predictor, score in scores.items()
+        )
+        section = f"""ID: {incident.incident_id}
+Summary: {summary}
+Description: {description}
+Service: {incident.service_ci_name}
+Priority: {incident.priority}
+Status: {incident.status}
+
+PREDICTOR SCORES:
+{scores_text}
+
+DETAILED ANALYSIS:
+{details_text}
+WEIGHTED SCORE: {weighted_score:.2f} (Threshold: {self.threshold:.2f})
+"""
+        builder.add(section, self.token_counter.count(section))
+        builder.truncated = builder.truncated or summary_cut or description_cut or details_cut
+    
+    def _build_reasoning_prompt(self, incident: Incident, scores: Dict, details: Dict, weighted_score: float) -> PromptBuilder:
+        builder = PromptBuilder().add(self._single_head, self._static_tokens["_single_head"])
+        self._add_incident_section(builder, incident, scores, details, weighted_score)
+        return builder.add(self._single_tail, self._static_tokens["_single_tail"])
+    
+    def _build_packed_prompt(self, items: List[Tuple[Incident, Dict, Dict, float]]) -> PromptBuilder:
+        builder = PromptBuilder().add(self._packed_head, self._static_tokens["_packed_head"])
+        for position, (incident, scores, details, weighted_score) in enumerate(items, start=1):
+            builder.add(f"\n=== INCIDENT {position} ===\n")
+            self._add_incident_section(builder, incident, scores, details, weighted_score)
+        return builder.add(self._packed_tail, self._static_tokens["_packed_tail"])
+    
+    def generate_reasoning_prompt(self, incident: Incident, scores: Dict, details: Dict, weighted_score: float) -> str:
+        """Generate the LLM reasoning prompt with few-shot examples"""
+        return self._build_reasoning_prompt(incident, scores, details, weighted_score).build()
+    
+    def generate_packed_prompt(self, items: List[Tuple[Incident, Dict, Dict, float]]) -> str:
+        """One prompt covering several incidents, sharing the preamble, examples and format instructions"""
+        return self._build_packed_prompt(items).build()
+    
+    def _record_prompt(self, builder: PromptBuilder):
+        """Token accounting for prompts actually sent to the model"""
+        self.prompt_stats["prompts"] += 1
+        self.prompt_stats["total_tokens"] += builder.tokens
+        self.prompt_stats["last_tokens"] = builder.tokens
+        self.prompt_stats["max_tokens"] = max(self.prompt_stats["max_tokens"], builder.tokens)
+        if builder.truncated:
+            self.prompt_stats["truncated_prompts"] += 1
+    
+    async def get_reasoning_batch(self, items: List[Tuple[Incident, Dict, Dict, float]],
+                                  pack_size: int = config.LLM_PACK_SIZE) -> List[Union[Dict, Exception]]:
+        """
+        Reasoning for several incidents, packing up to pack_size of them into each LLM call.
+        Results are returned in input order. An incident left alone in its pack goes straight to
+        get_reasoning; so do items the packed response does not cover, or whose pack failed.
+        """
+        results: List[Union[Dict, Exception, None]] = [None] * len(items)
+        
+        # Serve what we can from the cache, using the same keys as single-incident prompts
+        cache_keys = [
+            ResponseCache.make_key(self.generate_reasoning_prompt(*item), self.model_name) if self.cache is not None else None
+            for item in items
+        ]
+        uncached = []
+        for position, cache_key in enumerate(cache_keys):
+            cached = self.cache.get(cache_key) if cache_key is not None else None
+            if cached is not None:
+                results[position] = cached
+            else:
+                uncached.append(position)
         
-        return prompt
+        # Build packs with unique incident ids, so each result can be mapped back unambiguously
+        packs: List[List[int]] = []
+        for position in uncached:
+            incident_id = items[position][0].incident_id
+            for pack in packs:
+                if len(pack) < pack_size and all(items[p][0].incident_id != incident_id for p in pack):
+                    pack.append(position)
+                    break
+            else:
+                packs.append([position])
+        
+        # A single incident gains nothing from packing
+        leftovers = [pack[0] for pack in packs if len(pack) == 1]
+        packs = [pack for pack in packs if len(pack) > 1]
+        self.pack_stats["unpacked_incidents"] += len(leftovers)
+        pack_outputs = await asyncio.gather(*(self._get_packed_reasoning([items[p] for p in pack]) for pack in packs))
+        
+        for pack, parsed in zip(packs, pack_outputs):
+            for position in pack:
+                item = items[position]
+                result = parsed.get(item[0].incident_id)
+                if result is None:
+                    leftovers.append(position)
+                    self.pack_stats["pack_misses"] += 1
+                    continue
+                results[position] = result
+                if cache_keys[position] is not None:
+                    self.cache.set(cache_keys[position], result)
+        
+        if leftovers:
+            fallbacks = await asyncio.gather(*(self.get_reasoning(*items[p]) for p in leftovers), return_exceptions=True)
+            for position, result in zip(leftovers, fallbacks):
+                results[position] = result
+        return results
+    
+    async def _get_packed_reasoning(self, pack: List[Tuple[Incident, Dict, Dict, float]]) -> Dict[str, Dict]:
+        """Reasoning per incident_id from one packed call; empty when the call or parsing fails"""
+        self.pack_stats["packs"] += 1
+        self.pack_stats["packed_incidents"] += len(pack)
+        builder = self._build_packed_prompt(pack)
+        prompt = builder.build()
+        self._record_prompt(builder)
+        print(f"Invoking LLM model for {len(pack)} packed incidents ({builder.tokens} prompt tokens)...")
+        try:
+            response = await self.scheduler.submit(
+                ResponseCache.make_key(prompt, self.model_name), lambda: self.llm.ainvoke(prompt)
+            )
+            parsed_output = self.packed_parser.parse(response)
+        except Exception as e:
+            print(f"Packed LLM call failed ({type(e).__name__}: {e})")
+            self.pack_stats["pack_failures"] += 1
+            return {}
+        return {
+            item.incident_id: {
+                "summary_reasoning": item.summary_reasoning,
+                "full_reasoning": item.full_reasoning,
+                "decision": item.decision
+            }
+            for item in parsed_output.results
+        }
     
     async def get_reasoning(self, incident: Incident, scores: Dict, details: Dict, weighted_score: float) -> Dict:
         """Get structured reasoning from the LLM using the parser"""
         print("Test-Inside MIDetectionLLM.get_reasoning")
-        prompt = self.generate_reasoning_prompt(incident, scores, details, weighted_score)
-        print("Invoking LLM model for incident classification...")
-        response = await self.llm.ainvoke(prompt)  
+        builder = self._build_reasoning_prompt(incident, scores, details, weighted_score)
+        prompt = builder.build()
+        
+        # Identical prompts to the same model are answered from the cache
+        prompt_key = ResponseCache.make_key(prompt, self.model_name)
+        if self.cache is not None:
+            cached = self.cache.get(prompt_key)
+            if cached is not None:
+                return cached
+        
+        self._record_prompt(builder)
+        print(f"Invoking LLM model for incident classification ({builder.tokens} prompt tokens)...")
+        try:
+            # Concurrent identical prompts share one call; the scheduler caps concurrency and retries
+            response = await self.scheduler.submit(prompt_key, lambda: self.llm.ainvoke(prompt))
+        except Exception as e:
+            # Deadline passed or retries exhausted: decide deterministically rather than fail the request
+            print(f"LLM call failed ({type(e).__name__}: {e}); using deterministic fallback")
+            fallback = build_templated_reasoning(scores, details, weighted_score, self.threshold)
+            fallback["summary_reasoning"] = f"LLM unavailable. {fallback['summary_reasoning']}"
+            return fallback
         print("Received response from LLM:", response)  
         
+        result, parsed = self.parse_reasoning(response)
+        # A text-extraction fallback is not cached, so one malformed reply is not replayed for the whole TTL
+        if self.cache is not None and parsed:
+            self.cache.set(prompt_key, result)
+        return result
+    
+    async def stream_reasoning(self, incident: Incident, scores: Dict, details: Dict,
+                               weighted_score: float) -> AsyncIterator[Tuple[str, Union[str, Dict]]]:
+        """
+        Streaming variant of get_reasoning. Yields ("token", text) as the model produces it,
+        then ("result", reasoning) with the parsed output once the response is complete.
+        """
+        builder = self._build_reasoning_prompt(incident, scores, details, weighted_score)
+        prompt = builder.build()
+        prompt_key = ResponseCache.make_key(prompt, self.model_name)
+        if self.cache is not None:
+            cached = self.cache.get(prompt_key)
+            if cached is not None:
+                yield "result", cached
+                return
+        
+        self._record_prompt(builder)
+        print(f"Streaming LLM response for incident classification ({builder.tokens} prompt tokens)...")
+        chunks = []
+        try:
+            async for chunk in self.scheduler.stream(lambda: self.llm.astream(prompt)):
+                chunks.append(chunk)
+                yield "token", chunk
+        except Exception as e:
+            print(f"LLM stream failed ({type(e).__name__}: {e}); using deterministic fallback")
+            fallback = build_templated_reasoning(scores, details, weighted_score, self.threshold)
+            fallback["summary_reasoning"] = f"LLM unavailable. {fallback['summary_reasoning']}"
+            yield "result", fallback
+            return
+        
+        result, parsed = self.parse_reasoning("".join(chunks))
+        if self.cache is not None and parsed:
+            self.cache.set(prompt_key, result)
+        yield "result", result
+    
+    def parse_reasoning(self, content: str) -> Tuple[Dict, bool]:
+        """
+        Parse a model response into reasoning, falling back to text extraction when it is not valid JSON.
+        Returns the reasoning and whether the structured parser succeeded.
+        """
         try:
-            parsed_output = self.parser.parse(response.content)
+            parsed_output = self.parser.parse(content)
             return {
                 "summary_reasoning": parsed_output.summary_reasoning,
                 "full_reasoning": parsed_output.full_reasoning,
                 "decision": parsed_output.decision
-            }
+            }, True
         except Exception as e:
             # Fallback to the older extraction method if parsing fails
-            reasoning = response.content
+            reasoning = content
             decision = self.extract_decision(reasoning)
             
             # Extract a summary line (first sentence or first 100 chars)
@@ -176,6 +468,7 @@ ANALYSIS:
                 bullet_reasoning += "• Reassignment Count: Analysis of reassignment score not provided by model.\n"
                 bullet_reasoning += "• Change Volume: Analysis of change volume score not provided by model.\n"
                 bullet_reasoning += "• Service Health: Analysis of service health score not provided by model.\n"
+                bullet_reasoning += "• Blast Radius: Analysis of blast radius score not provided by model.\n"
                 bullet_reasoning += f"• Overall Assessment: {reasoning.strip()}"
             else:
                 bullet_reasoning = reasoning
@@ -184,7 +477,7 @@ ANALYSIS:
                 "summary_reasoning": summary,
                 "full_reasoning": bullet_reasoning,
                 "decision": decision
-            }
+            }, False
     
     def extract_decision(self, reasoning: str) -> bool:
         """Extract the final decision from the LLM reasoning"""
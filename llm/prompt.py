@@ -0,0 +1,54 @@
+#prompt
+from typing import List, Tuple
+
+
+class TokenCounter:
+    """
+    Counts and truncates text in model tokens with tiktoken. If the encoding cannot be
+    loaded (e.g. tiktoken missing, or no network to fetch its files) it falls back to
+    an estimate of four characters per token.
+    """
+
+    def __init__(self, model_name: str):
+        self.encoding = None
+        try:
+            import tiktoken
+            try:
+                self.encoding = tiktoken.encoding_for_model(model_name)
+            except KeyError:
+                self.encoding = tiktoken.get_encoding("cl100k_base")
+        except Exception as e:
+            print(f"tiktoken unavailable ({e}); estimating token counts from length")
+
+    def count(self, text: str) -> int:
+        if self.encoding is None:
+            return (len(text) + 3) // 4
+        return len(self.encoding.encode(text, disallowed_special=()))
+
+    def truncate(self, text: str, max_tokens: int, marker: str = " ...[truncated]") -> Tuple[str, int, bool]:
+        """Cut text to at most max_tokens; returns (text, token count, whether it was cut)"""
+        if self.encoding is None:
+            if len(text) <= max_tokens * 4:
+                return text, self.count(text), False
+            return text[:max_tokens * 4] + marker, max_tokens + self.count(marker), True
+        tokens = self.encoding.encode(text, disallowed_special=())
+        if len(tokens) <= max_tokens:
+            return text, len(tokens), False
+        return self.encoding.decode(tokens[:max_tokens]) + marker, max_tokens + self.count(marker), True
+
+
+class PromptBuilder:
+    """Collects prompt fragments and joins them once, tracking the token count as it goes"""
+
+    def __init__(self):
+        self.parts: List[str] = []
+        self.tokens = 0
+        self.truncated = False
+
+    def add(self, text: str, tokens: int = 0) -> "PromptBuilder":
+        self.parts.append(text)
+        self.tokens += tokens
+        return self
+
+    def build(self) -> str:
+        return "".join(self.parts)
@@ -0,0 +1,119 @@
+#response_cache
+from typing import Dict, Optional
+from collections import OrderedDict
+import hashlib
+import json
+import sqlite3
+import threading
+import time
+from data.write_behind import WriteBehind
+
+
+class ResponseCache:
+    """
+    Cache of parsed LLM reasoning keyed by a hash of (model name, prompt).
+    An in-memory LRU tier sits in front of an optional SQLite tier that survives restarts.
+    Entries expire after ttl_seconds in both tiers. Lookups only read from SQLite; new rows,
+    last_access touches and deletes of expired rows are written behind in periodic batches.
+    """
+
+    def __init__(self, max_entries: int = 1024, ttl_seconds: float = 3600,
+                 sqlite_path: Optional[str] = None, sqlite_max_entries: int = 100000):
+        self.max_entries = max_entries
+        self.ttl_seconds = ttl_seconds
+        self.sqlite_max_entries = sqlite_max_entries
+        self._memory: "OrderedDict[str, tuple]" = OrderedDict()
+        self._lock = threading.Lock()
+        self._stats = {"memory_hits": 0, "disk_hits": 0, "misses": 0, "evictions": 0, "expirations": 0}
+        self._db = None
+        self._writes: Optional[WriteBehind] = None
+        self._writes_since_prune = 0
+        if sqlite_path:
+            self._db = sqlite3.connect(sqlite_path, check_same_thread=False)
+            self._db.execute("PRAGMA journal_mode=WAL")
+            self._db.execute(
+                "CREATE TABLE IF NOT EXISTS llm_responses ("
+                "key TEXT PRIMARY KEY, value TEXT NOT NULL, expires_at REAL NOT NULL, last_access REAL NOT NULL)"
+            )
+            self._db.execute("CREATE INDEX IF NOT EXISTS idx_llm_responses_last_access ON llm_responses(last_access)")
+            self._db.commit()
+            self._writes = WriteBehind(sqlite_path, name="mi-llm-cache-writes")
+
+    @staticmethod
+    def make_key(prompt: str, model_name: str) -> str:
+        return hashlib.sha256(f"{model_name}\0{prompt}".encode("utf-8")).hexdigest()
+
+    def get(self, key: str) -> Optional[Dict]:
+        now = time.time()
+        with self._lock:
+            entry = self._memory.get(key)
+            if entry is not None:
+                expires_at, value = entry
+                if expires_at > now:
+                    self._memory.move_to_end(key)
+                    self._stats["memory_hits"] += 1
+                    return dict(value)
+                del self._memory[key]
+                self._stats["expirations"] += 1
+
+            if self._db is not None:
+                row = self._db.execute(
+                    "SELECT value, expires_at FROM llm_responses WHERE key = ?", (key,)
+                ).fetchone()
+                if row is not None and row[1] > now:
+                    self._writes.add("UPDATE llm_responses SET last_access = ? WHERE key = ?", (now, key), ("touch", key))
+                    value = json.loads(row[0])
+                    self._put_memory(key, row[1], value)
+                    self._stats["disk_hits"] += 1
+                    return dict(value)
+                if row is not None:
+                    # Only if it is still expired when the write lands; a set may have replaced it meanwhile
+                    self._writes.add(
+                        "DELETE FROM llm_responses WHERE key = ? AND expires_at <= ?", (key, now), ("expire", key)
+                    )
+                    self._stats["expirations"] += 1
+
+            self._stats["misses"] += 1
+            return None
+
+    def set(self, key: str, value: Dict):
+        now = time.time()
+        expires_at = now + self.ttl_seconds
+        with self._lock:
+            self._put_memory(key, expires_at, dict(value))
+            if self._db is not None:
+                self._writes.add(
+                    "INSERT OR REPLACE INTO llm_responses (key, value, expires_at, last_access) VALUES (?, ?, ?, ?)",
+                    (key, json.dumps(value), expires_at, now), ("set", key)
+                )
+                # The disk size limit is enforced every 100 writes rather than on each one
+                self._writes_since_prune += 1
+                if self._writes_since_prune >= 100:
+                    self._prune_disk(now)
+
+    def _put_memory(self, key: str, expires_at: float, value: Dict):
+        self._memory[key] = (expires_at, value)
+        self._memory.move_to_end(key)
+        while len(self._memory) > self.max_entries:
+            self._memory.popitem(last=False)
+            self._stats["evictions"] += 1
+
+    def _prune_disk(self, now: float):
+        """Drop expired rows, then the least recently used rows beyond the size limit"""
+        self._writes_since_prune = 0
+        self._writes.add("DELETE FROM llm_responses WHERE expires_at <= ?", (now,), "prune_expired")
+        self._writes.add(
+            "DELETE FROM llm_responses WHERE key IN ("
+            "SELECT key FROM llm_responses ORDER BY last_access DESC LIMIT -1 OFFSET ?)",
+            (self.sqlite_max_entries,), "prune_lru"
+        )
+
+    def stats(self) -> Dict:
+        with self._lock:
+            stats = dict(self._stats)
+            stats["memory_entries"] = len(self._memory)
+        if self._writes is not None:
+            stats["disk_writes"] = self._writes.stats()
+        lookups = stats["memory_hits"] + stats["disk_hits"] + stats["misses"]
+        stats["hit_rate"] = (stats["memory_hits"] + stats["disk_hits"]) / lookups if lookups else 0.0
+        return stats
@@ -0,0 +1,164 @@
+#scheduler
+from typing import AsyncIterator, Awaitable, Callable, Deque, Dict, Optional, TypeVar
+from collections import deque
+import asyncio
+import random
+import time
+import numpy as np
+
+T = TypeVar("T")
+
+
+class LLMScheduler:
+    """
+    Gatekeeper for LLM calls:
+    - a semaphore caps how many calls are in flight at once
+    - callers with the same key share one in-flight call (single flight)
+    - each call gets a deadline covering queueing and retries; it adapts to recent
+      latencies (timeout_multiplier x p95), clamped to [min_timeout, max_timeout]
+    - failed attempts are retried with full-jitter exponential backoff
+    """
+
+    def __init__(self, max_concurrency: int = 8, max_timeout: float = 30.0, min_timeout: float = 5.0,
+                 timeout_multiplier: float = 3.0, max_retries: int = 2, backoff_base: float = 0.5,
+                 backoff_max: float = 8.0, latency_window: int = 200):
+        self.max_concurrency = max_concurrency
+        self.max_timeout = max_timeout
+        self.min_timeout = min_timeout
+        self.timeout_multiplier = timeout_multiplier
+        self.max_retries = max_retries
+        self.backoff_base = backoff_base
+        self.backoff_max = backoff_max
+        self._semaphore: Optional[asyncio.Semaphore] = None
+        self._inflight: Dict[str, asyncio.Future] = {}
+        self._latencies: Deque[float] = deque(maxlen=latency_window)
+        self._queue_depth = 0
+        self._stats = {
+            "calls": 0, "coalesced": 0, "timeouts": 0, "retries": 0, "failures": 0,
+            "max_queue_depth": 0, "total_wait_ms": 0.0, "max_wait_ms": 0.0, "waits": 0,
+        }
+
+    @property
+    def semaphore(self) -> asyncio.Semaphore:
+        # Created on first use so it belongs to the running event loop
+        if self._semaphore is None:
+            self._semaphore = asyncio.Semaphore(self.max_concurrency)
+        return self._semaphore
+
+    def current_timeout(self) -> float:
+        """Deadline for the next call, based on the p95 of recent successful call latencies"""
+        if len(self._latencies) < 20:
+            return self.max_timeout
+        p95 = float(np.percentile(self._latencies, 95))
+        return min(self.max_timeout, max(self.min_timeout, self.timeout_multiplier * p95))
+
+    async def submit(self, key: str, call: Callable[[], Awaitable[T]]) -> T:
+        """Run call under the scheduler's limits, or join an identical call already in flight"""
+        task = self._inflight.get(key)
+        if task is None:
+            task = asyncio.ensure_future(self._run(call))
+            self._inflight[key] = task
+            task.add_done_callback(lambda done: self._finish(key, done))
+        else:
+            self._stats["coalesced"] += 1
+        # Shielded so one caller going away does not cancel the call for everyone sharing it
+        return await asyncio.shield(task)
+
+    def _finish(self, key: str, task: asyncio.Future):
+        if self._inflight.get(key) is task:
+            del self._inflight[key]
+        if not task.cancelled():
+            task.exception()  # mark as retrieved even if every waiter has gone
+
+    async def _run(self, call: Callable[[], Awaitable[T]]) -> T:
+        self._stats["calls"] += 1
+        try:
+            return await asyncio.wait_for(self._call_with_retries(call), self.current_timeout())
+        except asyncio.TimeoutError:
+            self._stats["timeouts"] += 1
+            raise
+        except Exception:
+            self._stats["failures"] += 1
+            raise
+
+    async def _call_with_retries(self, call: Callable[[], Awaitable[T]]) -> T:
+        attempt = 0
+        while True:
+            try:
+                return await self._call_once(call)
+            except asyncio.CancelledError:
+                raise
+            except Exception:
+                if attempt >= self.max_retries:
+                    raise
+                self._stats["retries"] += 1
+                backoff = min(self.backoff_max, self.backoff_base * (2 ** attempt))
+                attempt += 1
+                await asyncio.sleep(random.uniform(0, backoff))
+
+    async def _acquire(self):
+        """Take a concurrency slot, recording queue depth and wait time"""
+        enqueued = time.perf_counter()
+        self._queue_depth += 1
+        self._stats["max_queue_depth"] = max(self._stats["max_queue_depth"], self._queue_depth)
+        try:
+            await self.semaphore.acquire()
+        finally:
+            self._queue_depth -= 1
+        wait_ms = (time.perf_counter() - enqueued) * 1000
+        self._stats["waits"] += 1
+        self._stats["total_wait_ms"] += wait_ms
+        self._stats["max_wait_ms"] = max(self._stats["max_wait_ms"], wait_ms)
+
+    async def _call_once(self, call: Callable[[], Awaitable[T]]) -> T:
+        await self._acquire()
+        try:
+            started = time.perf_counter()
+            result = await call()
+            self._latencies.append(time.perf_counter() - started)
+            return result
+        finally:
+            self.semaphore.release()
+
+    async def stream(self, open_stream: Callable[[], AsyncIterator[str]]) -> AsyncIterator[str]:
+        """
+        Relay a streamed call under the concurrency cap and deadline. There is no coalescing
+        or retrying here, since chunks already handed to the caller cannot be taken back.
+        """
+        self._stats["calls"] += 1
+        loop = asyncio.get_running_loop()
+        deadline = loop.time() + self.current_timeout()
+        await self._acquire()
+        iterator = None
+        try:
+            # Opening the stream can fail too (bad credentials, connect error); the slot is released below
+            iterator = open_stream().__aiter__()
+            started = time.perf_counter()
+            while True:
+                remaining = deadline - loop.time()
+                if remaining <= 0:
+                    raise asyncio.TimeoutError()
+                try:
+                    chunk = await asyncio.wait_for(iterator.__anext__(), remaining)
+                except StopAsyncIteration:
+                    break
+                yield chunk
+            self._latencies.append(time.perf_counter() - started)
+        except asyncio.TimeoutError:
+            self._stats["timeouts"] += 1
+            raise
+        except Exception:
+            self._stats["failures"] += 1
+            raise
+        finally:
+            self.semaphore.release()
+            if iterator is not None and hasattr(iterator, "aclose"):
+                await iterator.aclose()
+
+    def stats(self) -> Dict:
+        stats = dict(self._stats)
+        stats["queue_depth"] = self._queue_depth
+        stats["in_flight"] = len(self._inflight)
+        stats["avg_wait_ms"] = stats["total_wait_ms"] / stats["waits"] if stats["waits"] else 0.0
+        stats["current_timeout_s"] = self.current_timeout()
+        return stats
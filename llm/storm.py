@@ -0,0 +1,177 @@
+#storm
+"""
+Incident storm correlation. When a core service fails, many near-duplicate tickets arrive
+within minutes; scoring each one separately repeats the same feature work and LLM call.
+Incidents on the same service whose text embeddings are close are grouped into a cluster
+while it stays active; the first incident runs full detection and later members share
+its verdict. New affected users reported by members widen the cluster's user impact, and
+the cluster is re-decided once that raises its score.
+"""
+from typing import TYPE_CHECKING, Dict, List, Optional, Set
+import asyncio
+import itertools
+import time
+import numpy as np
+from data.historical_store import incident_text
+from models.model import Incident, MIDetectionResult
+
+if TYPE_CHECKING:
+    from llm.mi_agent import MIDetectionAgent
+
+# Smallest rise in the aggregated user impact score that is worth re-deciding a cluster for
+REEVALUATE_MIN_GAIN = 0.05
+
+
+class StormCluster:
+    """Incidents on one service that were judged to be the same event"""
+
+    def __init__(self, cluster_id: int, leader: Incident, embedding: np.ndarray, now: float):
+        self.cluster_id = cluster_id
+        self.leader = leader
+        self.centroid = embedding.astype(np.float32, copy=True)
+        # Only the count is kept; a long-lived storm can collect many thousands of members
+        self.members = 1
+        self.affected_users: Set[str] = set(leader.affected_users or [])
+        self.last_seen = now
+        # Set by the leader's detection: the result plus the scores it was decided from
+        self.decided: asyncio.Future = asyncio.get_running_loop().create_future()
+        self.result: Optional[MIDetectionResult] = None
+        self.scores: Dict = {}
+        self.details: Dict = {}
+        self.lock = asyncio.Lock()
+
+    def add(self, incident: Incident, embedding: np.ndarray, now: float) -> bool:
+        """Add a member; returns whether it reported affected users the cluster had not seen"""
+        # Running mean of the normalized embeddings, renormalized so dot products stay cosines
+        centroid = self.centroid * self.members + embedding
+        self.centroid = centroid / max(float(np.linalg.norm(centroid)), 1e-12)
+        self.members += 1
+        self.last_seen = now
+        known = len(self.affected_users)
+        self.affected_users.update(incident.affected_users or [])
+        return len(self.affected_users) > known
+
+
+class StormCorrelator:
+    """
+    Online clustering in front of MIDetectionAgent's single-incident detection. A cluster
+    stays open while incidents keep arriving within window_seconds of its last one.
+    """
+
+    def __init__(self, agent: "MIDetectionAgent", window_seconds: float, similarity: float):
+        self.agent = agent
+        self.window_seconds = window_seconds
+        self.similarity = similarity
+        # Lowercased service name -> active clusters
+        self._clusters: Dict[str, List[StormCluster]] = {}
+        self._ids = itertools.count(1)
+        self._stats = {"incidents": 0, "clusters": 0, "attached": 0, "reevaluations": 0, "leader_failures": 0}
+
+    async def detect(self, incident: Incident) -> MIDetectionResult:
+        self._stats["incidents"] += 1
+        embedding = (await self.agent.data_repo.aencode_queries([incident_text(incident)]))[0]
+        # No awaits between matching and creating a cluster, so concurrent arrivals see each other
+        now = time.monotonic()
+        cluster = self._match(incident.service_ci_name.lower(), embedding, now)
+        if cluster is None:
+            cluster = StormCluster(next(self._ids), incident, embedding, now)
+            self._clusters.setdefault(incident.service_ci_name.lower(), []).append(cluster)
+            self._stats["clusters"] += 1
+            return await self._lead(cluster)
+        new_users = cluster.add(incident, embedding, now)
+        self._stats["attached"] += 1
+        return await self._follow(cluster, incident, new_users)
+
+    def _match(self, service_key: str, embedding: np.ndarray, now: float) -> Optional[StormCluster]:
+        """The most similar active cluster on the service, dropping expired ones on the way"""
+        clusters = [c for c in self._clusters.get(service_key, []) if now - c.last_seen <= self.window_seconds]
+        if clusters:
+            self._clusters[service_key] = clusters
+        else:
+            self._clusters.pop(service_key, None)
+            return None
+        similarities = np.stack([c.centroid for c in clusters]) @ embedding
+        best = int(np.argmax(similarities))
+        return clusters[best] if similarities[best] >= self.similarity else None
+
+    async def _lead(self, cluster: StormCluster) -> MIDetectionResult:
+        agent = self.agent
+        try:
+            scores, details, weighted_score, timings = await agent._score_incident(cluster.leader)
+            reasoning_output = await agent._get_reasoning(cluster.leader, scores, details, weighted_score)
+            result = agent._build_result(scores, details, weighted_score, reasoning_output, timings)
+        except BaseException as e:
+            # Members waiting on this cluster fall back to their own detection. A cancelled leader
+            # (client gone, request timed out) is reported to them as an ordinary error, so they
+            # do not mistake it for their own cancellation.
+            self._discard(cluster)
+            self._stats["leader_failures"] += 1
+            if not isinstance(e, Exception):
+                e = RuntimeError(f"Storm cluster {cluster.cluster_id} leader did not finish: {e!r}")
+            cluster.decided.set_exception(e)
+            cluster.decided.exception()  # marks it retrieved when nobody was waiting
+            raise
+        cluster.result, cluster.scores, cluster.details = result, scores, details
+        cluster.decided.set_result(None)
+        return self._annotate(cluster, result, cluster.leader)
+
+    async def _follow(self, cluster: StormCluster, incident: Incident, new_users: bool) -> MIDetectionResult:
+        try:
+            await asyncio.shield(cluster.decided)
+        except Exception:
+            return await self.agent._detect_major_incident(incident)
+        # Read the verdict under the lock, so no member gets one that a re-evaluation in flight is replacing
+        async with cluster.lock:
+            if new_users and not cluster.result.is_major_incident:
+                try:
+                    await self._reevaluate(cluster)
+                except Exception as e:
+                    # The cluster keeps its current verdict
+                    print(f"Storm cluster {cluster.cluster_id} re-evaluation failed: {e}")
+            result = cluster.result
+        return self._annotate(cluster, result, incident)
+
+    async def _reevaluate(self, cluster: StormCluster):
+        """Re-decide the cluster with the user impact of every affected user reported so far"""
+        agent = self.agent
+        if cluster.result.is_major_incident:
+            return
+        aggregated = cluster.leader.model_copy(update={"affected_users": sorted(cluster.affected_users)})
+        service_ci = agent._get_service_ci(aggregated)
+        user_impact, user_impact_details = agent.feature_extractor.get_user_impact_score(aggregated, service_ci)
+        if user_impact < cluster.scores['user_impact'] + REEVALUATE_MIN_GAIN:
+            return
+        self._stats["reevaluations"] += 1
+        scores = dict(cluster.scores, user_impact=user_impact)
+        details = dict(cluster.details, user_impact=user_impact_details)
+        weighted_score = agent._weighted_score(scores)
+        reasoning_output = await agent._get_reasoning(aggregated, scores, details, weighted_score)
+        cluster.result = agent._build_result(scores, details, weighted_score, reasoning_output, {})
+        cluster.scores, cluster.details = scores, details
+
+    def _annotate(self, cluster: StormCluster, result: MIDetectionResult, incident: Incident) -> MIDetectionResult:
+        """The cluster's verdict with a storm_cluster entry in details describing the cluster"""
+        details = dict(result.details)
+        details["storm_cluster"] = {
+            "cluster_id": cluster.cluster_id,
+            "leader_incident_id": cluster.leader.incident_id,
+            "is_leader": incident.incident_id == cluster.leader.incident_id,
+            "members": cluster.members,
+            "affected_users": len(cluster.affected_users),
+        }
+        return result.model_copy(update={"details": details})
+
+    def _discard(self, cluster: StormCluster):
+        service_key = cluster.leader.service_ci_name.lower()
+        clusters = [c for c in self._clusters.get(service_key, []) if c is not cluster]
+        if clusters:
+            self._clusters[service_key] = clusters
+        else:
+            self._clusters.pop(service_key, None)
+
+    def stats(self) -> Dict:
+        stats = dict(self._stats)
+        stats["active_clusters"] = sum(len(clusters) for clusters in self._clusters.values())
+        # Share of incidents that reused a cluster's detection instead of running their own
+        stats["detections_saved_pct"] = 100 * stats["attached"] / stats["incidents"] if stats["incidents"] else 0.0
+        return stats
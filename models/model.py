@@ -32,6 +32,20 @@ class User(BaseModel):
     department: str
     is_vip: bool
     
+class BlastRadius(BaseModel):
+    ci_id: str
+    direct_dependents: int  # CIs listing this CI in their dependencies
+    downstream_cis: int  # CIs depending on it directly or transitively
+    downstream_users: int  # distinct users of those CIs
+    downstream_criticality: int  # sum of their criticality
+    critical_dependents: List[str]  # names of downstream CIs with criticality 4 or 5
+
+class UserImpact(BaseModel):
+    service_users: int  # distinct known users of the CI
+    affected_service_users: int  # how many of them the incident lists as affected
+    vip_affected: bool  # any of those is a VIP
+    departments: List[str]  # their departments, sorted
+
 class ChangeRecord(BaseModel):
     change_id: str
     summary: str
@@ -59,6 +73,7 @@ class MIDetectionResult(BaseModel):
     recommendation: str
     summary_reasoning: str  # New: one-line reasoning summary
     details: Dict[str, Dict]  # New: detailed predictor information
+    feature_timings: Dict[str, float] = {}  # Per-feature wall time in milliseconds
     
 class MIReasoningOutput(LCBaseModel):
     summary_reasoning: str = LCField(description="A one-line summary of the reasoning behind the major incident decision")
@@ -67,6 +82,15 @@ class MIReasoningOutput(LCBaseModel):
     @classmethod
     def model_json_schema(cls) -> dict:
         return cls.schema()
+
+class MIPackedReasoningItem(MIReasoningOutput):
+    incident_id: str = LCField(description="The ID of the incident this reasoning refers to, copied exactly from the request")
+
+class MIPackedReasoningOutput(LCBaseModel):
+    results: List[MIPackedReasoningItem] = LCField(description="One reasoning result per incident in the request")
+    @classmethod
+    def model_json_schema(cls) -> dict:
+        return cls.schema()
 #---
 #class MIDetectionResult(BaseModel):
 #    is_major_incident: bool
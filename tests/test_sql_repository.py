@@ -0,0 +1,130 @@
+import datetime
+import json
+import pytest
+from data.repo import DataRepository
+from data.sql_repository import SQLDataRepository, import_json, verify_parity
+
+
+def _ago(days: float, seconds: float = 0) -> str:
+    moment = datetime.datetime.now() - datetime.timedelta(days=days, seconds=seconds)
+    return moment.isoformat(timespec="seconds")
+
+
+# Just inside and just outside each window; a minute of slack so the clock moving during the test does not matter
+EDGES = [(days, seconds) for days in (1, 7, 30) for seconds in (-60, 60)]
+
+SERVICE_CIS = [
+    {"ci_id": "CI1", "name": "Payments", "type": "application", "criticality": 5,
+     "dependencies": ["CI2", "CI9"], "users": ["U1", "U2", "U1", "U404"]},
+    {"ci_id": "CI2", "name": "Payments DB", "type": "database", "criticality": 4,
+     "dependencies": ["CI3", "CI2", "CI1"], "users": ["U3"]},
+    {"ci_id": "CI3", "name": "Storage", "type": "infrastructure", "criticality": 2,
+     "dependencies": ["CI2"], "users": []},
+    # Same name as CI1 in another case: lookups by name return the first one
+    {"ci_id": "CI4", "name": "PAYMENTS", "type": "application", "criticality": 1,
+     "dependencies": ["CI1"], "users": ["U2"]},
+    # Same id as CI2: lookups by id, the dependency graph and memberships use the last one,
+    # so the CI1 dependency of the first row is gone
+    {"ci_id": "CI2", "name": "Payments DB replica", "type": "database", "criticality": 3,
+     "dependencies": ["CI3"], "users": ["U3", "U4"]},
+]
+
+USERS = [
+    {"user_id": "U1", "name": "Ann", "department": "Finance", "is_vip": True},
+    {"user_id": "U2", "name": "Bo", "department": "Sales", "is_vip": False},
+    {"user_id": "U3", "name": "Cy", "department": "IT", "is_vip": False},
+    {"user_id": "U4", "name": "Di", "department": "IT", "is_vip": True},
+    # Duplicate id: the last row wins
+    {"user_id": "U2", "name": "Bo", "department": "Support", "is_vip": True},
+]
+
+
+@pytest.fixture
+def data_dir(tmp_path):
+    change_records = [
+        {"change_id": f"CHG-{days}-{seconds}", "summary": "edge", "ci_id": "CI1",
+         "implemented_at": _ago(days, seconds), "risk_score": days / 100}
+        for days, seconds in EDGES
+    ]
+    change_records.append({"change_id": "CHG-old", "summary": "old", "ci_id": "CI2",
+                           "implemented_at": "2023-09-10T23:00:00", "risk_score": 0.8})
+    service_health = [
+        {"ci_id": "CI1", "timestamp": _ago(days, seconds), "health_score": 90 - days}
+        for days, seconds in EDGES
+    ]
+    # Two samples with the same timestamp keep their file order
+    service_health += [
+        {"ci_id": "CI3", "timestamp": _ago(2), "health_score": 50.0},
+        {"ci_id": "CI3", "timestamp": _ago(2), "health_score": 40.0},
+        {"ci_id": "CI3", "timestamp": _ago(3), "health_score": 60.0},
+    ]
+    reassignments = [
+        {"incident_id": "INC1", "timestamp": "2023-09-15T10:45:00", "from_group": "Service Desk", "to_group": "DBA"},
+        {"incident_id": "INC2", "timestamp": "2023-09-15T10:50:00", "from_group": "Service Desk", "to_group": "Network"},
+        {"incident_id": "INC1", "timestamp": "2023-09-15T11:20:00", "from_group": "DBA", "to_group": "Storage"},
+    ]
+    datasets = {
+        "service_cis": SERVICE_CIS, "users": USERS, "change_records": change_records,
+        "service_health": service_health, "reassignments": reassignments, "historical_incidents": [],
+    }
+    for name, records in datasets.items():
+        (tmp_path / f"{name}.json").write_text(json.dumps(records))
+    import_json(str(tmp_path), str(tmp_path / "mi.sqlite3"))
+    return tmp_path
+
+
+@pytest.fixture
+def sql_repo(data_dir):
+    return SQLDataRepository(str(data_dir), str(data_dir / "mi.sqlite3"))
+
+
+def test_parity_with_json_backend(data_dir):
+    assert verify_parity(str(data_dir), str(data_dir / "mi.sqlite3"), windows=(1, 7, 30, 36500)) == []
+
+
+@pytest.mark.parametrize("days,expected", [(1, 1), (7, 3), (30, 5)])
+def test_window_edges(sql_repo, days, expected):
+    assert len(sql_repo.get_recent_changes("CI1", days)) == expected
+    assert len(sql_repo.get_service_health_history("CI1", days)) == expected
+    assert len(sql_repo.get_change_series("CI1", days).values) == expected
+
+
+def test_duplicate_name_returns_first_ci(sql_repo):
+    assert sql_repo.get_service_ci("payments").ci_id == "CI1"
+    assert sql_repo.get_service_ci("PAYMENTS").ci_id == "CI1"
+    assert sql_repo.get_service_ci("missing") is None
+
+
+def test_duplicate_id_returns_last_ci(sql_repo):
+    ci = sql_repo.get_service_ci_by_id("CI2")
+    assert ci.name == "Payments DB replica"
+    assert ci.users == ["U3", "U4"]
+    assert sql_repo.get_service_ci_by_id("missing") is None
+
+
+def test_duplicate_user_id_returns_last_row(sql_repo):
+    users = sql_repo.get_users_for_service(sql_repo.get_service_ci("Payments"))
+    assert [(user.user_id, user.department) for user in users] == [("U1", "Finance"), ("U2", "Support")]
+
+
+def test_blast_radius_follows_current_dependencies(data_dir, sql_repo):
+    radius = sql_repo.get_blast_radius("CI3")
+    # CI2 (the replica) -> CI1 -> CI4; the self-dependency of the first CI2 row is gone
+    assert radius.direct_dependents == 1
+    assert radius.downstream_cis == 3
+    assert radius.critical_dependents == ["Payments"]
+    assert radius == DataRepository(str(data_dir)).get_blast_radius("CI3")
+    assert sql_repo.get_blast_radius("missing").downstream_cis == 0
+
+
+def test_user_impact(sql_repo):
+    impact = sql_repo.get_user_impact(sql_repo.get_service_ci_by_id("CI2"), ["U4", "U1"])
+    assert impact.service_users == 2
+    assert impact.affected_service_users == 1
+    assert impact.vip_affected
+    assert impact.departments == ["IT"]
+
+
+def test_writes_to_service_cis_are_refused(sql_repo):
+    with pytest.raises(PermissionError):
+        sql_repo.upsert_service_cis([])